@@ -0,0 +1,74 @@
+import asyncio
+import hashlib
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+
+class SingleFlight:
+    """Agrupa peticiones idénticas concurrentes en una sola llamada upstream.
+
+    La primera petición con una clave lanza la llamada; las que llegan mientras
+    está en vuelo esperan el mismo resultado. Con `ttl` > 0 el resultado se
+    reutiliza además durante ese tiempo (micro-caché).
+    """
+
+    def __init__(self, ttl: float = 0.0, max_cached: int = 1024):
+        self.ttl = ttl
+        self.max_cached = max_cached
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self._cache: Dict[Tuple, Tuple[float, object]] = {}
+        self.stats = {"requests": 0, "upstream_calls": 0, "coalesced": 0, "cache_hits": 0}
+
+    async def do(self, key: Tuple, fn: Callable[[], Awaitable], cacheable: Callable[[object], bool] = lambda _: True):
+        self.stats["requests"] += 1
+
+        if self.ttl > 0:
+            cached = self._cache.get(key)
+            if cached and cached[0] > time.monotonic():
+                self.stats["cache_hits"] += 1
+                return cached[1]
+
+        future = self._inflight.get(key)
+        if future is None:
+            self.stats["upstream_calls"] += 1
+            # Se ejecuta como tarea propia: si el primer cliente cancela, el resto sigue esperando
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._finish(key, f, cacheable))
+        else:
+            self.stats["coalesced"] += 1
+
+        return await asyncio.shield(future)
+
+    def _finish(self, key: Tuple, future: asyncio.Future, cacheable: Callable[[object], bool]):
+        self._inflight.pop(key, None)
+        if self.ttl <= 0 or future.cancelled() or future.exception() is not None:
+            return
+        result = future.result()
+        if not cacheable(result):
+            return
+        if len(self._cache) >= self.max_cached:
+            now = time.monotonic()
+            for stale in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+                del self._cache[stale]
+            if len(self._cache) >= self.max_cached:
+                self._cache.pop(next(iter(self._cache)))
+        self._cache[key] = (time.monotonic() + self.ttl, result)
+
+
+def parse_routes(value: str) -> set:
+    """Convierte "reports:dashboard/statistics,equipment:categories" en {(service, path)}"""
+    routes = set()
+    for item in value.split(","):
+        item = item.strip()
+        if ":" in item:
+            service, path = item.split(":", 1)
+            routes.add((service.strip(), path.strip().strip("/")))
+    return routes
+
+
+def request_key(service: str, path: str, query: str, authorization: Optional[str]) -> Tuple:
+    """Clave de coalescencia: misma ruta, misma query y mismo ámbito de autorización"""
+    scope = hashlib.sha256(authorization.encode()).hexdigest() if authorization else ""
+    normalized_query = "&".join(sorted(query.split("&"))) if query else ""
+    return service, path.strip("/"), normalized_query, scope
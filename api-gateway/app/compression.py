@@ -0,0 +1,216 @@
+import zlib
+from typing import Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dependencia opcional
+    zstandard = None
+
+
+# Tipos que ya vienen comprimidos: recomprimirlos solo gasta CPU
+INCOMPRESSIBLE_TYPES = (
+    "application/vnd.openxmlformats-officedocument",  # xlsx / docx (contenedores zip)
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "image/",
+    "video/",
+    "audio/",
+    "text/event-stream",  # se envía en cuanto se produce, sin buffer
+)
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, level: int):
+        self._obj = brotli.Compressor(quality=min(level, 11))
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data) + self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self, level: int):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+ENCODERS = {"gzip": _GzipEncoder}
+if brotli is not None:
+    ENCODERS["br"] = _BrotliEncoder
+if zstandard is not None:
+    ENCODERS["zstd"] = _ZstdEncoder
+
+# Preferencia del servidor cuando el cliente acepta varias con la misma q
+SERVER_PREFERENCE = ["zstd", "br", "gzip"]
+
+
+def negotiate_encoding(accept_encoding: str, available: List[str]) -> Optional[str]:
+    """Elegir la codificación según Accept-Encoding (con valores q)"""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        parts = [p.strip() for p in item.split(";")]
+        name = parts[0].lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for name in SERVER_PREFERENCE:
+        if name not in available:
+            continue
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressionStats:
+    def __init__(self):
+        self.by_encoding: Dict[str, Dict[str, int]] = {}
+        self.skipped = 0
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int):
+        entry = self.by_encoding.setdefault(encoding, {"responses": 0, "bytes_in": 0, "bytes_out": 0})
+        entry["responses"] += 1
+        entry["bytes_in"] += bytes_in
+        entry["bytes_out"] += bytes_out
+
+    def snapshot(self) -> dict:
+        total_in = sum(e["bytes_in"] for e in self.by_encoding.values())
+        total_out = sum(e["bytes_out"] for e in self.by_encoding.values())
+        return {
+            "available": list(ENCODERS),
+            "skipped": self.skipped,
+            "by_encoding": self.by_encoding,
+            "compression_ratio": round(total_in / total_out, 2) if total_out else None,
+        }
+
+
+class CompressionMiddleware:
+    """Middleware ASGI de compresión negociada (zstd / br / gzip).
+
+    Las respuestas por debajo de `minimum_size`, las que ya traen Content-Encoding
+    y los tipos ya comprimidos (XLSX, imágenes...) pasan tal cual. El resto se
+    comprime en streaming: cada fragmento del body se comprime y se envía sin
+    esperar a tener la respuesta completa.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, level: int = 5, stats: Optional[CompressionStats] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+        self.stats = stats or CompressionStats()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for key, value in scope.get("headers", []):
+            if key == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+
+        encoding = negotiate_encoding(accept, list(ENCODERS)) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(self, encoding, send)
+        await self.app(scope, receive, responder)
+
+
+class _CompressingResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message = None
+        self.encoder = None
+        self.passthrough = False
+        self.buffer = b""
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            headers = {k.lower(): v for k, v in message.get("headers", [])}
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            if b"content-encoding" in headers or content_type.startswith(INCOMPRESSIBLE_TYPES):
+                self.passthrough = True
+                self.middleware.stats.skipped += 1
+                await self.send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            self.buffer += body
+            if len(self.buffer) < self.middleware.minimum_size and more_body:
+                return
+            if len(self.buffer) < self.middleware.minimum_size:
+                # Respuesta pequeña: se envía sin comprimir
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": self.buffer, "more_body": False})
+                return
+            await self._start_compressed()
+            body, self.buffer = self.buffer, b""
+
+        self.bytes_in += len(body)
+        chunk = self.encoder.compress(body) if body else b""
+        if not more_body:
+            chunk += self.encoder.finish()
+        self.bytes_out += len(chunk)
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        if not more_body:
+            self.middleware.stats.record(self.encoding, self.bytes_in, self.bytes_out)
+
+    async def _start_compressed(self):
+        self.encoder = ENCODERS[self.encoding](self.middleware.level)
+        headers = [
+            (k, v) for k, v in self.start_message.get("headers", [])
+            if k.lower() not in (b"content-length", b"vary")
+        ]
+        vary = [v for k, v in self.start_message.get("headers", []) if k.lower() == b"vary"]
+        vary_value = b", ".join(vary + [b"Accept-Encoding"]) if vary else b"Accept-Encoding"
+        headers += [(b"content-encoding", self.encoding.encode()), (b"vary", vary_value)]
+        await self.send({**self.start_message, "headers": headers})
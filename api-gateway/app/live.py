@@ -0,0 +1,140 @@
+"""Notificaciones de cambios en vivo (Server-Sent Events).
+
+Una sola tarea por worker del gateway sigue el feed de cambios del
+reports-service (`GET /changes`, long polling) mientras haya alguien conectado,
+y reparte una versión compacta de cada evento entre las conexiones SSE. Cada
+conexión tiene una cola acotada: si un cliente no consume al ritmo de los
+eventos se vacía su cola y recibe `resync` (debe recargar todo), sin frenar al
+resto ni acumular memoria.
+
+Al reconectar, el navegador (o el cliente) envía Last-Event-ID y se le
+reenvían los eventos que se perdió si el worker puede demostrar que los tiene
+todos (publicados desde que el relay empezó y aún en el búfer de recientes);
+si no, recibe `resync`.
+"""
+import asyncio
+import json
+from collections import deque
+from typing import Iterable, List, Optional, Set
+
+# Agregado del outbox -> tema al que se suscriben los clientes
+TOPICS = {
+    "equipment": "equipment",
+    "maintenance": "maintenance",
+    "alert": "alerts",
+    "contract": "contracts",
+}
+
+# Campos que viajan en la notificación; el resto se pide a la API si hace falta
+COMPACT_FIELDS = (
+    "status", "current_location_id", "equipment_id", "scheduled_date",
+    "alert_type", "priority", "due_date", "count",
+)
+
+RESYNC = {"event": "resync"}
+
+
+def compact(event: dict) -> dict:
+    """Notificación pequeña a partir de un evento del feed de cambios"""
+    payload = event.get("payload") or {}
+    values = {**payload, **payload.get("changes", {})}
+    notification = {
+        "id": event["id"],
+        "topic": TOPICS.get(event["aggregate_type"], event["aggregate_type"]),
+        "type": event["event_type"],
+        "aggregate_id": event["aggregate_id"],
+    }
+    notification.update({field: values[field] for field in COMPACT_FIELDS if field in values})
+    if "status" in payload.get("previous", {}):
+        notification["previous_status"] = payload["previous"]["status"]
+    return notification
+
+
+def format_sse(item: dict) -> str:
+    if item is RESYNC:
+        return "event: resync\ndata: {}\n\n"
+    return f"id: {item['id']}\nevent: change\ndata: {json.dumps(item, separators=(',', ':'))}\n\n"
+
+
+class Subscriber:
+    def __init__(self, topics: Optional[Set[str]], queue_size: int):
+        self.topics = topics
+        self.queue: "asyncio.Queue[dict]" = asyncio.Queue(maxsize=queue_size)
+
+    def wants(self, notification: dict) -> bool:
+        return self.topics is None or notification["topic"] in self.topics
+
+    def offer(self, item: dict) -> bool:
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            # Cliente lento: descartar lo pendiente y pedirle que recargue
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            return False
+
+
+class ChangeHub:
+    def __init__(self, queue_size: int = 100, replay_size: int = 1000, max_subscribers: int = 1000):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: Set[Subscriber] = set()
+        self._recent: deque = deque(maxlen=replay_size)
+        # Todos los eventos con id > _covered_after están en _recent (None: el relay no ha empezado)
+        self._covered_after: Optional[int] = None
+        self._active = asyncio.Event()
+        self.stats = {"published": 0, "delivered": 0, "resyncs": 0, "relay_errors": 0}
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def full(self) -> bool:
+        return len(self._subscribers) >= self.max_subscribers
+
+    def subscribe(self, topics: Optional[Iterable[str]] = None, last_event_id: Optional[int] = None) -> Subscriber:
+        subscriber = Subscriber(set(topics) if topics else None, self.queue_size)
+        if last_event_id is not None:
+            self._replay(subscriber, last_event_id)
+        self._subscribers.add(subscriber)
+        self._active.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+        if not self._subscribers:
+            self._active.clear()
+
+    def start_at(self, after: int):
+        """El relay (re)empieza en `after`: lo que hubiera en el búfer ya no es continuo"""
+        self._recent.clear()
+        self._covered_after = after
+
+    def _replay(self, subscriber: Subscriber, last_event_id: int):
+        if self._covered_after is None or last_event_id < self._covered_after:
+            # Eventos anteriores a lo que guarda el búfer o de antes de que empezara el relay
+            subscriber.offer(RESYNC)
+            self.stats["resyncs"] += 1
+            return
+        for notification in self._recent:
+            if notification["id"] > last_event_id and subscriber.wants(notification):
+                subscriber.offer(notification)
+
+    def publish(self, notifications: List[dict]):
+        for notification in notifications:
+            if len(self._recent) == self._recent.maxlen:
+                # Se descarta el más antiguo (o este, con replay_size=0): ya no se puede reenviar
+                self._covered_after = (self._recent[0] if self._recent else notification)["id"]
+            self._recent.append(notification)
+            self.stats["published"] += 1
+            for subscriber in self._subscribers:
+                if subscriber.wants(notification):
+                    if subscriber.offer(notification):
+                        self.stats["delivered"] += 1
+                    else:
+                        self.stats["resyncs"] += 1
+
+    async def wait_for_subscribers(self):
+        await self._active.wait()
@@ -1,12 +1,39 @@
 from fastapi import FastAPI, Request, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, JSONResponse
+from pydantic import BaseModel, Field
 import httpx
+import asyncio
+import json
 import os
-from typing import Optional
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+from .coalescing import SingleFlight, parse_routes, request_key
+from .resilience import CircuitOpenError, RetryBudget, LoadShedder, backoff_delay
+from .registry import ServiceRegistry
+from .compression import CompressionMiddleware, CompressionStats
+from .rate_limit import Limit, RateLimiter, RateLimitMiddleware
+from .live import ChangeHub, compact, format_sse
+import time
 
 app = FastAPI(title="IT Management API Gateway", version="1.0.0")
 
+# Rate limiting por usuario y clase de ruta (token buckets, compartidos vía Redis si REDIS_URL).
+# Pesadas: exportaciones Excel/PDF, ciclo de vida, batch y operaciones masivas; el resto de
+# /api/reports (estadísticas del dashboard, feed de cambios) es ligero.
+# Se registra antes que CORS para que sus 429 lleven Access-Control-Allow-Origin
+rate_limiter = RateLimiter(
+    limits={
+        "light": Limit.parse(os.getenv("RATE_LIMIT_LIGHT", "300/minute")),
+        "heavy": Limit.parse(os.getenv("RATE_LIMIT_HEAVY", "20/minute")),
+    },
+    heavy_routes=[r.strip() for r in os.getenv("RATE_LIMIT_HEAVY_ROUTES", "/api/reports/equipment/,/api/reports/maintenance/,/api/reports/lifecycle/run,/api/batch,/bulk-").split(",") if r.strip()],
+    secret_key=os.getenv("SECRET_KEY"),
+    redis_url=os.getenv("REDIS_URL"),
+    redis_backoff=float(os.getenv("RATE_LIMIT_REDIS_BACKOFF", "5"))
+)
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -16,7 +43,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# URLs de los microservicios
+# Compresión negociada con Accept-Encoding (zstd / br / gzip)
+compression_stats = CompressionStats()
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+    level=int(os.getenv("COMPRESSION_LEVEL", "5")),
+    stats=compression_stats
+)
+
+# URLs de los microservicios (se admiten varias réplicas separadas por comas)
 SERVICES = {
     "auth": os.getenv("AUTH_SERVICE_URL", "http://auth-service:8001"),
     "equipment": os.getenv("EQUIPMENT_SERVICE_URL", "http://equipment-service:8002"),
@@ -25,11 +61,74 @@ SERVICES = {
     "reports": os.getenv("REPORTS_SERVICE_URL", "http://reports-service:8005"),
 }
 
-# Cliente HTTP
-async_client = httpx.AsyncClient(timeout=30.0)
+# Cliente HTTP (timeout de conexión corto para fallar rápido si el upstream no responde)
+async_client = httpx.AsyncClient(timeout=httpx.Timeout(
+    float(os.getenv("UPSTREAM_TIMEOUT", "30")),
+    connect=float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "2"))
+))
+
+# Resiliencia: circuit breaker por upstream, presupuesto de reintentos y load shedding
+# Solo las lecturas se reintentan ante cualquier fallo. Una escritura puede haberse
+# confirmado aunque se perdiera la respuesta (DELETE devolvería un 404 falso, PUT /me/password
+# un 400 con las sesiones ya revocadas): se reintenta solo si no llegó a conectar
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+RETRYABLE_STATUS = {502, 503, 504}
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+
+# Registro de réplicas: circuit breaker por réplica y balanceo least-outstanding / EWMA
+registry = ServiceRegistry(
+    SERVICES,
+    strategy=os.getenv("LB_STRATEGY", "least_outstanding"),
+    registry_file=os.getenv("SERVICE_REGISTRY_FILE"),
+    discovery=os.getenv("SERVICE_DISCOVERY"),
+    failure_threshold=int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5")),
+    reset_timeout=float(os.getenv("BREAKER_RESET_TIMEOUT", "10"))
+)
+REGISTRY_REFRESH_INTERVAL = float(os.getenv("REGISTRY_REFRESH_INTERVAL", "10"))
+retry_budget = RetryBudget(ratio=float(os.getenv("RETRY_BUDGET_RATIO", "0.2")))
+load_shedder = LoadShedder(max_concurrent=int(os.getenv("GATEWAY_MAX_CONCURRENT", "200")))
+
+# Coalescencia de GETs idénticos concurrentes (rutas idempotentes en lista blanca)
+COALESCE_ROUTES = parse_routes(os.getenv(
+    "COALESCE_ROUTES",
+    "reports:dashboard/statistics,equipment:categories,equipment:locations,maintenance:types"
+))
+single_flight = SingleFlight(ttl=float(os.getenv("COALESCE_TTL_SECONDS", "0")))
+
+# Notificaciones en vivo (SSE): cola por conexión, búfer para reconexiones y long polling del feed
+change_hub = ChangeHub(
+    queue_size=int(os.getenv("LIVE_QUEUE_SIZE", "100")),
+    replay_size=int(os.getenv("LIVE_REPLAY_SIZE", "1000")),
+    max_subscribers=int(os.getenv("LIVE_MAX_SUBSCRIBERS", "1000"))
+)
+LIVE_POLL_WAIT = float(os.getenv("LIVE_POLL_WAIT", "20"))
+LIVE_HEARTBEAT = float(os.getenv("LIVE_HEARTBEAT", "15"))
+LIVE_RETRY_DELAY = float(os.getenv("LIVE_RETRY_DELAY", "2"))
+LIVE_RESUME_WINDOW = float(os.getenv("LIVE_RESUME_WINDOW", "300"))
+
+async def maintain_registry():
+    """Refrescar réplicas (DNS / fichero) y sacar del balanceo las que no pasan el health check"""
+    while True:
+        try:
+            await registry.refresh()
+            await registry.check_health(async_client)
+        except Exception as e:
+            print(f"⚠️ Service registry refresh failed: {e}")
+        await asyncio.sleep(REGISTRY_REFRESH_INTERVAL)
+
+@app.on_event("startup")
+async def startup_event():
+    app.state.registry_task = asyncio.create_task(maintain_registry())
+    app.state.relay_task = asyncio.create_task(relay_changes())
+    if rate_limiter.backend == "local" and int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+        # Cada worker tiene sus propios buckets: el límite efectivo se multiplica por los workers
+        print("⚠️ Rate limiting is per worker without REDIS_URL")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    app.state.registry_task.cancel()
+    app.state.relay_task.cancel()
     await async_client.aclose()
 
 @app.get("/")
@@ -46,69 +145,175 @@ async def health_check():
     """Verificar salud de todos los servicios"""
     health_status = {"gateway": "healthy", "services": {}}
 
-    for service_name, service_url in SERVICES.items():
-        try:
-            response = await async_client.get(f"{service_url}/health", timeout=5.0)
-            health_status["services"][service_name] = {
-                "status": "healthy" if response.status_code == 200 else "unhealthy",
-                "url": service_url
-            }
-        except Exception as e:
-            health_status["services"][service_name] = {
-                "status": "unreachable",
-                "url": service_url,
-                "error": str(e)
-            }
+    results = await registry.check_health(async_client)
+    for service_name, replicas in results.items():
+        healthy = [r for r in replicas if r["status"] == "healthy"]
+        health_status["services"][service_name] = {
+            "status": "healthy" if healthy else replicas[0]["status"],
+            "healthy_replicas": len(healthy),
+            "replicas": replicas
+        }
 
     return health_status
 
-async def forward_request(
+async def upstream_request(
     service: str,
+    method: str,
     path: str,
-    request: Request,
-    authorization: Optional[str] = Header(None)
-):
-    """Reenviar petición al microservicio correspondiente"""
-    if service not in SERVICES:
-        raise HTTPException(status_code=404, detail=f"Service {service} not found")
+    headers: Optional[dict] = None,
+    content: bytes = b"",
+    params=None,
+    timeout=None
+) -> httpx.Response:
+    """Llamar a un microservicio pasando por su circuit breaker.
+
+    Los métodos idempotentes se reintentan ante errores de red o 502/503/504; el resto
+    solo si la conexión falló (la petición no llegó al upstream). Siempre con backoff
+    exponencial con jitter y dentro del presupuesto de reintentos.
+    """
+    pool = registry.pool(service)
+    idempotent = method in IDEMPOTENT_METHODS
+    attempts = UPSTREAM_MAX_RETRIES + 1
+    retry_budget.deposit()
+
+    kwargs = {"timeout": timeout} if timeout is not None else {}
+    replica = None
+    for attempt in range(attempts):
+        # Cada reintento va, si es posible, a otra réplica
+        replica = pool.choose(exclude=replica)
+
+        last_attempt = attempt + 1 >= attempts
+        replica.outstanding += 1
+        started = time.monotonic()
+        try:
+            response = await async_client.request(
+                method=method,
+                url=f"{replica.url}/{path}",
+                headers=headers,
+                content=content,
+                params=params,
+                **kwargs
+            )
+        except httpx.RequestError as exc:
+            replica.breaker.record_failure()
+            retryable = idempotent or isinstance(exc, NOT_SENT_ERRORS)
+            if last_attempt or not retryable or not retry_budget.try_withdraw():
+                raise
+        else:
+            replica.record_latency((time.monotonic() - started) * 1000)
+            if response.status_code not in RETRYABLE_STATUS:
+                replica.breaker.record_success()
+                return response
+            replica.breaker.record_failure()
+            if last_attempt or not idempotent or not retry_budget.try_withdraw():
+                return response
+        finally:
+            replica.outstanding -= 1
 
-    service_url = SERVICES[service]
-    target_url = f"{service_url}/{path}"
+        await asyncio.sleep(backoff_delay(attempt))
 
-    # Preparar headers
+def forwarded_for(request: Request) -> str:
+    """X-Forwarded-For con la IP del cliente añadida (los servicios la guardan en audit_logs)"""
+    client_ip = request.client.host if request.client else ""
+    previous = request.headers.get("x-forwarded-for")
+    return f"{previous}, {client_ip}" if previous else client_ip
+
+async def send_upstream(service: str, path: str, request: Request, authorization: Optional[str] = None) -> httpx.Response:
+    """Enviar la petición al microservicio y devolver la respuesta httpx"""
+    # Preparar headers (la compresión hacia el cliente la negocia el gateway)
     headers = dict(request.headers)
+    headers.pop("accept-encoding", None)
+    headers["x-forwarded-for"] = forwarded_for(request)
     if authorization:
         headers["Authorization"] = authorization
 
     # Leer el body
     body = await request.body()
 
-    try:
-        # Reenviar la petición
-        response = await async_client.request(
-            method=request.method,
-            url=target_url,
+    return await upstream_request(
+        service,
+        request.method,
+        path,
+        headers=headers,
+        content=body,
+        params=request.query_params
+    )
+
+def build_response(response: httpx.Response):
+    """Convertir la respuesta del microservicio en respuesta del gateway"""
+    # Si es una respuesta de archivo (PDF, Excel), devolver StreamingResponse
+    content_type = response.headers.get("content-type", "")
+    if "application/pdf" in content_type or "spreadsheet" in content_type:
+        # httpx ya decodificó el body: no se reenvían las cabeceras de codificación/longitud
+        headers = {
+            k: v for k, v in response.headers.items()
+            if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+        }
+        return StreamingResponse(
+            iter([response.content]),
+            status_code=response.status_code,
             headers=headers,
-            content=body,
-            params=request.query_params
+            media_type=content_type
         )
 
-        # Si es una respuesta de archivo (PDF, Excel), devolver StreamingResponse
-        content_type = response.headers.get("content-type", "")
-        if "application/pdf" in content_type or "spreadsheet" in content_type:
-            return StreamingResponse(
-                iter([response.content]),
-                status_code=response.status_code,
-                headers=dict(response.headers),
-                media_type=content_type
-            )
+    # Respuesta JSON normal
+    return JSONResponse(
+        content=response.json() if response.content else {},
+        status_code=response.status_code
+    )
 
-        # Respuesta JSON normal
-        return JSONResponse(
-            content=response.json() if response.content else {},
-            status_code=response.status_code
+@app.get("/metrics")
+def metrics():
+    """Métricas internas del gateway (del worker que atiende la petición)"""
+    return {
+        "worker_pid": os.getpid(),
+        "load_shedding": load_shedder.snapshot(),
+        "upstreams": registry.snapshot(),
+        "retry_budget_tokens": round(retry_budget.tokens, 2),
+        "coalescing": single_flight.stats,
+        "compression": compression_stats.snapshot(),
+        "rate_limit": rate_limiter.snapshot(),
+        "live": {"subscribers": len(change_hub), **change_hub.stats},
+    }
+
+async def forward_request(
+    service: str,
+    path: str,
+    request: Request,
+    authorization: Optional[str] = Header(None)
+):
+    """Reenviar petición al microservicio correspondiente"""
+    if service not in SERVICES:
+        raise HTTPException(status_code=404, detail=f"Service {service} not found")
+
+    # Load shedding: con el gateway saturado se responde 503 inmediato en vez de encolar
+    if not load_shedder.try_acquire():
+        raise HTTPException(
+            status_code=503,
+            detail="Gateway overloaded, retry later",
+            headers={"Retry-After": str(load_shedder.retry_after)}
         )
 
+    try:
+        if request.method == "GET" and (service, path.strip("/")) in COALESCE_ROUTES:
+            # GETs idénticos concurrentes comparten una sola llamada upstream
+            key = request_key(service, path, request.url.query, authorization)
+            response = await single_flight.do(
+                key,
+                lambda: send_upstream(service, path, request, authorization),
+                cacheable=lambda r: r.status_code == 200
+            )
+        else:
+            response = await send_upstream(service, path, request, authorization)
+
+        return build_response(response)
+
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Service {service} unavailable: circuit open",
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
     except httpx.RequestError as e:
         raise HTTPException(
             status_code=503,
@@ -119,6 +324,273 @@ async def forward_request(
             status_code=500,
             detail=f"Gateway error: {str(e)}"
         )
+    finally:
+        load_shedder.release()
+
+# ============================================
+# COMPOSITE ROUTES (BACKEND-FOR-FRONTEND)
+# ============================================
+
+COMPOSITE_SECTION_TIMEOUT = float(os.getenv("COMPOSITE_SECTION_TIMEOUT", "5.0"))
+
+async def fetch_section(service: str, path: str, headers: dict, timeout: float = COMPOSITE_SECTION_TIMEOUT):
+    """Obtener una sección de la vista compuesta; devuelve (status_code, data, error)"""
+    try:
+        response = await asyncio.wait_for(
+            upstream_request(service, "GET", path, headers=headers),
+            timeout=timeout
+        )
+    except asyncio.TimeoutError:
+        return None, None, f"{service} timed out after {timeout}s"
+    except CircuitOpenError:
+        return None, None, f"{service} unavailable: circuit open"
+    except httpx.RequestError as e:
+        return None, None, f"{service} unavailable: {str(e)}"
+
+    if response.status_code >= 400:
+        return response.status_code, None, f"{service} returned {response.status_code}"
+
+    return response.status_code, response.json() if response.content else None, None
+
+@app.get("/api/composite/equipment/{equipment_id}")
+async def equipment_detail(equipment_id: int, authorization: Optional[str] = Header(None)):
+    """Vista completa de un equipo: datos, ubicaciones, mantenimientos y proveedor.
+
+    Las secciones se piden en paralelo (el proveedor en cuanto se conoce su ID),
+    así que la latencia es la del upstream más lento y no la suma de todos.
+    Cada sección tiene su propio timeout; si falla, se devuelve como null y el
+    motivo queda en `errors`.
+    """
+    headers = {"Authorization": authorization} if authorization else {}
+
+    async def equipment_and_provider():
+        equipment = await fetch_section("equipment", f"equipment/{equipment_id}", headers)
+        provider = (None, None, None)
+        provider_id = equipment[1].get("provider_id") if equipment[1] else None
+        if provider_id:
+            provider = await fetch_section("provider", f"providers/{provider_id}", headers)
+        return equipment, provider
+
+    (equipment, provider), history, maintenance_history, next_maintenance = await asyncio.gather(
+        equipment_and_provider(),
+        fetch_section("equipment", f"equipment/{equipment_id}/history", headers),
+        fetch_section("maintenance", f"equipment/{equipment_id}/maintenance-history", headers),
+        fetch_section("maintenance", f"equipment/{equipment_id}/next-maintenance", headers),
+    )
+
+    if equipment[0] == 404:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+
+    sections = {
+        "equipment": equipment,
+        "location_history": history,
+        "maintenance_history": maintenance_history,
+        "next_maintenance": next_maintenance,
+        "provider": provider,
+    }
+    document = {name: section[1] for name, section in sections.items()}
+
+    # El endpoint de próximo mantenimiento responde con un mensaje si no hay ninguno
+    if isinstance(document["next_maintenance"], dict) and "id" not in document["next_maintenance"]:
+        document["next_maintenance"] = None
+
+    document["errors"] = {name: section[2] for name, section in sections.items() if section[2]}
+    return document
+
+# ============================================
+# BATCH ROUTES
+# ============================================
+
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "6"))
+
+# Prefijo público de la ruta -> servicio
+ROUTE_PREFIXES = {
+    "auth": "auth",
+    "equipment": "equipment",
+    "providers": "provider",
+    "maintenance": "maintenance",
+    "reports": "reports",
+}
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    method: str = "GET"
+    path: str
+    query: Optional[Dict[str, Any]] = None
+    body: Optional[Any] = None
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem] = Field(..., min_length=1, max_length=BATCH_MAX_REQUESTS)
+
+def resolve_route(path: str):
+    """Traducir "/api/equipment/equipment?x=1" en (servicio, ruta, [(clave, valor)])"""
+    parts = urlsplit(path)
+    segments = parts.path.strip("/").split("/", 2)
+    if len(segments) < 3 or segments[0] != "api" or segments[1] not in ROUTE_PREFIXES:
+        return None
+    return ROUTE_PREFIXES[segments[1]], segments[2], parse_qsl(parts.query, keep_blank_values=True)
+
+async def run_batch_item(item: BatchItem, authorization: Optional[str], forwarded: str, semaphore: asyncio.Semaphore) -> dict:
+    """Ejecutar una sub-petición del batch; los errores se devuelven en su entrada"""
+    method = item.method.upper()
+    route = resolve_route(item.path)
+    if route is None or method not in ("GET", "POST", "PUT", "DELETE"):
+        return {"id": item.id, "status": 404, "body": {"detail": f"Route {method} {item.path} not found"}}
+
+    service, path, params = route
+    for key, value in (item.query or {}).items():
+        values = value if isinstance(value, list) else [value]
+        params += [(key, str(v).lower() if isinstance(v, bool) else str(v)) for v in values]
+
+    headers = {"Authorization": authorization} if authorization else {}
+    headers["X-Forwarded-For"] = forwarded
+    content = b""
+    if item.body is not None:
+        headers["Content-Type"] = "application/json"
+        content = json.dumps(item.body).encode("utf-8")
+
+    async with semaphore:
+        try:
+            if method == "GET" and (service, path.strip("/")) in COALESCE_ROUTES:
+                key = request_key(service, path, urlencode(params), authorization)
+                response = await single_flight.do(
+                    key,
+                    lambda: upstream_request(service, method, path, headers=headers, params=params),
+                    cacheable=lambda r: r.status_code == 200
+                )
+            else:
+                response = await upstream_request(service, method, path, headers=headers, content=content, params=params)
+        except CircuitOpenError:
+            return {"id": item.id, "status": 503, "body": {"detail": f"Service {service} unavailable: circuit open"}}
+        except httpx.RequestError as e:
+            return {"id": item.id, "status": 503, "body": {"detail": f"Service {service} unavailable: {str(e)}"}}
+
+    if response.content and "application/json" not in response.headers.get("content-type", ""):
+        # PDF / Excel no se multiplexan: se piden por su ruta normal
+        return {"id": item.id, "status": 406, "body": {"detail": "Only JSON responses can be batched"}}
+
+    return {
+        "id": item.id,
+        "status": response.status_code,
+        "body": response.json() if response.content else None
+    }
+
+@app.post("/api/batch")
+async def batch(payload: BatchRequest, request: Request, authorization: Optional[str] = Header(None)):
+    """Ejecutar varias peticiones a la API en una sola ida y vuelta.
+
+    Cada sub-petición ({id, method, path, query, body}) se reenvía con la misma
+    autorización y pasa por el mismo circuit breaker / balanceo que una petición
+    normal. Se ejecutan en paralelo con un máximo de BATCH_CONCURRENCY a la vez
+    y las respuestas se devuelven en el mismo orden, cada una con su status.
+    """
+    if not load_shedder.try_acquire():
+        raise HTTPException(
+            status_code=503,
+            detail="Gateway overloaded, retry later",
+            headers={"Retry-After": str(load_shedder.retry_after)}
+        )
+
+    try:
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        responses = await asyncio.gather(*[
+            run_batch_item(item, authorization, forwarded_for(request), semaphore) for item in payload.requests
+        ])
+    finally:
+        load_shedder.release()
+
+    return {"responses": responses}
+
+# ============================================
+# NOTIFICACIONES EN VIVO (SSE)
+# ============================================
+
+async def fetch_changes(path: str, params: Optional[dict] = None) -> dict:
+    """GET al feed de cambios del reports-service.
+
+    Sin pasar por upstream_request: una espera de long polling no es latencia
+    de la réplica y falsearía su EWMA para el balanceo.
+    """
+    replica = registry.pool("reports").choose()
+    replica.outstanding += 1
+    try:
+        response = await async_client.get(f"{replica.url}/{path}", params=params)
+        response.raise_for_status()
+    except httpx.HTTPError:
+        replica.breaker.record_failure()
+        raise
+    finally:
+        replica.outstanding -= 1
+    replica.breaker.record_success()
+    return response.json()
+
+async def relay_changes():
+    """Seguir el feed de cambios mientras haya conexiones SSE y repartir cada evento"""
+    after = None
+    while True:
+        if not len(change_hub):
+            # Sin nadie conectado no se consulta nada. Tras una pausa corta (p. ej. el único
+            # cliente reconectando) se sigue donde se quedó; tras una larga, desde el presente
+            idle_since = time.monotonic()
+            await change_hub.wait_for_subscribers()
+            if time.monotonic() - idle_since > LIVE_RESUME_WINDOW:
+                after = None
+        try:
+            if after is None:
+                after = (await fetch_changes("changes/head"))["last_id"]
+                change_hub.start_at(after)
+            page = await fetch_changes("changes", {"after": after, "limit": 500, "wait": LIVE_POLL_WAIT})
+            change_hub.publish([compact(event) for event in page["events"]])
+            after = page["next_after"]
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            change_hub.stats["relay_errors"] += 1
+            print(f"⚠️ Change feed relay failed: {e}")
+            await asyncio.sleep(LIVE_RETRY_DELAY)
+
+@app.get("/api/events/stream")
+async def events_stream(
+    topics: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None)
+):
+    """Server-Sent Events con notificaciones compactas de cambios.
+
+    `topics` (separados por comas): equipment, maintenance, alerts, contracts;
+    sin él se reciben todos. Cada mensaje `change` lleva id, topic, type,
+    aggregate_id y unos pocos campos (status, priority, ...); `resync` indica
+    que se perdieron eventos y hay que recargar la vista.
+    """
+    if change_hub.full:
+        raise HTTPException(status_code=503, detail="Too many live connections", headers={"Retry-After": "5"})
+
+    resume_from = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    subscriber = change_hub.subscribe(
+        [t.strip() for t in topics.split(",") if t.strip()] if topics else None,
+        resume_from
+    )
+
+    async def stream():
+        try:
+            # Reconexión automática del navegador (EventSource) a los 3 s
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscriber.queue.get(), LIVE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    # Comentario SSE: mantiene viva la conexión a través de proxies
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse(item)
+        finally:
+            change_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # ============================================
 # AUTH SERVICE ROUTES
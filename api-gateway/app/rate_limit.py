@@ -0,0 +1,240 @@
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+from jose import JWTError, jwt
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # pragma: no cover - dependencia opcional
+    redis = None
+
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+
+class Limit:
+    """Presupuesto de un token bucket: `capacity` peticiones de ráfaga, repuestas a `rate` por segundo"""
+
+    def __init__(self, capacity: int, period: int):
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+
+    @classmethod
+    def parse(cls, value: str) -> "Limit":
+        """Convierte "120/minute" en Limit(120, 60)"""
+        count, _, unit = value.partition("/")
+        return cls(int(count), PERIODS[unit.strip() or "second"])
+
+    @property
+    def policy(self) -> str:
+        return f"{self.capacity};w={self.period}"
+
+
+class Decision:
+    __slots__ = ("allowed", "limit", "tokens")
+
+    def __init__(self, allowed: bool, limit: Limit, tokens: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.tokens = tokens
+
+    def headers(self) -> List[Tuple[bytes, bytes]]:
+        limit = self.limit
+        # Segundos hasta que el bucket vuelve a estar lleno / hasta el próximo token
+        reset = max(0, int((limit.capacity - self.tokens) / limit.rate + 0.999))
+        headers = [
+            (b"ratelimit-limit", str(limit.capacity).encode()),
+            (b"ratelimit-remaining", str(int(self.tokens)).encode()),
+            (b"ratelimit-reset", str(reset).encode()),
+            (b"ratelimit-policy", limit.policy.encode()),
+        ]
+        if not self.allowed:
+            retry_after = max(1, int((1 - self.tokens) / limit.rate + 0.999))
+            headers.append((b"retry-after", str(retry_after).encode()))
+        return headers
+
+
+class LocalBuckets:
+    """Token buckets en memoria del proceso: {clave: [tokens, última actualización]}"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: Dict[Tuple, List[float]] = {}
+
+    def take(self, key: Tuple, limit: Limit) -> Tuple[bool, float]:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._evict(now)
+            bucket = self._buckets[key] = [float(limit.capacity), now]
+        else:
+            bucket[0] = min(limit.capacity, bucket[0] + (now - bucket[1]) * limit.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            return True, bucket[0]
+        return False, bucket[0]
+
+    def _evict(self, now: float):
+        # Un bucket que ya se habría rellenado del todo equivale a no tenerlo
+        for key in [k for k, (tokens, updated) in self._buckets.items() if now - updated > 3600]:
+            del self._buckets[key]
+        if len(self._buckets) >= self.max_keys:
+            self._buckets.clear()
+
+
+# Mismo algoritmo que LocalBuckets, atómico en Redis y con el reloj de Redis
+# para que todas las réplicas del gateway compartan los mismos buckets
+REDIS_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RateLimiter:
+    """Limitador por usuario (claim `sub` del JWT, o IP sin token) y clase de ruta.
+
+    Las rutas pesadas (reportes, exportaciones, operaciones masivas, batch) tienen
+    su propio presupuesto, más pequeño que el de las ligeras. Con `redis_url` los
+    buckets se comparten entre réplicas del gateway; si Redis falla se decide con
+    los buckets locales y no se vuelve a intentar durante `redis_backoff` segundos.
+    """
+
+    def __init__(self, limits: Dict[str, Limit], heavy_routes: List[str], secret_key: Optional[str] = None,
+                 redis_url: Optional[str] = None, max_cached_tokens: int = 10000, redis_backoff: float = 5.0):
+        self.limits = limits
+        self.heavy_routes = tuple(heavy_routes)
+        self.secret_key = secret_key
+        self.max_cached_tokens = max_cached_tokens
+        self.local = LocalBuckets()
+        self._identities: Dict[str, Optional[str]] = {}
+        self._redis = None
+        self._script = None
+        self.redis_backoff = redis_backoff
+        self._redis_down_until = 0.0
+        if redis_url and redis is not None:
+            self._redis = redis.from_url(redis_url)
+            self._script = self._redis.register_script(REDIS_TOKEN_BUCKET)
+        self.stats = {"allowed": 0, "limited": 0, "backend_errors": 0}
+
+    @property
+    def backend(self) -> str:
+        return "redis" if self._redis is not None else "local"
+
+    def route_class(self, path: str) -> str:
+        return "heavy" if any(pattern in path for pattern in self.heavy_routes) else "light"
+
+    def identify(self, authorization: Optional[str], client_ip: str) -> str:
+        """Usuario del token (cacheado por token) o, si no hay uno verificable, la IP"""
+        if authorization and authorization[:7].lower() == "bearer ":
+            token = authorization[7:]
+            if token in self._identities:
+                subject = self._identities[token]
+            else:
+                subject = self._decode_subject(token)
+                if len(self._identities) >= self.max_cached_tokens:
+                    self._identities.clear()
+                self._identities[token] = subject
+            if subject:
+                return f"user:{subject}"
+        return f"ip:{client_ip}"
+
+    def _decode_subject(self, token: str) -> Optional[str]:
+        # Solo identifica a quién cobrar la petición: la validez (y expiración) la
+        # comprueba el servicio. Sin firma verificada un cliente podría inventar un
+        # `sub` (gastar el bucket de otro o esquivar el suyo): sin SECRET_KEY, por IP.
+        if not self.secret_key:
+            return None
+        try:
+            claims = jwt.decode(token, self.secret_key, algorithms=["HS256"], options={"verify_exp": False})
+        except (JWTError, ValueError):
+            return None
+        return claims.get("sub")
+
+    async def check(self, identity: str, route_class: str) -> Decision:
+        limit = self.limits[route_class]
+        key = (identity, route_class)
+
+        allowed = tokens = None
+        if self._script is not None and time.monotonic() >= self._redis_down_until:
+            try:
+                result = await self._script(keys=[f"ratelimit:{route_class}:{identity}"], args=[limit.capacity, limit.rate])
+                allowed, tokens = bool(int(result[0])), float(result[1])
+            except Exception:
+                # Circuito abierto: sin pagar el fallo de Redis en cada petición mientras no responde
+                self.stats["backend_errors"] += 1
+                self._redis_down_until = time.monotonic() + self.redis_backoff
+        if allowed is None:
+            allowed, tokens = self.local.take(key, limit)
+
+        self.stats["allowed" if allowed else "limited"] += 1
+        return Decision(allowed, limit, tokens)
+
+    def snapshot(self) -> dict:
+        return {
+            "backend": self.backend,
+            "backend_available": time.monotonic() >= self._redis_down_until,
+            "limits": {name: limit.policy for name, limit in self.limits.items()},
+            **self.stats,
+        }
+
+
+class RateLimitMiddleware:
+    """Middleware ASGI que aplica el RateLimiter a las rutas /api/ y añade las cabeceras RateLimit-*"""
+
+    def __init__(self, app, limiter: RateLimiter, prefix: str = "/api/"):
+        self.app = app
+        self.limiter = limiter
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        authorization = None
+        for key, value in scope.get("headers", []):
+            if key == b"authorization":
+                authorization = value.decode("latin-1")
+                break
+        client = scope.get("client")
+        identity = self.limiter.identify(authorization, client[0] if client else "unknown")
+        decision = await self.limiter.check(identity, self.limiter.route_class(scope["path"]))
+
+        if not decision.allowed:
+            body = json.dumps({"detail": "Rate limit exceeded, retry later"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ] + decision.headers(),
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + decision.headers()}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import os
+import random
+import socket
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from .resilience import CircuitBreaker, CircuitOpenError
+
+
+class Replica:
+    """Una instancia de un microservicio con sus métricas de balanceo"""
+
+    def __init__(self, url: str, failure_threshold: int = 5, reset_timeout: float = 10.0):
+        self.url = url.rstrip("/")
+        self.breaker = CircuitBreaker(url, failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+        self.outstanding = 0
+        self.ewma_ms = 0.0
+        self.healthy = True
+
+    def record_latency(self, elapsed_ms: float, alpha: float = 0.3):
+        self.ewma_ms = elapsed_ms if self.ewma_ms == 0 else alpha * elapsed_ms + (1 - alpha) * self.ewma_ms
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "ewma_ms": round(self.ewma_ms, 2),
+            **self.breaker.snapshot(),
+        }
+
+
+class ServicePool:
+    """Réplicas de un servicio con balanceo least-outstanding o EWMA.
+
+    Las réplicas con el health check fallido o con el circuito abierto quedan
+    fuera del balanceo; pasado `reset_timeout` una réplica sana con el circuito
+    abierto recibe una petición de prueba y, si responde, vuelve a entrar.
+    """
+
+    def __init__(self, name: str, urls: List[str], strategy: str = "least_outstanding", **breaker_options):
+        self.name = name
+        self.strategy = strategy
+        self.breaker_options = breaker_options
+        self.replicas: List[Replica] = []
+        self.set_urls(urls)
+
+    def set_urls(self, urls: List[str]):
+        """Actualizar la lista de réplicas conservando las métricas de las que siguen"""
+        current = {replica.url: replica for replica in self.replicas}
+        self.replicas = [
+            current.get(url.rstrip("/")) or Replica(url, **self.breaker_options)
+            for url in dict.fromkeys(urls)
+        ]
+
+    def choose(self, exclude: Optional[Replica] = None) -> Replica:
+        # Prueba half-open de una réplica disparada aunque haya otras cerradas: sin ella
+        # nunca volvería a recibir tráfico. allow() limita las pruebas en vuelo
+        for replica in self.replicas:
+            if (replica is not exclude and replica.healthy
+                    and replica.breaker.state != CircuitBreaker.CLOSED and replica.breaker.allow()):
+                return replica
+
+        candidates = [r for r in self.replicas if r is not exclude and r.healthy and r.breaker.state == CircuitBreaker.CLOSED]
+        if not candidates:
+            # Sin réplicas sanas se prueba alguna en half-open, prefiriendo las que pasan
+            # el health check y dejando la excluida para el final
+            for replica in sorted(self.replicas, key=lambda r: (r is exclude, not r.healthy)):
+                if replica.breaker.allow():
+                    return replica
+            retry_after = min((r.breaker.retry_after() for r in self.replicas), default=1.0)
+            raise CircuitOpenError(self.name, retry_after)
+
+        if len(candidates) == 1:
+            return candidates[0]
+
+        if self.strategy == "ewma":
+            # Power of two choices con coste = (peticiones en vuelo + 1) * latencia EWMA
+            a, b = random.sample(candidates, 2)
+            cost = lambda r: (r.outstanding + 1) * (r.ewma_ms or 1.0)
+            return a if cost(a) <= cost(b) else b
+
+        lowest = min(r.outstanding for r in candidates)
+        return random.choice([r for r in candidates if r.outstanding == lowest])
+
+    def snapshot(self) -> dict:
+        return {"strategy": self.strategy, "replicas": [r.snapshot() for r in self.replicas]}
+
+
+class ServiceRegistry:
+    """Registro de servicios con varias réplicas por servicio.
+
+    Cada servicio se configura con una o varias URLs separadas por comas. Opcionalmente
+    las réplicas se refrescan desde un fichero JSON ({"equipment": ["http://...", ...]})
+    o resolviendo por DNS todas las IPs del host configurado (p. ej. con
+    `docker compose --scale equipment-service=3`).
+    """
+
+    def __init__(self, services: Dict[str, str], strategy: str = "least_outstanding",
+                 registry_file: Optional[str] = None, discovery: Optional[str] = None, **breaker_options):
+        self.seeds = {name: self._split(value) for name, value in services.items()}
+        self.registry_file = registry_file
+        self.discovery = discovery
+        self._file_mtime = None
+        self.pools = {
+            name: ServicePool(name, urls, strategy=strategy, **breaker_options)
+            for name, urls in self.seeds.items()
+        }
+
+    @staticmethod
+    def _split(value: str) -> List[str]:
+        return [url.strip() for url in value.split(",") if url.strip()]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.pools
+
+    def pool(self, name: str) -> ServicePool:
+        return self.pools[name]
+
+    def refresh_from_file(self):
+        if not self.registry_file or not os.path.exists(self.registry_file):
+            return
+        mtime = os.path.getmtime(self.registry_file)
+        if mtime == self._file_mtime:
+            return
+        with open(self.registry_file) as f:
+            data = json.load(f)
+        for name, urls in data.items():
+            if name in self.pools and urls:
+                self.pools[name].set_urls(urls if isinstance(urls, list) else self._split(urls))
+        self._file_mtime = mtime
+
+    async def refresh_from_dns(self):
+        loop = asyncio.get_running_loop()
+        for name, seeds in self.seeds.items():
+            urls = []
+            for seed in seeds:
+                parts = urlsplit(seed)
+                try:
+                    infos = await loop.getaddrinfo(parts.hostname, parts.port, type=socket.SOCK_STREAM)
+                except OSError:
+                    urls.append(seed)
+                    continue
+                for address in sorted({info[4][0] for info in infos}):
+                    host = f"[{address}]" if ":" in address else address
+                    netloc = f"{host}:{parts.port}" if parts.port else host
+                    urls.append(urlunsplit((parts.scheme, netloc, parts.path, "", "")))
+            if urls:
+                self.pools[name].set_urls(urls)
+
+    async def refresh(self):
+        if self.discovery == "dns":
+            await self.refresh_from_dns()
+        elif self.registry_file:
+            self.refresh_from_file()
+
+    async def check_health(self, client, timeout: float = 5.0) -> Dict[str, list]:
+        """Probar /health en todas las réplicas y marcar las caídas para sacarlas del balanceo"""
+        async def probe(replica: Replica):
+            started = time.monotonic()
+            try:
+                response = await client.get(f"{replica.url}/health", timeout=timeout)
+                replica.healthy = response.status_code == 200
+                status = "healthy" if replica.healthy else "unhealthy"
+                return {"url": replica.url, "status": status, "latency_ms": round((time.monotonic() - started) * 1000, 1)}
+            except Exception as e:
+                replica.healthy = False
+                return {"url": replica.url, "status": "unreachable", "error": str(e)}
+
+        names = list(self.pools)
+        results = await asyncio.gather(*[
+            asyncio.gather(*[probe(r) for r in self.pools[name].replicas]) for name in names
+        ])
+        return dict(zip(names, results))
+
+    def snapshot(self) -> dict:
+        return {name: pool.snapshot() for name, pool in self.pools.items()}
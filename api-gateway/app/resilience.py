@@ -0,0 +1,132 @@
+import random
+import time
+
+
+class CircuitOpenError(Exception):
+    """El circuito del upstream está abierto: se falla rápido sin llamar"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit open for {name}")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Circuit breaker por upstream con estados closed / open / half_open.
+
+    Tras `failure_threshold` fallos consecutivos se abre durante
+    `reset_timeout` segundos; después deja pasar hasta `half_open_max_calls`
+    peticiones de prueba. Un éxito lo cierra y un fallo lo vuelve a abrir.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 10.0, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.probe_started_at = 0.0
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self.half_open_calls = 0
+        elif time.monotonic() - self.probe_started_at >= self.reset_timeout:
+            # La prueba anterior no terminó (p. ej. se canceló): se permite otra
+            self.half_open_calls = 0
+        if self.half_open_calls < self.half_open_max_calls:
+            self.half_open_calls += 1
+            self.probe_started_at = time.monotonic()
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        if self.state != self.OPEN:
+            return 1.0
+        return max(1.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.half_open_calls = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "failures": self.failures}
+
+
+class RetryBudget:
+    """Limita los reintentos a una fracción del tráfico.
+
+    Cada petición deposita `ratio` tokens y cada reintento consume uno; además
+    se reponen `min_per_second` tokens por segundo para que con poco tráfico
+    también se pueda reintentar. Así los reintentos nunca multiplican la carga
+    sobre un upstream que ya está degradado.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 5.0, max_tokens: float = 50.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self.updated_at) * self.min_per_second)
+        self.updated_at = now
+
+    def deposit(self):
+        self._refill()
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        self._refill()
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+def backoff_delay(attempt: int, base: float = 0.1, cap: float = 2.0) -> float:
+    """Backoff exponencial con jitter completo"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class LoadShedder:
+    """Límite de peticiones en vuelo; por encima se rechaza en lugar de encolar"""
+
+    def __init__(self, max_concurrent: int, retry_after: int = 1):
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.shed = 0
+
+    def try_acquire(self) -> bool:
+        if self.max_concurrent > 0 and self.in_flight >= self.max_concurrent:
+            self.shed += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+
+    def snapshot(self) -> dict:
+        return {"in_flight": self.in_flight, "max_concurrent": self.max_concurrent, "shed": self.shed}
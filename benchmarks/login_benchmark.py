@@ -0,0 +1,107 @@
+"""Benchmark de login con bcrypt: throughput por núcleo y latencia p99 bajo concurrencia.
+
+Lanza `--concurrency` logins simultáneos contra auth-service (SQLite en memoria,
+sin red) y, a la vez, sondea /health para comprobar que el resto de endpoints
+siguen respondiendo durante la tormenta de logins. Ejecutar desde la raíz del
+repositorio con las dependencias de auth-service instaladas:
+
+    python benchmarks/login_benchmark.py --users 50 --logins 400 --concurrency 32
+    PASSWORD_HASH_WORKERS=0 python benchmarks/login_benchmark.py   # sin pool de procesos
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "auth-service"))
+
+import httpx  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app import database  # noqa: E402
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+database.engine = engine
+database.SessionLocal.configure(bind=engine)
+
+from app import auth  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import User, UserRole  # noqa: E402
+
+
+def seed(users: int):
+    database.Base.metadata.create_all(bind=engine)
+    password_hash = auth.get_password_hash("secret")
+    db = database.SessionLocal()
+    db.add_all([
+        User(username=f"user{i}", email=f"user{i}@example.com", password_hash=password_hash,
+             full_name=f"User {i}", role=UserRole.viewer)
+        for i in range(users)
+    ])
+    db.commit()
+    db.close()
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+async def run(users: int, logins: int, concurrency: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://auth") as client:
+        # Calentar el pool de procesos para no medir el arranque de los workers
+        await client.post("/login", json={"username": "user0", "password": "secret"})
+
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, health_latencies, statuses = [], [], {}
+        done = asyncio.Event()
+
+        async def login(i):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/login", json={"username": f"user{i % users}", "password": "secret"})
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 200:
+                    latencies.append((time.perf_counter() - started) * 1000)
+
+        async def probe_health():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/health")
+                health_latencies.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(0.05)
+
+        prober = asyncio.create_task(probe_health())
+        started = time.perf_counter()
+        await asyncio.gather(*[login(i) for i in range(logins)])
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+    auth.shutdown_password_pool()
+
+    workers = auth.PASSWORD_HASH_WORKERS or 1
+    throughput = len(latencies) / elapsed
+    print(f"bcrypt rounds:      {auth.BCRYPT_ROUNDS}")
+    print(f"hash workers:       {auth.PASSWORD_HASH_WORKERS or 'threadpool'}")
+    print(f"logins:             {logins} with concurrency {concurrency}, status codes {statuses}")
+    print(f"throughput:         {throughput:.1f} logins/s ({throughput / workers:.1f} per core)")
+    if latencies:
+        print(f"login latency:      p50 {statistics.median(latencies):.0f} ms, p99 {percentile(latencies, 99):.0f} ms")
+    if health_latencies:
+        print(f"/health during run: p50 {statistics.median(health_latencies):.1f} ms, "
+              f"max {max(health_latencies):.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    seed(args.users)
+    asyncio.run(run(args.users, args.logins, args.concurrency))
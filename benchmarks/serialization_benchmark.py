@@ -0,0 +1,106 @@
+"""Benchmark del listado de equipos: serialización Pydantic vs ruta rápida (?fast=true).
+
+Usa SQLite en memoria para que el resultado mida la serialización y no la red
+ni MySQL. Ejecutar desde la raíz del repositorio con las dependencias de
+equipment-service instaladas:
+
+    python benchmarks/serialization_benchmark.py --rows 1000 --repeat 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "equipment-service"))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app import database  # noqa: E402
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+database.engine = engine
+database.SessionLocal.configure(bind=engine)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.models import Equipment, EquipmentCategory, Location  # noqa: E402
+
+
+def seed(rows: int):
+    database.Base.metadata.create_all(bind=engine)
+    # outbox_events no es un modelo (app/outbox.py): se crea como en init-db/migrations/004
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE outbox_events (id INTEGER PRIMARY KEY AUTOINCREMENT, aggregate_type VARCHAR(50) NOT NULL, "
+            "aggregate_id INT, event_type VARCHAR(100) NOT NULL, payload JSON, source VARCHAR(50), "
+            "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+    db = database.SessionLocal()
+    db.add_all([EquipmentCategory(name=f"Categoría {i}") for i in range(8)])
+    db.add_all([Location(building=f"Edificio {i}", floor="1", room=str(i), department="Sistemas") for i in range(6)])
+    db.flush()
+    db.add_all([
+        Equipment(
+            asset_code=f"BENCH-{i:06d}",
+            serial_number=f"SN-{i:06d}",
+            name=f"Equipo {i}",
+            description="Equipo de prueba para benchmark",
+            category_id=i % 8 + 1,
+            brand="Dell",
+            model="OptiPlex 7090",
+            purchase_date=date(2024, 1, 15),
+            purchase_price="3500.00",
+            warranty_end_date=date(2027, 1, 15),
+            current_location_id=i % 6 + 1,
+            assigned_to="Usuario",
+        )
+        for i in range(rows)
+    ])
+    db.commit()
+    db.close()
+
+
+def measure(client: TestClient, url: str, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200
+    return timings, response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    seed(args.rows)
+    client = TestClient(app)
+    base_url = f"/equipment?limit={args.rows}"
+
+    results = {}
+    for label, url in (("pydantic", base_url), ("fast", base_url + "&fast=true")):
+        measure(client, url, 2)  # calentamiento
+        results[label] = measure(client, url, args.repeat)
+
+    assert results["pydantic"][1].json() == results["fast"][1].json(), "Los dos caminos deben devolver lo mismo"
+
+    print(f"{args.rows} filas, {args.repeat} repeticiones")
+    for label, (timings, response) in results.items():
+        print(
+            f"  {label:<9} mediana {statistics.median(timings):8.2f} ms"
+            f"  p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:8.2f} ms"
+            f"  {len(response.content) / 1024:8.1f} KiB"
+        )
+    speedup = statistics.median(results["pydantic"][0]) / statistics.median(results["fast"][0])
+    print(f"  aceleración: x{speedup:.2f}")
+
+
+if __name__ == "__main__":
+    main()
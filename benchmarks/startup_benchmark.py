@@ -0,0 +1,133 @@
+"""Tiempo de arranque (import) y memoria residente de cada servicio y del frontend.
+
+Cada medición se hace en un proceso nuevo: para los servicios se importa
+`app.main` (construye la app FastAPI sin conectar a la BD) y para el frontend
+se ejecutan solo los imports de nivel superior de `frontend/app.py` (la página
+necesita un runtime de Streamlit). Ejecutar desde la raíz del repositorio con
+las dependencias de los servicios instaladas:
+
+    python benchmarks/startup_benchmark.py                      # tabla de arranque y RSS
+    python benchmarks/startup_benchmark.py --profile reports    # módulos que más tardan en importar
+    python benchmarks/startup_benchmark.py --check              # falla si se supera el presupuesto
+
+El presupuesto por servicio está en benchmarks/startup_budget.json.
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BUDGET_FILE = os.path.join(os.path.dirname(__file__), "startup_budget.json")
+
+TARGETS = {
+    "api-gateway": os.path.join(ROOT, "api-gateway"),
+    "auth": os.path.join(ROOT, "services", "auth-service"),
+    "equipment": os.path.join(ROOT, "services", "equipment-service"),
+    "provider": os.path.join(ROOT, "services", "provider-service"),
+    "maintenance": os.path.join(ROOT, "services", "maintenance-service"),
+    "reports": os.path.join(ROOT, "services", "reports-service"),
+    "frontend": os.path.join(ROOT, "frontend"),
+}
+
+# Se ejecuta en el proceso hijo: importa el objetivo y devuelve tiempo y RSS máximo
+MEASURE = """
+import json, resource, sys, time
+started = time.perf_counter()
+exec(compile(sys.argv[1], "<startup>", "exec"))
+elapsed = (time.perf_counter() - started) * 1000
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"import_ms": elapsed, "rss_mb": rss_kb / 1024, "modules": len(sys.modules)}))
+"""
+
+
+def startup_code(target: str) -> str:
+    if target != "frontend":
+        return "import app.main"
+    # Solo los imports de nivel superior: el resto del script es la propia página
+    with open(os.path.join(TARGETS["frontend"], "app.py")) as f:
+        tree = ast.parse(f.read())
+    imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return ast.unparse(ast.Module(body=imports, type_ignores=[]))
+
+
+def measure(target: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE, startup_code(target)],
+        cwd=TARGETS[target], capture_output=True, text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "import failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def profile(target: str, top: int):
+    """Informe de `python -X importtime`: módulos ordenados por tiempo acumulado"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", startup_code(target)],
+        cwd=TARGETS[target], capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:  self_us | cumulative_us | <2 espacios por nivel>módulo"
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), name[1:]))
+
+    top_level = [row for row in rows if not row[2].startswith(" ")]
+    print(f"{target}: {sum(r[0] for r in top_level) / 1000:.0f} ms total en imports")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>10.1f}ms {self_us / 1000:>8.1f}ms  {name.strip()}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("targets", nargs="*", default=list(TARGETS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--profile", metavar="TARGET", help="mostrar los módulos más lentos de importar")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--check", action="store_true", help="comparar con startup_budget.json")
+    args = parser.parse_args()
+
+    if args.profile:
+        profile(args.profile, args.top)
+        return
+
+    with open(BUDGET_FILE) as f:
+        budget = json.load(f)
+
+    failures = []
+    print(f"{'target':<14}{'import ms':>10}{'RSS MB':>9}{'modules':>9}   budget")
+    for target in args.targets:
+        try:
+            runs = [measure(target) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{target:<14}{'-':>10}{'-':>9}{'-':>9}   skipped ({e})")
+            continue
+
+        import_ms = statistics.median(r["import_ms"] for r in runs)
+        rss_mb = statistics.median(r["rss_mb"] for r in runs)
+        limits = budget.get(target, {})
+        over = [
+            f"{key} {value:.0f} > {limits[key]}"
+            for key, value in (("import_ms", import_ms), ("rss_mb", rss_mb))
+            if key in limits and value > limits[key]
+        ]
+        status = "OVER: " + ", ".join(over) if over else f"ok ({limits.get('import_ms', '-')} ms / {limits.get('rss_mb', '-')} MB)"
+        print(f"{target:<14}{import_ms:>10.0f}{rss_mb:>9.1f}{runs[0]['modules']:>9}   {status}")
+        if over:
+            failures.append(target)
+
+    if args.check and failures:
+        print(f"\n❌ Startup budget exceeded: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
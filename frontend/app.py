@@ -1,9 +1,8 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, date
 from utils.api_client import APIClient
+from utils.live_changes import live_changes
 
 # Configuración de la página
 st.set_page_config(
@@ -16,6 +15,9 @@ st.set_page_config(
 # Inicializar cliente API
 api = APIClient()
 
+# Cada cuánto comprueban los componentes en vivo si llegaron cambios (segundos)
+LIVE_CHECK_INTERVAL = 1
+
 # Estilos CSS personalizados
 st.markdown("""
 <style>
@@ -35,6 +37,39 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# ============================================
+# ACTUALIZACIÓN EN VIVO
+# ============================================
+
+def live_fragment(func):
+    """Componente que se redibuja solo, sin recargar el resto de la página.
+
+    Sin conexión al stream del gateway se comporta como un componente normal.
+    """
+    run_every = LIVE_CHECK_INTERVAL if live_changes.start() else None
+    return st.fragment(func, run_every=run_every)
+
+
+def live_data(key, topics, request):
+    """JSON de `request()`, que solo se vuelve a pedir cuando llegan cambios de `topics`.
+
+    Devuelve None si la API responde con error (no se guarda en la sesión).
+    """
+    if not live_changes.connected:
+        st.session_state.pop(f"live_{key}", None)
+        response = request()
+        return response.json() if response.status_code == 200 else None
+
+    version = live_changes.version(*topics)
+    cached = st.session_state.get(f"live_{key}")
+    if cached is None or cached[0] != version:
+        response = request()
+        if response.status_code != 200:
+            return None
+        cached = (version, response.json())
+        st.session_state[f"live_{key}"] = cached
+    return cached[1]
+
 # ============================================
 # AUTENTICACIÓN
 # ============================================
@@ -78,11 +113,16 @@ def login_page():
 def dashboard_page():
     st.markdown('<h1 class="main-header">📊 Dashboard</h1>', unsafe_allow_html=True)
 
-    try:
-        response = api.get_dashboard_statistics()
-        if response.status_code == 200:
-            stats = response.json()
+    live_fragment(dashboard_statistics)()
+    live_fragment(alerts_section)()
+
+
+def dashboard_statistics():
+    import plotly.express as px  # carga diferida: solo el dashboard dibuja gráficos
 
+    try:
+        stats = live_data("dashboard", ("equipment", "maintenance", "contracts"), api.get_dashboard_statistics)
+        if stats is not None:
             # Métricas principales
             col1, col2, col3, col4 = st.columns(4)
 
@@ -158,6 +198,47 @@ def dashboard_page():
     except Exception as e:
         st.error(f"Error: {str(e)}")
 
+
+def alerts_section():
+    """Alertas sin leer generadas por el motor de alertas del servicio de mantenimiento"""
+    try:
+        counts = live_data("alert_counts", ("alerts",), api.get_alert_counts)
+        if counts is None:
+            return
+
+        st.divider()
+        st.subheader(f"🔔 Alertas sin leer ({counts['total']})")
+        if counts['total'] == 0:
+            st.success("No hay alertas pendientes")
+            return
+
+        labels = {
+            "maintenance_due": "Mantenimiento",
+            "warranty_expiring": "Garantía",
+            "equipment_old": "Antigüedad",
+            "custom": "Otras",
+        }
+        cols = st.columns(len(counts['by_type']) or 1)
+        for col, (alert_type, count) in zip(cols, counts['by_type'].items()):
+            col.metric(labels.get(alert_type, alert_type), count)
+
+        alerts = live_data("alerts", ("alerts",), lambda: api.get_alerts({"unread_only": "true", "limit": 10}))
+        if alerts is not None:
+            icons = {"critical": "🔴", "high": "🟠", "medium": "🟡", "low": "⚪"}
+            for alert in alerts:
+                col1, col2 = st.columns([5, 1])
+                with col1:
+                    st.write(f"{icons.get(alert['priority'], '')} **{alert['title']}** — {alert['message']}")
+                with col2:
+                    if st.button("✔️ Leída", key=f"alert_read_{alert['id']}"):
+                        api.mark_alert_read(alert['id'])
+                        # Sin esperar al evento: el cambio propio se ve al momento
+                        st.session_state.pop("live_alerts", None)
+                        st.session_state.pop("live_alert_counts", None)
+                        st.rerun()
+    except Exception as e:
+        st.error(f"Error al cargar alertas: {str(e)}")
+
 # ============================================
 # GESTIÓN DE EQUIPOS
 # ============================================
@@ -200,7 +281,7 @@ def equipment_page():
 
         # Obtener equipos
         try:
-            params = {}
+            params = {'fields': 'asset_code,name,brand,model,status,category'}
             if search:
                 params['search'] = search
             if category_id:
@@ -432,9 +513,15 @@ def maintenance_page():
                 maintenance_list = response.json()
 
                 if maintenance_list:
+                    # Resolver nombres de equipos y proveedores con una llamada batch por tipo
+                    equipment_map = api.resolve_equipment({m['equipment_id'] for m in maintenance_list})
+                    provider_map = api.resolve_providers({m['provider_id'] for m in maintenance_list if m.get('provider_id')})
+
                     # Mostrar cada mantenimiento con opciones de editar/eliminar
                     for maint in maintenance_list:
-                        with st.expander(f"🔧 Mantenimiento #{maint['id']} - Equipo {maint['equipment_id']} - {maint['type']} - {maint['status']}"):
+                        equipment = equipment_map.get(maint['equipment_id'])
+                        equipment_label = f"{equipment['asset_code']} - {equipment['name']}" if equipment else f"Equipo {maint['equipment_id']}"
+                        with st.expander(f"🔧 Mantenimiento #{maint['id']} - {equipment_label} - {maint['type']} - {maint['status']}"):
                             col1, col2 = st.columns([3, 1])
 
                             with col1:
@@ -442,6 +529,8 @@ def maintenance_page():
                                 st.write(f"**Fecha Programada:** {maint.get('scheduled_date', 'N/A')}")
                                 st.write(f"**Fecha Realizada:** {maint.get('performed_date', 'N/A')}")
                                 st.write(f"**Técnico:** {maint.get('technician', 'N/A')}")
+                                if maint.get('provider_id') in provider_map:
+                                    st.write(f"**Proveedor:** {provider_map[maint['provider_id']]['name']}")
                                 st.write(f"**Costo:** ${maint.get('cost', 0)}")
                                 if maint.get('diagnosis'):
                                     st.write(f"**Diagnóstico:** {maint['diagnosis']}")
@@ -571,23 +660,20 @@ def maintenance_page():
         else:
             st.subheader("Registrar Nuevo Mantenimiento")
 
-            # Obtener lista de equipos ANTES del formulario
+            # Obtener equipos y proveedores ANTES del formulario (una sola petición al gateway)
             equipment_options = {}
-            try:
-                equip_response = api.get_equipment()
-                if equip_response.status_code == 200:
-                    equipment_list = equip_response.json()
-                    equipment_options = {f"{eq['asset_code']} - {eq['name']}": eq['id'] for eq in equipment_list}
-            except:
-                pass
-
-            # Obtener proveedores ANTES del formulario
             provider_options = {"Ninguno": None}
             try:
-                prov_response = api.get_providers()
-                if prov_response.status_code == 200:
-                    providers = prov_response.json()
-                    provider_options.update({p['name']: p['id'] for p in providers})
+                batch_response = api.batch([
+                    {"id": "equipment", "path": "/api/equipment/equipment", "query": {"fields": "id,asset_code,name"}},
+                    {"id": "providers", "path": "/api/providers/providers", "query": {"fields": "id,name"}},
+                ])
+                if batch_response.status_code == 200:
+                    results = {r['id']: r for r in batch_response.json()['responses']}
+                    if results['equipment']['status'] == 200:
+                        equipment_options = {f"{eq['asset_code']} - {eq['name']}": eq['id'] for eq in results['equipment']['body']}
+                    if results['providers']['status'] == 200:
+                        provider_options.update({p['name']: p['id'] for p in results['providers']['body']})
             except:
                 pass
 
@@ -646,72 +732,80 @@ def maintenance_page():
                             st.warning("Complete los campos obligatorios (*)")
 
     with tab3:
-        st.subheader("Mantenimientos Próximos (30 días)")
+        live_fragment(upcoming_maintenance_section)()
 
-        try:
-            response = api.get_upcoming_maintenance(30)
+    with tab4:
+        live_fragment(overdue_maintenance_section)()
 
-            if response.status_code == 200:
-                upcoming = response.json()
 
-                if upcoming:
-                    for maint in upcoming:
-                        with st.container():
-                            col1, col2, col3 = st.columns([2, 2, 1])
-                            with col1:
-                                st.write(f"**Equipo ID:** {maint['equipment_id']}")
-                                st.write(f"**Tipo:** {maint['type']}")
-                            with col2:
-                                st.write(f"**Fecha:** {maint['scheduled_date']}")
-                                st.write(f"**Técnico:** {maint.get('technician', 'N/A')}")
-                            with col3:
-                                if st.button("Ver Detalles", key=f"upcoming_{maint['id']}"):
-                                    st.session_state['edit_maintenance_id'] = maint['id']
-                                    st.session_state['editing_maintenance'] = True
-                                    st.rerun()
-                            st.divider()
-                    st.info(f"Total: {len(upcoming)} mantenimientos programados")
-                else:
-                    st.success("✅ No hay mantenimientos programados para los próximos 30 días")
-            else:
-                st.error("Error al cargar mantenimientos próximos")
+def upcoming_maintenance_section():
+    st.subheader("Mantenimientos Próximos (30 días)")
 
-        except Exception as e:
-            st.error(f"Error: {str(e)}")
+    try:
+        upcoming = live_data("upcoming_maintenance", ("maintenance",), lambda: api.get_upcoming_maintenance(30))
+
+        if upcoming is not None:
+            if upcoming:
+                equipment_map = api.resolve_equipment({m['equipment_id'] for m in upcoming})
+                for maint in upcoming:
+                    with st.container():
+                        col1, col2, col3 = st.columns([2, 2, 1])
+                        with col1:
+                            equipment = equipment_map.get(maint['equipment_id'])
+                            st.write(f"**Equipo:** {equipment['asset_code'] + ' - ' + equipment['name'] if equipment else maint['equipment_id']}")
+                            st.write(f"**Tipo:** {maint['type']}")
+                        with col2:
+                            st.write(f"**Fecha:** {maint['scheduled_date']}")
+                            st.write(f"**Técnico:** {maint.get('technician', 'N/A')}")
+                        with col3:
+                            if st.button("Ver Detalles", key=f"upcoming_{maint['id']}"):
+                                st.session_state['edit_maintenance_id'] = maint['id']
+                                st.session_state['editing_maintenance'] = True
+                                st.rerun()
+                        st.divider()
+                st.info(f"Total: {len(upcoming)} mantenimientos programados")
+            else:
+                st.success("✅ No hay mantenimientos programados para los próximos 30 días")
+        else:
+            st.error("Error al cargar mantenimientos próximos")
 
-    with tab4:
-        st.subheader("Mantenimientos Vencidos")
+    except Exception as e:
+        st.error(f"Error: {str(e)}")
 
-        try:
-            response = api.get_overdue_maintenance()
 
-            if response.status_code == 200:
-                overdue = response.json()
+def overdue_maintenance_section():
+    st.subheader("Mantenimientos Vencidos")
 
-                if overdue:
-                    for maint in overdue:
-                        with st.container():
-                            col1, col2, col3 = st.columns([2, 2, 1])
-                            with col1:
-                                st.write(f"**Equipo ID:** {maint['equipment_id']}")
-                                st.write(f"**Tipo:** {maint['type']}")
-                            with col2:
-                                st.write(f"**Fecha Programada:** {maint['scheduled_date']}")
-                                st.write(f"**Descripción:** {maint['description'][:50]}...")
-                            with col3:
-                                if st.button("Actualizar", key=f"overdue_{maint['id']}"):
-                                    st.session_state['edit_maintenance_id'] = maint['id']
-                                    st.session_state['editing_maintenance'] = True
-                                    st.rerun()
-                            st.divider()
-                    st.warning(f"⚠️ Hay {len(overdue)} mantenimientos vencidos")
-                else:
-                    st.success("✅ No hay mantenimientos vencidos")
+    try:
+        overdue = live_data("overdue_maintenance", ("maintenance",), api.get_overdue_maintenance)
+
+        if overdue is not None:
+            if overdue:
+                equipment_map = api.resolve_equipment({m['equipment_id'] for m in overdue})
+                for maint in overdue:
+                    with st.container():
+                        col1, col2, col3 = st.columns([2, 2, 1])
+                        with col1:
+                            equipment = equipment_map.get(maint['equipment_id'])
+                            st.write(f"**Equipo:** {equipment['asset_code'] + ' - ' + equipment['name'] if equipment else maint['equipment_id']}")
+                            st.write(f"**Tipo:** {maint['type']}")
+                        with col2:
+                            st.write(f"**Fecha Programada:** {maint['scheduled_date']}")
+                            st.write(f"**Descripción:** {maint['description'][:50]}...")
+                        with col3:
+                            if st.button("Actualizar", key=f"overdue_{maint['id']}"):
+                                st.session_state['edit_maintenance_id'] = maint['id']
+                                st.session_state['editing_maintenance'] = True
+                                st.rerun()
+                        st.divider()
+                st.warning(f"⚠️ Hay {len(overdue)} mantenimientos vencidos")
             else:
-                st.error("Error al cargar mantenimientos vencidos")
+                st.success("✅ No hay mantenimientos vencidos")
+        else:
+            st.error("Error al cargar mantenimientos vencidos")
 
-        except Exception as e:
-            st.error(f"Error: {str(e)}")
+    except Exception as e:
+        st.error(f"Error: {str(e)}")
 
 # ============================================
 # REPORTES
@@ -792,6 +886,7 @@ def main():
         user = st.session_state.get('user', {})
         st.markdown(f"### 👤 {user.get('full_name', 'Usuario')}")
         st.markdown(f"**Rol:** {user.get('role', 'N/A')}")
+        st.caption("🟢 Actualización en vivo" if live_changes.connected else "⚪ Sin actualización en vivo")
 
         st.divider()
 
@@ -813,6 +908,11 @@ def main():
         st.divider()
 
         if st.button("🚪 Cerrar Sesión", use_container_width=True):
+            # Revocar el token en el servidor; la sesión local se cierra igualmente
+            try:
+                api.logout()
+            except Exception:
+                pass
             st.session_state.clear()
             st.rerun()
 
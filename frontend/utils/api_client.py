@@ -1,6 +1,7 @@
 import requests
 import streamlit as st
 import os
+from utils.entity_cache import entity_cache
 
 API_BASE_URL = os.getenv("API_GATEWAY_URL", "http://api-gateway:8000")
 
@@ -22,6 +23,13 @@ class APIClient:
         )
         return response
 
+    def logout(self):
+        response = requests.post(
+            f"{self.base_url}/api/auth/logout",
+            headers=self._get_headers()
+        )
+        return response
+
     def get_current_user(self):
         response = requests.get(
             f"{self.base_url}/api/auth/me",
@@ -29,12 +37,21 @@ class APIClient:
         )
         return response
 
+    def batch(self, requests_list):
+        """Varias peticiones en una sola ida y vuelta: [{id, method, path, query, body}]"""
+        response = requests.post(
+            f"{self.base_url}/api/batch",
+            headers=self._get_headers(),
+            json={"requests": requests_list}
+        )
+        return response
+
     # Equipment endpoints
     def get_equipment(self, params=None):
         response = requests.get(
             f"{self.base_url}/api/equipment/equipment",
             headers=self._get_headers(),
-            params=params or {}
+            params={"fast": "true", **(params or {})}
         )
         return response
 
@@ -52,6 +69,7 @@ class APIClient:
             headers=self._get_headers(),
             json=data
         )
+        entity_cache.invalidate("equipment", equipment_id)
         return response
 
     def delete_equipment(self, equipment_id):
@@ -59,6 +77,7 @@ class APIClient:
             f"{self.base_url}/api/equipment/equipment/{equipment_id}",
             headers=self._get_headers()
         )
+        entity_cache.invalidate("equipment", equipment_id)
         return response
 
     def get_categories(self):
@@ -80,7 +99,7 @@ class APIClient:
         response = requests.get(
             f"{self.base_url}/api/providers/providers",
             headers=self._get_headers(),
-            params=params or {}
+            params={"fast": "true", **(params or {})}
         )
         return response
 
@@ -98,14 +117,44 @@ class APIClient:
             headers=self._get_headers(),
             json=data
         )
+        entity_cache.invalidate("provider", provider_id)
+        return response
+
+    # Batch lookups (una llamada por tipo de entidad)
+    def get_equipment_batch(self, ids):
+        response = requests.post(
+            f"{self.base_url}/api/equipment/equipment/batch",
+            headers=self._get_headers(),
+            json={"ids": list(ids)}
+        )
         return response
 
+    def get_providers_batch(self, ids):
+        response = requests.post(
+            f"{self.base_url}/api/providers/providers/batch",
+            headers=self._get_headers(),
+            json={"ids": list(ids)}
+        )
+        return response
+
+    def _resolve(self, entity, ids, batch_call):
+        def fetch(missing):
+            response = batch_call(missing)
+            return response.json() if response.status_code == 200 else []
+        return entity_cache.resolve(entity, ids, fetch)
+
+    def resolve_equipment(self, ids):
+        return self._resolve("equipment", ids, self.get_equipment_batch)
+
+    def resolve_providers(self, ids):
+        return self._resolve("provider", ids, self.get_providers_batch)
+
     # Maintenance endpoints
     def get_maintenance(self, params=None):
         response = requests.get(
             f"{self.base_url}/api/maintenance/maintenance",
             headers=self._get_headers(),
-            params=params or {}
+            params={"fast": "true", **(params or {})}
         )
         return response
 
@@ -132,6 +181,29 @@ class APIClient:
         )
         return response
 
+    # Alerts endpoints
+    def get_alerts(self, params=None):
+        response = requests.get(
+            f"{self.base_url}/api/maintenance/alerts",
+            headers=self._get_headers(),
+            params=params
+        )
+        return response
+
+    def get_alert_counts(self):
+        response = requests.get(
+            f"{self.base_url}/api/maintenance/alerts/unread-count",
+            headers=self._get_headers()
+        )
+        return response
+
+    def mark_alert_read(self, alert_id):
+        response = requests.post(
+            f"{self.base_url}/api/maintenance/alerts/{alert_id}/read",
+            headers=self._get_headers()
+        )
+        return response
+
     # Reports endpoints
     def get_dashboard_statistics(self):
         response = requests.get(
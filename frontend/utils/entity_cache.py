@@ -0,0 +1,58 @@
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_TTL_SECONDS = 300
+CACHE_MAX_ENTRIES = 5000
+
+
+class EntityCache:
+    """Caché compartida (por proceso) de entidades resueltas por ID.
+
+    Las IDs que faltan se resuelven con una única llamada batch por tipo de
+    entidad, de modo que enriquecer una página de 100 filas cuesta como
+    máximo un round-trip adicional por tipo y ninguno si ya están en caché.
+    """
+
+    def __init__(self, ttl_seconds=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, entity, ids, fetch):
+        """Devuelve {id: registro} usando `fetch(ids_faltantes)` para lo que no esté en caché"""
+        wanted = {int(i) for i in ids if i is not None}
+        now = time.monotonic()
+        found = {}
+
+        with self._lock:
+            for entity_id in wanted:
+                entry = self._entries.get((entity, entity_id))
+                if entry and entry[0] > now:
+                    found[entity_id] = entry[1]
+
+        missing = sorted(wanted - found.keys())
+        if missing:
+            records = fetch(missing) or []
+            expires = now + self.ttl_seconds
+            with self._lock:
+                for record in records:
+                    self._entries[(entity, record['id'])] = (expires, record)
+                    self._entries.move_to_end((entity, record['id']))
+                    found[record['id']] = record
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        return found
+
+    def invalidate(self, entity, entity_id=None):
+        with self._lock:
+            if entity_id is None:
+                for key in [k for k in self._entries if k[0] == entity]:
+                    del self._entries[key]
+            else:
+                self._entries.pop((entity, int(entity_id)), None)
+
+
+entity_cache = EntityCache()
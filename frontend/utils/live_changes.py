@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+import time
+
+import requests
+
+from utils.entity_cache import entity_cache
+
+API_BASE_URL = os.getenv("API_GATEWAY_URL", "http://api-gateway:8000")
+
+LIVE_TOPICS = ("equipment", "maintenance", "alerts", "contracts")
+# Más que el heartbeat del gateway (15 s): sin datos en ese tiempo la conexión está muerta
+READ_TIMEOUT_SECONDS = 45
+MAX_BACKOFF_SECONDS = 30
+
+
+class LiveChanges:
+    """Escucha el stream SSE del gateway (una conexión por proceso de Streamlit).
+
+    Lleva un contador de versión por tema; cada componente de la página guarda
+    la versión con la que cargó sus datos y solo vuelve a pedirlos a la API
+    cuando la versión cambia. También invalida la caché de entidades con los
+    equipos modificados.
+    """
+
+    def __init__(self, base_url=API_BASE_URL):
+        self.url = f"{base_url}/api/events/stream"
+        self.connected = False
+        self.last_event_id = None
+        self._versions = {topic: 0 for topic in LIVE_TOPICS}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Arrancar el hilo lector (idempotente); devuelve si hay conexión activa"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="live-changes", daemon=True)
+                self._thread.start()
+        return self.connected
+
+    def version(self, *topics):
+        with self._lock:
+            return tuple(self._versions.get(topic, 0) for topic in topics)
+
+    def _bump(self, topics):
+        with self._lock:
+            for topic in topics:
+                self._versions[topic] = self._versions.get(topic, 0) + 1
+
+    def _run(self):
+        backoff = 1
+        while True:
+            headers = {"Accept": "text/event-stream"}
+            if self.last_event_id:
+                headers["Last-Event-ID"] = self.last_event_id
+            try:
+                with requests.get(self.url, headers=headers, stream=True, timeout=(5, READ_TIMEOUT_SECONDS)) as response:
+                    response.raise_for_status()
+                    self.connected = True
+                    backoff = 1
+                    self._consume(response.iter_lines(decode_unicode=True))
+            except requests.RequestException:
+                pass
+            if self.connected:
+                # Lo ocurrido mientras no había conexión no se sabe: recargar todo
+                self.connected = False
+                self._resync()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+
+    def _consume(self, lines):
+        event, data = "message", []
+        for line in lines:
+            if line == "":
+                if data:
+                    self._dispatch(event, "\n".join(data))
+                event, data = "message", []
+                continue
+            if line.startswith(":"):  # heartbeat
+                continue
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "event":
+                event = value
+            elif field == "data":
+                data.append(value)
+            elif field == "id":
+                self.last_event_id = value
+
+    def _dispatch(self, event, data):
+        if event == "resync":
+            self._resync()
+            return
+        if event != "change":
+            return
+        notification = json.loads(data)
+        if notification["topic"] == "equipment" and notification.get("aggregate_id"):
+            entity_cache.invalidate("equipment", notification["aggregate_id"])
+        self._bump([notification["topic"]])
+
+    def _resync(self):
+        entity_cache.invalidate("equipment")
+        self._bump(LIVE_TOPICS)
+
+
+live_changes = LiveChanges()
@@ -24,6 +24,18 @@ CREATE TABLE IF NOT EXISTS users (
     INDEX idx_role (role)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Sesiones (jti de cada token) y revocaciones
+CREATE TABLE IF NOT EXISTS user_sessions (
+    jti VARCHAR(32) PRIMARY KEY,
+    user_id INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at DATETIME NOT NULL,
+    revoked_at DATETIME NULL,
+    INDEX idx_user_id (user_id),
+    INDEX idx_expires_at (expires_at),
+    INDEX idx_revoked_at (revoked_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- =============================================
 -- TABLA DE PROVEEDORES
 -- =============================================
@@ -111,6 +123,11 @@ CREATE TABLE IF NOT EXISTS equipment (
     current_location_id INT,
     assigned_to VARCHAR(100),
     specifications JSON,
+    -- Claves de specifications indexadas (registro en equipment-service/app/specs.py)
+    spec_ram_gb DECIMAL(12,2) AS (JSON_VALUE(specifications, '$.ram_gb' RETURNING DECIMAL(12,2) NULL ON ERROR)) VIRTUAL,
+    spec_storage_gb DECIMAL(12,2) AS (JSON_VALUE(specifications, '$.storage_gb' RETURNING DECIMAL(12,2) NULL ON ERROR)) VIRTUAL,
+    spec_cpu VARCHAR(100) AS (JSON_VALUE(specifications, '$.cpu' RETURNING CHAR(100) NULL ON ERROR)) VIRTUAL,
+    spec_os VARCHAR(100) AS (JSON_VALUE(specifications, '$.os' RETURNING CHAR(100) NULL ON ERROR)) VIRTUAL,
     notes TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
@@ -120,6 +137,13 @@ CREATE TABLE IF NOT EXISTS equipment (
     INDEX idx_status (status),
     INDEX idx_category (category_id),
     INDEX idx_location (current_location_id),
+    INDEX idx_warranty_end (warranty_end_date),
+    INDEX idx_purchase_date (purchase_date),
+    INDEX idx_updated_at (updated_at),
+    INDEX idx_spec_ram_gb (spec_ram_gb),
+    INDEX idx_spec_storage_gb (spec_storage_gb),
+    INDEX idx_spec_cpu (spec_cpu),
+    INDEX idx_spec_os (spec_os),
     FOREIGN KEY (category_id) REFERENCES equipment_categories(id) ON DELETE SET NULL,
     FOREIGN KEY (provider_id) REFERENCES providers(id) ON DELETE SET NULL,
     FOREIGN KEY (current_location_id) REFERENCES locations(id) ON DELETE SET NULL,
@@ -135,11 +159,14 @@ CREATE TABLE IF NOT EXISTS equipment_location_history (
     location_id INT NOT NULL,
     assigned_to VARCHAR(100),
     move_date DATE NOT NULL,
+    -- Fin (excluido) de la estancia: fecha del siguiente movimiento, 9999-12-31 si sigue abierta
+    valid_to DATE NOT NULL DEFAULT '9999-12-31',
     reason TEXT,
     moved_by INT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    INDEX idx_equipment (equipment_id),
-    INDEX idx_location (location_id),
+    INDEX idx_equipment_stay (equipment_id, move_date),
+    INDEX idx_location_stay (location_id, move_date, valid_to, equipment_id),
+    INDEX idx_location_stay_end (location_id, valid_to, move_date, equipment_id),
     INDEX idx_move_date (move_date),
     FOREIGN KEY (equipment_id) REFERENCES equipment(id) ON DELETE CASCADE,
     FOREIGN KEY (location_id) REFERENCES locations(id) ON DELETE CASCADE,
@@ -183,6 +210,7 @@ CREATE TABLE IF NOT EXISTS maintenance (
     INDEX idx_status (status),
     INDEX idx_scheduled_date (scheduled_date),
     INDEX idx_performed_date (performed_date),
+    INDEX idx_updated_at (updated_at),
     FOREIGN KEY (equipment_id) REFERENCES equipment(id) ON DELETE CASCADE,
     FOREIGN KEY (maintenance_type_id) REFERENCES maintenance_types(id) ON DELETE SET NULL,
     FOREIGN KEY (provider_id) REFERENCES providers(id) ON DELETE SET NULL,
@@ -218,14 +246,24 @@ CREATE TABLE IF NOT EXISTS alerts (
     assigned_to INT,
     due_date DATE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Una alerta por equipo, tipo y fecha (el motor de alertas hace upsert sobre esta clave)
+    UNIQUE KEY uq_alert (alert_type, equipment_id, due_date),
     INDEX idx_equipment (equipment_id),
     INDEX idx_type (alert_type),
     INDEX idx_assigned (assigned_to),
-    INDEX idx_is_read (is_read),
+    INDEX idx_unread (is_read, alert_type, id),
     FOREIGN KEY (equipment_id) REFERENCES equipment(id) ON DELETE CASCADE,
     FOREIGN KEY (assigned_to) REFERENCES users(id) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Marcas de agua del motor de alertas (maintenance-service/app/alerts.py)
+CREATE TABLE IF NOT EXISTS alert_watermarks (
+    alert_type VARCHAR(50) PRIMARY KEY,
+    date_watermark DATE,
+    changed_watermark DATETIME,
+    last_run_at DATETIME
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- =============================================
 -- TABLA DE LOGS DE AUDITORÍA
 -- =============================================
@@ -246,11 +284,123 @@ CREATE TABLE IF NOT EXISTS audit_logs (
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- =============================================
+-- TABLA DE EVENTOS DE CAMBIO (OUTBOX)
+-- =============================================
+-- Cada servicio inserta aquí sus cambios en la misma transacción; reports-service
+-- los sirve por orden de id en GET /changes
+CREATE TABLE IF NOT EXISTS outbox_events (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    aggregate_type VARCHAR(50) NOT NULL,
+    aggregate_id INT,
+    event_type VARCHAR(100) NOT NULL,
+    payload JSON,
+    source VARCHAR(50),
+    created_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX idx_created_at (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- =============================================
+-- TABLAS DE ARCHIVO (CICLO DE VIDA DE LOS DATOS)
+-- =============================================
+-- Registros cerrados que el ciclo de vida (reports-service/app/lifecycle.py) saca
+-- de las tablas vivas. Particionadas por año (las vivas no pueden: MySQL no admite
+-- claves foráneas en tablas particionadas) y comprimidas; sin claves foráneas para
+-- que el archivo sobreviva a bajas de equipos, ubicaciones o usuarios.
+-- Solo se consultan con include_archive=true.
+CREATE TABLE IF NOT EXISTS maintenance_archive (
+    id INT NOT NULL,
+    equipment_id INT NOT NULL,
+    maintenance_type_id INT,
+    type ENUM('preventive', 'corrective') NOT NULL,
+    scheduled_date DATE,
+    performed_date DATE,
+    technician VARCHAR(100),
+    provider_id INT,
+    description TEXT NOT NULL,
+    diagnosis TEXT,
+    solution TEXT,
+    cost DECIMAL(10, 2),
+    status ENUM('scheduled', 'in_progress', 'completed', 'cancelled'),
+    next_maintenance_date DATE,
+    attachments JSON,
+    created_at TIMESTAMP NULL,
+    updated_at TIMESTAMP NULL,
+    created_by INT,
+    -- performed_date, o scheduled_date/created_at si se canceló sin realizarse
+    archive_date DATE NOT NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, archive_date),
+    INDEX idx_equipment (equipment_id),
+    INDEX idx_performed_date (performed_date),
+    INDEX idx_scheduled_date (scheduled_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE (YEAR(archive_date)) (
+    PARTITION p_old VALUES LESS THAN (2020),
+    PARTITION p2020 VALUES LESS THAN (2021),
+    PARTITION p2021 VALUES LESS THAN (2022),
+    PARTITION p2022 VALUES LESS THAN (2023),
+    PARTITION p2023 VALUES LESS THAN (2024),
+    PARTITION p2024 VALUES LESS THAN (2025),
+    PARTITION p2025 VALUES LESS THAN (2026),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+CREATE TABLE IF NOT EXISTS maintenance_parts_archive (
+    id INT NOT NULL,
+    maintenance_id INT NOT NULL,
+    part_name VARCHAR(200) NOT NULL,
+    quantity INT,
+    unit_cost DECIMAL(10, 2),
+    total_cost DECIMAL(10, 2),
+    created_at TIMESTAMP NULL,
+    archive_date DATE NOT NULL,
+    PRIMARY KEY (id, archive_date),
+    INDEX idx_maintenance (maintenance_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE (YEAR(archive_date)) (
+    PARTITION p_old VALUES LESS THAN (2020),
+    PARTITION p2020 VALUES LESS THAN (2021),
+    PARTITION p2021 VALUES LESS THAN (2022),
+    PARTITION p2022 VALUES LESS THAN (2023),
+    PARTITION p2023 VALUES LESS THAN (2024),
+    PARTITION p2024 VALUES LESS THAN (2025),
+    PARTITION p2025 VALUES LESS THAN (2026),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+CREATE TABLE IF NOT EXISTS equipment_location_history_archive (
+    id INT NOT NULL,
+    equipment_id INT NOT NULL,
+    location_id INT NOT NULL,
+    assigned_to VARCHAR(100),
+    move_date DATE NOT NULL,
+    valid_to DATE NOT NULL,
+    reason TEXT,
+    moved_by INT,
+    created_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, move_date),
+    INDEX idx_equipment_stay (equipment_id, move_date),
+    INDEX idx_location_stay (location_id, move_date, valid_to, equipment_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE (YEAR(move_date)) (
+    PARTITION p_old VALUES LESS THAN (2020),
+    PARTITION p2020 VALUES LESS THAN (2021),
+    PARTITION p2021 VALUES LESS THAN (2022),
+    PARTITION p2022 VALUES LESS THAN (2023),
+    PARTITION p2023 VALUES LESS THAN (2024),
+    PARTITION p2024 VALUES LESS THAN (2025),
+    PARTITION p2025 VALUES LESS THAN (2026),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
 -- =============================================
 -- DATOS INICIALES
 -- =============================================
 
 -- Usuario administrador por defecto (password: admin123)
+-- Se cargan en texto plano; auth-service las convierte a bcrypt en el primer login
 INSERT INTO users (username, email, password_hash, full_name, role) VALUES
 ('admin', 'admin@universidad.edu', 'admin123', 'Administrador del Sistema', 'admin'),
 ('tecnico1', 'tecnico1@universidad.edu', 'admin123', 'Juan Pérez', 'technician'),
@@ -390,10 +540,10 @@ INSERT INTO maintenance_parts (maintenance_id, part_name, quantity, unit_cost, t
 -- HISTORIAL DE UBICACIONES
 -- =============================================
 
-INSERT INTO equipment_location_history (equipment_id, location_id, assigned_to, move_date, reason, moved_by) VALUES
-(1, 1, 'María Torres', '2024-01-15', 'Asignación inicial del equipo', 1),
-(5, 4, 'Laura Vega', '2023-08-12', 'Asignación inicial del equipo', 1),
-(5, 2, NULL, '2024-04-18', 'Movido a soporte técnico para reparación', 2),
-(5, 4, 'Laura Vega', '2024-04-19', 'Equipo reparado, devuelto a ubicación original', 2),
-(9, 5, NULL, '2023-09-18', 'Asignación inicial a biblioteca', 1),
-(9, 2, NULL, '2024-04-20', 'Movido a soporte para diagnóstico y reparación', 2);
+INSERT INTO equipment_location_history (equipment_id, location_id, assigned_to, move_date, valid_to, reason, moved_by) VALUES
+(1, 1, 'María Torres', '2024-01-15', '9999-12-31', 'Asignación inicial del equipo', 1),
+(5, 4, 'Laura Vega', '2023-08-12', '2024-04-18', 'Asignación inicial del equipo', 1),
+(5, 2, NULL, '2024-04-18', '2024-04-19', 'Movido a soporte técnico para reparación', 2),
+(5, 4, 'Laura Vega', '2024-04-19', '9999-12-31', 'Equipo reparado, devuelto a ubicación original', 2),
+(9, 5, NULL, '2023-09-18', '2024-04-20', 'Asignación inicial a biblioteca', 1),
+(9, 2, NULL, '2024-04-20', '9999-12-31', 'Movido a soporte para diagnóstico y reparación', 2);
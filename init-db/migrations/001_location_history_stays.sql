@@ -0,0 +1,28 @@
+-- =============================================
+-- Historial de ubicaciones como estancias [move_date, valid_to)
+-- Para bases de datos creadas antes del cambio (init.sql ya lo incluye):
+--   docker exec -i it-management-mysql mysql -uroot -padmin it_management < init-db/migrations/001_location_history_stays.sql
+-- =============================================
+USE it_management;
+
+ALTER TABLE equipment_location_history
+    ADD COLUMN valid_to DATE NOT NULL DEFAULT '9999-12-31' AFTER move_date;
+
+-- Cada estancia termina el día del siguiente movimiento del mismo equipo
+UPDATE equipment_location_history h
+JOIN (
+    SELECT id, LEAD(move_date) OVER (PARTITION BY equipment_id ORDER BY move_date, id) AS next_move
+    FROM equipment_location_history
+) stays ON stays.id = h.id
+SET h.valid_to = stays.next_move
+WHERE stays.next_move IS NOT NULL;
+
+-- Los índices nuevos cubren las claves foráneas, los de una sola columna sobran
+ALTER TABLE equipment_location_history
+    ADD INDEX idx_equipment_stay (equipment_id, move_date),
+    ADD INDEX idx_location_stay (location_id, move_date, valid_to, equipment_id),
+    ADD INDEX idx_location_stay_end (location_id, valid_to, move_date, equipment_id);
+
+ALTER TABLE equipment_location_history
+    DROP INDEX idx_equipment,
+    DROP INDEX idx_location;
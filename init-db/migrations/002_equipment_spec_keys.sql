@@ -0,0 +1,17 @@
+-- =============================================
+-- Columnas virtuales e índices de las claves de specifications registradas
+-- (generado con `python -m app.specs` en equipment-service)
+-- =============================================
+USE it_management;
+
+ALTER TABLE equipment
+    ADD COLUMN spec_ram_gb DECIMAL(12,2) AS (JSON_VALUE(specifications, '$.ram_gb' RETURNING DECIMAL(12,2) NULL ON ERROR)) VIRTUAL,
+    ADD COLUMN spec_storage_gb DECIMAL(12,2) AS (JSON_VALUE(specifications, '$.storage_gb' RETURNING DECIMAL(12,2) NULL ON ERROR)) VIRTUAL,
+    ADD COLUMN spec_cpu VARCHAR(100) AS (JSON_VALUE(specifications, '$.cpu' RETURNING CHAR(100) NULL ON ERROR)) VIRTUAL,
+    ADD COLUMN spec_os VARCHAR(100) AS (JSON_VALUE(specifications, '$.os' RETURNING CHAR(100) NULL ON ERROR)) VIRTUAL;
+
+ALTER TABLE equipment
+    ADD INDEX idx_spec_ram_gb (spec_ram_gb),
+    ADD INDEX idx_spec_storage_gb (spec_storage_gb),
+    ADD INDEX idx_spec_cpu (spec_cpu),
+    ADD INDEX idx_spec_os (spec_os);
@@ -0,0 +1,35 @@
+-- =============================================
+-- Motor de alertas incremental (maintenance-service/app/alerts.py)
+-- Para bases de datos creadas antes del cambio (init.sql ya lo incluye):
+--   docker exec -i it-management-mysql mysql -uroot -padmin it_management < init-db/migrations/003_alert_engine.sql
+-- =============================================
+USE it_management;
+
+-- Quitar duplicados (se conserva la alerta más antigua) antes de la clave única
+DELETE a FROM alerts a
+JOIN alerts b
+    ON b.alert_type = a.alert_type
+    AND b.equipment_id = a.equipment_id
+    AND b.due_date <=> a.due_date
+    AND b.id < a.id;
+
+ALTER TABLE alerts
+    ADD UNIQUE KEY uq_alert (alert_type, equipment_id, due_date),
+    ADD INDEX idx_unread (is_read, alert_type, id),
+    DROP INDEX idx_is_read;
+
+CREATE TABLE IF NOT EXISTS alert_watermarks (
+    alert_type VARCHAR(50) PRIMARY KEY,
+    date_watermark DATE,
+    changed_watermark DATETIME,
+    last_run_at DATETIME
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Ventanas por fecha y lectura de cambios por updated_at
+ALTER TABLE equipment
+    ADD INDEX idx_warranty_end (warranty_end_date),
+    ADD INDEX idx_purchase_date (purchase_date),
+    ADD INDEX idx_updated_at (updated_at);
+
+ALTER TABLE maintenance
+    ADD INDEX idx_updated_at (updated_at);
@@ -0,0 +1,17 @@
+-- =============================================
+-- Outbox transaccional y feed de cambios (GET /changes en reports-service)
+-- Para bases de datos creadas antes del cambio (init.sql ya lo incluye):
+--   docker exec -i it-management-mysql mysql -uroot -padmin it_management < init-db/migrations/004_outbox_events.sql
+-- =============================================
+USE it_management;
+
+CREATE TABLE IF NOT EXISTS outbox_events (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    aggregate_type VARCHAR(50) NOT NULL,
+    aggregate_id INT,
+    event_type VARCHAR(100) NOT NULL,
+    payload JSON,
+    source VARCHAR(50),
+    created_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX idx_created_at (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,98 @@
+-- =============================================
+-- Archivo de mantenimientos e historial de ubicaciones (reports-service/app/lifecycle.py)
+-- Para bases de datos creadas antes del cambio (init.sql ya lo incluye):
+--   docker exec -i it-management-mysql mysql -uroot -padmin it_management < init-db/migrations/005_data_lifecycle.sql
+-- =============================================
+USE it_management;
+
+-- Registros cerrados que el ciclo de vida (reports-service/app/lifecycle.py) saca
+-- de las tablas vivas. Particionadas por año (las vivas no pueden: MySQL no admite
+-- claves foráneas en tablas particionadas) y comprimidas; sin claves foráneas para
+-- que el archivo sobreviva a bajas de equipos, ubicaciones o usuarios.
+-- Solo se consultan con include_archive=true.
+CREATE TABLE IF NOT EXISTS maintenance_archive (
+    id INT NOT NULL,
+    equipment_id INT NOT NULL,
+    maintenance_type_id INT,
+    type ENUM('preventive', 'corrective') NOT NULL,
+    scheduled_date DATE,
+    performed_date DATE,
+    technician VARCHAR(100),
+    provider_id INT,
+    description TEXT NOT NULL,
+    diagnosis TEXT,
+    solution TEXT,
+    cost DECIMAL(10, 2),
+    status ENUM('scheduled', 'in_progress', 'completed', 'cancelled'),
+    next_maintenance_date DATE,
+    attachments JSON,
+    created_at TIMESTAMP NULL,
+    updated_at TIMESTAMP NULL,
+    created_by INT,
+    -- performed_date, o scheduled_date/created_at si se canceló sin realizarse
+    archive_date DATE NOT NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, archive_date),
+    INDEX idx_equipment (equipment_id),
+    INDEX idx_performed_date (performed_date),
+    INDEX idx_scheduled_date (scheduled_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE (YEAR(archive_date)) (
+    PARTITION p_old VALUES LESS THAN (2020),
+    PARTITION p2020 VALUES LESS THAN (2021),
+    PARTITION p2021 VALUES LESS THAN (2022),
+    PARTITION p2022 VALUES LESS THAN (2023),
+    PARTITION p2023 VALUES LESS THAN (2024),
+    PARTITION p2024 VALUES LESS THAN (2025),
+    PARTITION p2025 VALUES LESS THAN (2026),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+CREATE TABLE IF NOT EXISTS maintenance_parts_archive (
+    id INT NOT NULL,
+    maintenance_id INT NOT NULL,
+    part_name VARCHAR(200) NOT NULL,
+    quantity INT,
+    unit_cost DECIMAL(10, 2),
+    total_cost DECIMAL(10, 2),
+    created_at TIMESTAMP NULL,
+    archive_date DATE NOT NULL,
+    PRIMARY KEY (id, archive_date),
+    INDEX idx_maintenance (maintenance_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE (YEAR(archive_date)) (
+    PARTITION p_old VALUES LESS THAN (2020),
+    PARTITION p2020 VALUES LESS THAN (2021),
+    PARTITION p2021 VALUES LESS THAN (2022),
+    PARTITION p2022 VALUES LESS THAN (2023),
+    PARTITION p2023 VALUES LESS THAN (2024),
+    PARTITION p2024 VALUES LESS THAN (2025),
+    PARTITION p2025 VALUES LESS THAN (2026),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+CREATE TABLE IF NOT EXISTS equipment_location_history_archive (
+    id INT NOT NULL,
+    equipment_id INT NOT NULL,
+    location_id INT NOT NULL,
+    assigned_to VARCHAR(100),
+    move_date DATE NOT NULL,
+    valid_to DATE NOT NULL,
+    reason TEXT,
+    moved_by INT,
+    created_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, move_date),
+    INDEX idx_equipment_stay (equipment_id, move_date),
+    INDEX idx_location_stay (location_id, move_date, valid_to, equipment_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE (YEAR(move_date)) (
+    PARTITION p_old VALUES LESS THAN (2020),
+    PARTITION p2020 VALUES LESS THAN (2021),
+    PARTITION p2021 VALUES LESS THAN (2022),
+    PARTITION p2022 VALUES LESS THAN (2023),
+    PARTITION p2023 VALUES LESS THAN (2024),
+    PARTITION p2024 VALUES LESS THAN (2025),
+    PARTITION p2025 VALUES LESS THAN (2026),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
@@ -1,22 +1,50 @@
+import asyncio
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import NamedTuple, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from .database import get_db
-from .models import User
+from .models import User, UserRole
+from .sessions import RevocationStore
 
 # Configuración de seguridad
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 horas
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Tokens revocados (logout, desactivación, cambio de rol...), sincronizados entre réplicas
+REVOCATION_SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_INTERVAL", "2"))
+revocation_store = RevocationStore(full_sync_interval=float(os.getenv("REVOCATION_FULL_SYNC_INTERVAL", "300")))
+
+# Coste de bcrypt: los hashes con otro coste (o en texto plano, heredados de la
+# carga inicial) se marcan como obsoletos y se regeneran en el siguiente login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(
+    schemes=["bcrypt", "plaintext"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
 security = HTTPBearer()
 
+# Pool de procesos para bcrypt: cada verificación ocupa ~100-300 ms de CPU y en
+# el threadpool bloquearía al resto de endpoints (y al GIL). Con varios workers
+# web (app/server.py) los núcleos se reparten entre los pools de cada uno
+PASSWORD_HASH_WORKERS = int(os.getenv(
+    "PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 1) // int(os.getenv("WEB_CONCURRENCY", "1"))))
+))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(max(PASSWORD_HASH_WORKERS, 1) * 16)))
+
+_password_pool: Optional[ProcessPoolExecutor] = None
+_password_slots: Optional[asyncio.Semaphore] = None
+_dummy_hash: Optional[str] = None
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica que la contraseña coincida con el hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -25,6 +53,53 @@ def get_password_hash(password: str) -> str:
     """Genera hash de contraseña"""
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verifica la contraseña y, si el hash está obsoleto, devuelve uno nuevo"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+async def run_password_job(fn, *args):
+    """Ejecutar una operación de bcrypt en el pool de procesos.
+
+    Como mucho PASSWORD_HASH_MAX_PENDING operaciones en cola o en curso; por
+    encima se responde 503 en lugar de acumular logins que expirarían igualmente.
+    """
+    global _password_pool, _password_slots
+    if PASSWORD_HASH_WORKERS <= 0:
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    if _password_pool is None:
+        _password_pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        _password_slots = asyncio.Semaphore(PASSWORD_HASH_MAX_PENDING)
+
+    if _password_slots.locked():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent password operations, retry later",
+            headers={"Retry-After": "1"}
+        )
+
+    async with _password_slots:
+        return await asyncio.get_running_loop().run_in_executor(_password_pool, fn, *args)
+
+async def verify_password_async(plain_password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """Verificación en el pool; sin usuario se compara con un hash ficticio para
+    que el tiempo de respuesta no revele si el nombre de usuario existe"""
+    global _dummy_hash
+    if hashed_password is None:
+        if _dummy_hash is None:
+            _dummy_hash = await run_password_job(get_password_hash, "dummy-password")
+        await run_password_job(verify_and_update_password, plain_password, _dummy_hash)
+        return False, None
+    return await run_password_job(verify_and_update_password, plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    """Genera el hash de contraseña en el pool de procesos"""
+    return await run_password_job(get_password_hash, password)
+
+def shutdown_password_pool():
+    if _password_pool is not None:
+        _password_pool.shutdown(wait=False, cancel_futures=True)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Crea un token JWT"""
     to_encode = data.copy()
@@ -49,22 +124,45 @@ def decode_token(token: str) -> dict:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Obtiene el usuario actual desde el token"""
-    token = credentials.credentials
-    payload = decode_token(token)
-    username: str = payload.get("sub")
+class Principal(NamedTuple):
+    """Usuario autenticado según los claims del token"""
+    id: int
+    username: str
+    role: UserRole
+    jti: str
+
+def get_current_principal(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    """Obtiene el usuario actual desde el token, sin consultar la base de datos.
 
-    if username is None:
+    Desactivar un usuario, cambiarle el rol o borrarlo revoca sus sesiones, así
+    que basta con comprobar el jti contra la lista de revocados en memoria.
+    """
+    payload = decode_token(credentials.credentials)
+    jti = payload.get("jti")
+    user_id = payload.get("uid")
+    username = payload.get("sub")
+
+    if jti is None or user_id is None or username is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
 
-    user = db.query(User).filter(User.username == username).first()
+    if revocation_store.is_revoked(jti):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return Principal(id=user_id, username=username, role=UserRole(payload.get("role")), jti=jti)
+
+def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+) -> User:
+    """Obtiene el usuario actual desde la base de datos (cuando se necesita el registro completo)"""
+    user = db.query(User).filter(User.id == principal.id).first()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -81,7 +179,7 @@ def get_current_user(
 
 def require_role(allowed_roles: list):
     """Decorator para verificar roles de usuario"""
-    def role_checker(current_user: User = Depends(get_current_user)):
+    def role_checker(current_user: Principal = Depends(get_current_principal)):
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
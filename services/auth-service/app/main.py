@@ -1,42 +1,69 @@
 from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, EmailStr
-from typing import Optional
-from datetime import timedelta
-import time
-from .database import get_db, engine, Base
-from .models import User, UserRole
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List
+from datetime import datetime, timedelta
+import asyncio
+from .database import get_db, engine, Base, SessionLocal, DB_POOL_SIZE
+from .models import User, UserRole, UserSession
 from .auth import (
-    verify_password,
-    get_password_hash,
+    verify_password_async,
+    hash_password_async,
+    shutdown_password_pool,
     create_access_token,
     get_current_user,
+    get_current_principal,
     require_role,
-    ACCESS_TOKEN_EXPIRE_MINUTES
+    revocation_store,
+    Principal,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    REVOCATION_SYNC_INTERVAL
 )
+from .sessions import new_jti, create_session, revoke_sessions
+from .audit import audit_writer, install as install_audit
+from .startup import readiness, warm_up
 
 app = FastAPI(title="Auth Service", version="1.0.0")
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database with retry logic"""
-    max_retries = 30
-    retry_interval = 2
-
-    for attempt in range(max_retries):
+    """Esperar a la BD y calentar pool y consultas en segundo plano (/health da 503 hasta terminar)"""
+    app.state.warmup_task = asyncio.create_task(
+        warm_up(engine, SessionLocal, DB_POOL_SIZE, metadata=Base.metadata, warm_queries=warm_queries)
+    )
+    app.state.revocation_task = asyncio.create_task(sync_revocations())
+
+def warm_queries(db: Session):
+    """Consultas calientes; incluye la carga inicial de revocados para no aceptar
+    tokens revocados antes de declararse listo"""
+    revocation_store.sync(db)
+    db.query(User).filter(User.username == "").first()
+    db.query(User).filter(User.id == 0).first()
+    db.query(User).filter(User.id.in_([0])).all()
+
+def _sync_revocations_once():
+    db = SessionLocal()
+    try:
+        revocation_store.sync(db)
+    finally:
+        db.close()
+
+async def sync_revocations():
+    """Mantener al día la lista de tokens revocados por cualquier réplica"""
+    while True:
         try:
-            Base.metadata.create_all(bind=engine)
-            print(f"✅ Database connection established on attempt {attempt + 1}")
-            break
+            await run_in_threadpool(_sync_revocations_once)
         except Exception as e:
-            if attempt < max_retries - 1:
-                print(f"⚠️ Database connection attempt {attempt + 1} failed: {e}")
-                print(f"Retrying in {retry_interval} seconds...")
-                time.sleep(retry_interval)
-            else:
-                print(f"❌ Failed to connect to database after {max_retries} attempts")
-                raise
+            print(f"⚠️ Revocation list sync failed: {e}")
+        await asyncio.sleep(REVOCATION_SYNC_INTERVAL)
+
+@app.on_event("shutdown")
+def shutdown_event():
+    app.state.revocation_task.cancel()
+    shutdown_password_pool()
 
 # Configurar CORS
 app.add_middleware(
@@ -47,6 +74,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Auditoría de cambios en audit_logs (cola en memoria + escritor por lotes)
+install_audit(app, SessionLocal, engine)
+
 # ============================================
 # SCHEMAS (Pydantic Models)
 # ============================================
@@ -88,6 +118,18 @@ class PasswordChange(BaseModel):
     old_password: str
     new_password: str
 
+class BatchLookup(BaseModel):
+    ids: List[int] = Field(..., max_length=1000)
+
+class SessionResponse(BaseModel):
+    jti: str
+    created_at: Optional[datetime]
+    expires_at: datetime
+    current: bool = False
+
+    class Config:
+        from_attributes = True
+
 # ============================================
 # ENDPOINTS
 # ============================================
@@ -98,29 +140,49 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    if not readiness.ready:
+        return JSONResponse(status_code=503, content={"status": "starting", **readiness.snapshot()})
+    return {
+        "status": "healthy",
+        "warmup_seconds": readiness.warmup_seconds,
+        "audit": {**audit_writer.stats, "pending": audit_writer.pending}
+    }
 
 @app.post("/login", response_model=Token)
-def login(user_login: UserLogin, db: Session = Depends(get_db)):
+async def login(user_login: UserLogin, db: Session = Depends(get_db)):
     """Endpoint de login"""
-    user = db.query(User).filter(User.username == user_login.username).first()
+    # Async para que la verificación bcrypt (en el pool de procesos) no ocupe un hilo
+    # del threadpool mientras espera; las consultas sí van al threadpool
+    user = await run_in_threadpool(
+        lambda: db.query(User).filter(User.username == user_login.username).first()
+    )
 
-    # Comparación directa de contraseñas (SIN HASH - solo para desarrollo)
-    if not user or user.password_hash != user_login.password:
+    valid, new_hash = await verify_password_async(user_login.password, user.password_hash if user else None)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
         )
 
+    # Hash en texto plano o con otro coste de bcrypt: se regenera de forma transparente
+    if new_hash:
+        user.password_hash = new_hash
+        await run_in_threadpool(db.commit)
+
     if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User is inactive"
         )
 
+    # Cada token es una sesión (jti) que se puede revocar
+    jti = new_jti()
+    expires_delta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    await run_in_threadpool(create_session, db, user.id, jti, datetime.utcnow() + expires_delta)
+
     access_token = create_access_token(
-        data={"sub": user.username, "role": user.role.value},
-        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        data={"sub": user.username, "uid": user.id, "role": user.role.value, "jti": jti},
+        expires_delta=expires_delta
     )
 
     return {
@@ -130,16 +192,16 @@ def login(user_login: UserLogin, db: Session = Depends(get_db)):
     }
 
 @app.post("/register", response_model=UserResponse)
-def register(
+async def register(
     user_create: UserCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role([UserRole.admin]))
+    current_user: Principal = Depends(require_role([UserRole.admin]))
 ):
     """Registro de nuevos usuarios (solo admin)"""
     # Verificar si el usuario ya existe
-    existing_user = db.query(User).filter(
+    existing_user = await run_in_threadpool(lambda: db.query(User).filter(
         (User.username == user_create.username) | (User.email == user_create.email)
-    ).first()
+    ).first())
 
     if existing_user:
         raise HTTPException(
@@ -147,18 +209,20 @@ def register(
             detail="Username or email already registered"
         )
 
-    # Crear nuevo usuario (SIN HASH - solo para desarrollo)
     new_user = User(
         username=user_create.username,
         email=user_create.email,
-        password_hash=user_create.password,  # Contraseña en texto plano
+        password_hash=await hash_password_async(user_create.password),
         full_name=user_create.full_name,
         role=user_create.role
     )
 
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    def save():
+        db.add(new_user)
+        db.commit()
+        db.refresh(new_user)
+
+    await run_in_threadpool(save)
 
     return new_user
 
@@ -168,40 +232,101 @@ def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 @app.put("/me/password")
-def change_password(
+async def change_password(
     password_change: PasswordChange,
     current_user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Cambiar contraseña del usuario actual"""
-    # Comparación directa (SIN HASH - solo para desarrollo)
-    if current_user.password_hash != password_change.old_password:
+    valid, _ = await verify_password_async(password_change.old_password, current_user.password_hash)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect old password"
         )
 
-    current_user.password_hash = password_change.new_password
-    db.commit()
+    current_user.password_hash = await hash_password_async(password_change.new_password)
+    await run_in_threadpool(db.commit)
+
+    # El resto de sesiones del usuario dejan de ser válidas
+    await run_in_threadpool(
+        revoke_sessions, db, revocation_store, user_id=current_user.id, exclude_jti=principal.jti
+    )
 
     return {"message": "Password updated successfully"}
 
-@app.get("/users", response_model=list[UserResponse])
+@app.post("/logout")
+def logout(
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Cerrar la sesión actual (revoca el token)"""
+    revoke_sessions(db, revocation_store, jti=principal.jti)
+    return {"message": "Logged out successfully"}
+
+@app.get("/sessions", response_model=List[SessionResponse])
+def get_sessions(
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Sesiones activas del usuario actual"""
+    sessions = db.query(UserSession).filter(
+        UserSession.user_id == principal.id,
+        UserSession.revoked_at.is_(None),
+        UserSession.expires_at > datetime.utcnow()
+    ).order_by(UserSession.created_at.desc()).all()
+
+    return [
+        SessionResponse(jti=s.jti, created_at=s.created_at, expires_at=s.expires_at, current=s.jti == principal.jti)
+        for s in sessions
+    ]
+
+@app.delete("/sessions/{jti}")
+def revoke_session(
+    jti: str,
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Revocar una sesión propia (o cualquiera, si es admin)"""
+    user_id = None if principal.role == UserRole.admin else principal.id
+    if not revoke_sessions(db, revocation_store, user_id=user_id, jti=jti):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
+    return {"message": "Session revoked successfully"}
+
+@app.get("/users", response_model=List[UserResponse])
 def get_users(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role([UserRole.admin, UserRole.technician]))
+    current_user: Principal = Depends(require_role([UserRole.admin, UserRole.technician]))
 ):
     """Listar usuarios"""
     users = db.query(User).offset(skip).limit(limit).all()
     return users
 
+@app.post("/users/batch", response_model=List[UserResponse])
+def get_users_batch(
+    lookup: BatchLookup,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Obtener varios usuarios por ID en una sola consulta"""
+    ids = list(dict.fromkeys(lookup.ids))
+    if not ids:
+        return []
+
+    users = db.query(User).filter(User.id.in_(ids)).all()
+    return users
+
 @app.get("/users/{user_id}", response_model=UserResponse)
 def get_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Obtener usuario por ID"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -217,7 +342,7 @@ def update_user(
     user_id: int,
     user_update: UserUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role([UserRole.admin]))
+    current_user: Principal = Depends(require_role([UserRole.admin]))
 ):
     """Actualizar usuario (solo admin)"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -229,19 +354,27 @@ def update_user(
 
     # Actualizar campos
     update_data = user_update.model_dump(exclude_unset=True)
+    # El rol y el estado van en los tokens: si cambian, se revocan sus sesiones
+    revoke = any(
+        field in update_data and update_data[field] != getattr(user, field)
+        for field in ("role", "is_active")
+    )
     for field, value in update_data.items():
         setattr(user, field, value)
 
     db.commit()
     db.refresh(user)
 
+    if revoke:
+        revoke_sessions(db, revocation_store, user_id=user.id)
+
     return user
 
 @app.delete("/users/{user_id}")
 def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role([UserRole.admin]))
+    current_user: Principal = Depends(require_role([UserRole.admin]))
 ):
     """Eliminar usuario (solo admin)"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -257,11 +390,22 @@ def delete_user(
             detail="Cannot delete your own account"
         )
 
+    revoke_sessions(db, revocation_store, user_id=user.id)
     db.delete(user)
     db.commit()
 
     return {"message": "User deleted successfully"}
 
+@app.post("/users/{user_id}/revoke-sessions")
+def revoke_user_sessions(
+    user_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_role([UserRole.admin]))
+):
+    """Revocar todas las sesiones activas de un usuario (solo admin)"""
+    revoked = revoke_sessions(db, revocation_store, user_id=user_id)
+    return {"message": f"{revoked} session(s) revoked", "revoked": revoked}
+
 @app.post("/verify-token", response_model=UserResponse)
 def verify_token(current_user: User = Depends(get_current_user)):
     """Verificar validez del token"""
@@ -20,3 +20,14 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class UserSession(Base):
+    __tablename__ = "user_sessions"
+
+    # Sin FK a users: al borrar un usuario sus sesiones revocadas deben seguir
+    # visibles para la sincronización hasta que caduquen
+    jti = Column(String(32), primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=True, index=True)
@@ -0,0 +1,123 @@
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from .models import UserSession
+
+
+class RevocationStore:
+    """Copia en memoria de los tokens revocados: {jti: expiración (epoch)}.
+
+    La comprobación por petición es una búsqueda en un dict. Cada réplica del
+    servicio se sincroniza leyendo de `user_sessions` las revocaciones nuevas
+    (marca de agua sobre `revoked_at`, con un solape para tolerar desfases de
+    reloj entre réplicas) y, cada cierto tiempo, recargando el conjunto completo
+    y descartando los jti ya caducados.
+    """
+
+    def __init__(self, overlap_seconds: float = 5.0, full_sync_interval: float = 300.0):
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self.full_sync_interval = full_sync_interval
+        self._revoked: Dict[str, float] = {}
+        self._watermark: Optional[datetime] = None
+        self._last_full_sync = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"syncs": 0, "full_syncs": 0}
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def is_revoked(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    def add(self, jti: str, expires_at: datetime):
+        self._revoked[jti] = _epoch(expires_at)
+
+    def sync(self, db: Session):
+        """Incorporar las revocaciones hechas por cualquier réplica desde la última sincronización"""
+        with self._lock:
+            if self._watermark is None or time.monotonic() - self._last_full_sync >= self.full_sync_interval:
+                self._full_sync(db)
+                return
+
+            rows = db.query(UserSession.jti, UserSession.expires_at, UserSession.revoked_at).filter(
+                UserSession.revoked_at >= self._watermark - self.overlap
+            ).all()
+            for jti, expires_at, revoked_at in rows:
+                self._revoked[jti] = _epoch(expires_at)
+                self._watermark = max(self._watermark, revoked_at)
+            self.stats["syncs"] += 1
+
+    def _full_sync(self, db: Session):
+        now = datetime.utcnow()
+        rows = db.query(UserSession.jti, UserSession.expires_at, UserSession.revoked_at).filter(
+            UserSession.revoked_at.isnot(None),
+            UserSession.expires_at > now
+        ).all()
+        self._revoked = {jti: _epoch(expires_at) for jti, expires_at, _ in rows}
+        self._watermark = max((revoked_at for _, _, revoked_at in rows), default=now)
+
+        # Las sesiones caducadas ya no hacen falta ni para revocar
+        db.query(UserSession).filter(UserSession.expires_at < now - timedelta(days=1)).delete(synchronize_session=False)
+        db.commit()
+
+        self._last_full_sync = time.monotonic()
+        self.stats["full_syncs"] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "revoked_tokens": len(self._revoked),
+            "watermark": self._watermark.isoformat() if self._watermark else None,
+            **self.stats,
+        }
+
+
+def _epoch(value: datetime) -> float:
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+def new_jti() -> str:
+    return uuid.uuid4().hex
+
+
+def create_session(db: Session, user_id: int, jti: str, expires_at: datetime) -> UserSession:
+    session = UserSession(jti=jti, user_id=user_id, expires_at=expires_at)
+    db.add(session)
+    db.commit()
+    return session
+
+
+def revoke_sessions(db: Session, store: RevocationStore, user_id: Optional[int] = None, jti: Optional[str] = None,
+                    exclude_jti: Optional[str] = None) -> int:
+    """Revocar una sesión (jti) o todas las activas de un usuario; devuelve cuántas"""
+    now = datetime.utcnow()
+    query = db.query(UserSession.jti, UserSession.expires_at).filter(
+        UserSession.revoked_at.is_(None),
+        UserSession.expires_at > now
+    )
+    if jti is not None:
+        query = query.filter(UserSession.jti == jti)
+    if user_id is not None:
+        query = query.filter(UserSession.user_id == user_id)
+    if exclude_jti is not None:
+        query = query.filter(UserSession.jti != exclude_jti)
+    sessions = query.all()
+    if not sessions:
+        return 0
+
+    db.execute(
+        update(UserSession)
+        .where(UserSession.jti.in_([s.jti for s in sessions]))
+        .values(revoked_at=now)
+    )
+    db.commit()
+
+    # Efecto inmediato en esta réplica; el resto lo verá en su próxima sincronización
+    for session in sessions:
+        store.add(session.jti, session.expires_at)
+    return len(sessions)
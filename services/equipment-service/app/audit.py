@@ -0,0 +1,498 @@
+"""Auditoría de cambios en `audit_logs` sin añadir una escritura a cada petición.
+
+Los eventos de sesión de SQLAlchemy capturan lo que cambia en cada flush (alta,
+modificación con valores antiguos y nuevos, borrado, y UPDATE/DELETE masivos).
+Al confirmarse la transacción los registros pasan a una cola en memoria acotada
+y un hilo los escribe con INSERT multi-fila cuando se juntan AUDIT_BATCH_SIZE o
+pasan AUDIT_FLUSH_INTERVAL segundos. Si la transacción se deshace no se audita
+nada.
+
+Modos (AUDIT_MODE):
+    async  cola + hilo escritor (por defecto)
+    sync   el INSERT va en la misma transacción que el cambio (sin pérdida posible)
+    off    sin auditoría
+
+Con la cola llena, AUDIT_OVERFLOW=block espera hasta AUDIT_BLOCK_TIMEOUT
+(contrapresión sobre las escrituras) y drop no espera. Lo que no cabe, o no se
+puede escribir porque la BD falla, va a AUDIT_SPILL_FILE (JSON por líneas) si
+está configurado y se reinserta cuando la BD vuelve; si no, se descarta y se
+cuenta en `stats`. Con varios workers el fichero es compartido: los accesos se
+serializan con flock y solo un worker reinserta a la vez.
+
+El usuario sale del claim `uid` del token Bearer y la IP de X-Forwarded-For (la
+pone el API Gateway). Como el resto de la autorización de estos servicios, se
+confía en lo que llega del gateway: el token no se vuelve a verificar aquí.
+"""
+import base64
+import fcntl
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import List, Optional
+
+from sqlalchemy import column, event, inspect, table
+from sqlalchemy.exc import IntegrityError
+
+AUDIT_MODE = os.getenv("AUDIT_MODE", "async").lower()
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+AUDIT_OVERFLOW = os.getenv("AUDIT_OVERFLOW", "block").lower()
+AUDIT_BLOCK_TIMEOUT = float(os.getenv("AUDIT_BLOCK_TIMEOUT", "1.0"))
+AUDIT_SPILL_FILE = os.getenv("AUDIT_SPILL_FILE", "")
+
+# user_sessions: cada login y cada revocación, con el jti del token; no son cambios de datos
+AUDIT_EXCLUDE_TABLES = set(filter(None, os.getenv("AUDIT_EXCLUDE_TABLES", "audit_logs,alert_watermarks,user_sessions").split(",")))
+# Se registra que cambiaron, no su valor (jti: identificador revocable de un token)
+AUDIT_REDACT_COLUMNS = set(filter(None, os.getenv("AUDIT_REDACT_COLUMNS", "password_hash,jti").split(",")))
+REDACTED = "***"
+
+AUDIT_TABLE = table(
+    "audit_logs",
+    column("user_id"),
+    column("action"),
+    column("table_name"),
+    column("record_id"),
+    column("old_values"),
+    column("new_values"),
+    column("ip_address"),
+    column("created_at"),
+)
+
+# Clave en session.info con los registros pendientes de la transacción en curso
+_PENDING = "audit_pending"
+
+
+# ============================================
+# CONTEXTO DE LA PETICIÓN
+# ============================================
+
+class RequestContext:
+    """Cabeceras de la petición en curso; el usuario se extrae solo si hay algo que auditar"""
+    __slots__ = ("authorization", "ip_address", "_user_id", "_resolved")
+
+    def __init__(self, authorization: Optional[str], ip_address: Optional[str]):
+        self.authorization = authorization
+        self.ip_address = ip_address
+        self._user_id = None
+        self._resolved = False
+
+    @property
+    def user_id(self) -> Optional[int]:
+        if not self._resolved:
+            self._user_id = _user_from_token(self.authorization)
+            self._resolved = True
+        return self._user_id
+
+
+_request_context: ContextVar[Optional[RequestContext]] = ContextVar("audit_request_context", default=None)
+
+
+def _user_from_token(authorization: Optional[str]) -> Optional[int]:
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        payload = authorization[7:].split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return int(claims["uid"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class AuditContextMiddleware:
+    """Middleware ASGI que deja usuario e IP al alcance de los eventos de sesión"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        authorization = forwarded_for = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+            elif name == b"x-forwarded-for":
+                forwarded_for = value.decode("latin-1")
+        if forwarded_for:
+            ip_address = forwarded_for.split(",")[0].strip()
+        else:
+            ip_address = scope["client"][0] if scope.get("client") else None
+
+        token = _request_context.set(RequestContext(authorization, ip_address[:45] if ip_address else None))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_context.reset(token)
+
+
+# ============================================
+# CAPTURA DE CAMBIOS
+# ============================================
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+
+def _dumps(values: Optional[dict]) -> Optional[str]:
+    if values is None:
+        return None
+    return json.dumps(values, default=_json_default, ensure_ascii=False)
+
+
+def _record(action: str, table_name: str, record_id, old_values: Optional[dict], new_values: Optional[dict]) -> dict:
+    context = _request_context.get()
+    return {
+        "user_id": context.user_id if context else None,
+        "action": action,
+        "table_name": table_name,
+        "record_id": record_id,
+        "old_values": _dumps(old_values),
+        "new_values": _dumps(new_values),
+        "ip_address": context.ip_address if context else None,
+        "created_at": datetime.utcnow(),
+    }
+
+
+def _value(key: str, value):
+    return REDACTED if key in AUDIT_REDACT_COLUMNS and value is not None else value
+
+
+def _record_id(state) -> Optional[int]:
+    # Las filas nuevas aún no tienen identity en after_flush, pero sí la PK en su dict
+    identity = state.identity or tuple(
+        state.dict.get(state.mapper.get_property_by_column(col).key) for col in state.mapper.primary_key
+    )
+    if len(identity) == 1 and isinstance(identity[0], int):
+        return identity[0]
+    return None
+
+
+def _audited_columns(mapper):
+    # Las columnas generadas (p. ej. spec_* en equipment) se derivan de otras
+    return [prop for prop in mapper.column_attrs if prop.columns[0].computed is None]
+
+
+def _snapshot(state) -> dict:
+    # Solo lo ya cargado: el evento no debe lanzar consultas
+    loaded = state.dict
+    return {
+        prop.key: _value(prop.key, loaded[prop.key])
+        for prop in _audited_columns(state.mapper) if prop.key in loaded
+    }
+
+
+def _changes(state):
+    old_values, new_values = {}, {}
+    for prop in _audited_columns(state.mapper):
+        history = state.attrs[prop.key].history
+        if not history.has_changes():
+            continue
+        old_values[prop.key] = _value(prop.key, history.deleted[0] if history.deleted else None)
+        new_values[prop.key] = _value(prop.key, history.added[0] if history.added else None)
+    return old_values, new_values
+
+
+def _flush_records(session) -> List[dict]:
+    records = []
+    for obj in session.new:
+        state = inspect(obj)
+        if state.mapper.local_table.name not in AUDIT_EXCLUDE_TABLES:
+            records.append(_record("create", state.mapper.local_table.name, _record_id(state), None, _snapshot(state)))
+    for obj in session.dirty:
+        state = inspect(obj)
+        if state.mapper.local_table.name in AUDIT_EXCLUDE_TABLES:
+            continue
+        old_values, new_values = _changes(state)
+        if new_values:
+            records.append(_record("update", state.mapper.local_table.name, _record_id(state), old_values, new_values))
+    for obj in session.deleted:
+        state = inspect(obj)
+        if state.mapper.local_table.name not in AUDIT_EXCLUDE_TABLES:
+            records.append(_record("delete", state.mapper.local_table.name, _record_id(state), _snapshot(state), None))
+    return records
+
+
+def _add_records(session, records: List[dict]):
+    if AUDIT_MODE == "sync":
+        session.connection().execute(AUDIT_TABLE.insert(), records)
+    else:
+        session.info.setdefault(_PENDING, []).extend(records)
+
+
+def _after_flush(session, flush_context):
+    # En after_flush las colecciones new/dirty/deleted y el historial aún reflejan el flush
+    records = _flush_records(session)
+    if records:
+        _add_records(session, records)
+
+
+def _do_orm_execute(orm_execute_state):
+    """UPDATE/DELETE masivos (update(Model), query.update()): un registro por sentencia"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    table_name = getattr(orm_execute_state.statement.table, "name", None)
+    if table_name is None or table_name in AUDIT_EXCLUDE_TABLES:
+        return None
+
+    result = orm_execute_state.invoke_statement()
+    if result.rowcount == 0:
+        # Sentencias sin efecto (p. ej. limpiezas periódicas sin nada que borrar)
+        return result
+    try:
+        params = orm_execute_state.statement.compile().params
+    except Exception:
+        params = {}
+    if isinstance(orm_execute_state.parameters, dict):
+        params.update(orm_execute_state.parameters)
+    action = "bulk_update" if orm_execute_state.is_update else "bulk_delete"
+    new_values = {"rows": result.rowcount, "params": {key: _value(key, value) for key, value in params.items()}}
+    _add_records(orm_execute_state.session, [_record(action, table_name, None, None, new_values)])
+    return result
+
+
+def _after_commit(session):
+    records = session.info.pop(_PENDING, None)
+    if records:
+        audit_writer.submit(records)
+
+
+def _after_rollback(session):
+    session.info.pop(_PENDING, None)
+
+
+def register_session_events(session_factory):
+    event.listen(session_factory, "after_flush", _after_flush)
+    event.listen(session_factory, "do_orm_execute", _do_orm_execute)
+    event.listen(session_factory, "after_commit", _after_commit)
+    event.listen(session_factory, "after_rollback", _after_rollback)
+
+
+# ============================================
+# ESCRITOR EN SEGUNDO PLANO
+# ============================================
+
+@contextmanager
+def _file_lock(path: str, blocking: bool = True):
+    """flock exclusivo entre procesos (los workers de gunicorn comparten AUDIT_SPILL_FILE).
+
+    Devuelve False si `blocking` es False y otro proceso lo tiene; se libera al cerrar.
+    """
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+        else:
+            yield True
+
+
+class AuditWriter:
+    def __init__(self):
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+        self._engine = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._spill_lock = threading.Lock()
+        self.stats = {
+            "mode": AUDIT_MODE, "queued": 0, "written": 0, "batches": 0, "blocked": 0,
+            "dropped": 0, "spilled": 0, "replayed": 0, "errors": 0, "last_error": None,
+        }
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def start(self, engine):
+        if AUDIT_MODE != "async" or self._thread is not None:
+            return
+        self._engine = engine
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Vaciar la cola antes de salir; lo que no dé tiempo a escribir va al fichero de volcado"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+        leftover = []
+        while True:
+            try:
+                leftover.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if leftover:
+            self._overflow(leftover)
+
+    def submit(self, records: List[dict]):
+        for index, record in enumerate(records):
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                if AUDIT_OVERFLOW != "block":
+                    self._overflow(records[index:])
+                    return
+                self.stats["blocked"] += 1
+                try:
+                    self._queue.put(record, timeout=AUDIT_BLOCK_TIMEOUT)
+                except queue.Full:
+                    self._overflow(records[index:])
+                    return
+            self.stats["queued"] += 1
+
+    def _collect(self) -> List[dict]:
+        """Esperar al primer registro y juntar hasta AUDIT_BATCH_SIZE o AUDIT_FLUSH_INTERVAL"""
+        try:
+            batch = [self._queue.get(timeout=AUDIT_FLUSH_INTERVAL)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + AUDIT_FLUSH_INTERVAL
+        while len(batch) < AUDIT_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopping.is_set():
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        self._replay_spill()
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._collect()
+            # La BD responde otra vez: reinsertar lo volcado mientras fallaba
+            if batch and self._write(batch) and self._spill_pending():
+                self._replay_spill()
+
+    def _insert(self, rows: List[dict]):
+        with self._engine.begin() as conn:
+            conn.execute(AUDIT_TABLE.insert(), rows)
+
+    def _write(self, batch: List[dict]) -> bool:
+        try:
+            self._insert(batch)
+        except IntegrityError as e:
+            # user_id de un usuario que ya no existe: fila a fila, y esas sin usuario
+            self.stats["errors"] += 1
+            self.stats["last_error"] = str(e)
+            for record in batch:
+                try:
+                    try:
+                        self._insert([record])
+                    except IntegrityError:
+                        self._insert([{**record, "user_id": None}])
+                except IntegrityError:
+                    self.stats["dropped"] += 1
+                    continue
+                except Exception:
+                    self._overflow([record])
+                    continue
+                self.stats["written"] += 1
+            return True
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.stats["last_error"] = str(e)
+            self._overflow(batch)
+            return False
+        self.stats["written"] += len(batch)
+        self.stats["batches"] += 1
+        return True
+
+    def _overflow(self, records: List[dict]):
+        if not AUDIT_SPILL_FILE:
+            self.stats["dropped"] += len(records)
+            return
+        try:
+            with self._spill_lock, _file_lock(AUDIT_SPILL_FILE + ".lock"), open(AUDIT_SPILL_FILE, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, default=_json_default, ensure_ascii=False) + "\n")
+            self.stats["spilled"] += len(records)
+        except OSError as e:
+            self.stats["dropped"] += len(records)
+            self.stats["last_error"] = str(e)
+
+    @staticmethod
+    def _spill_pending() -> bool:
+        return bool(AUDIT_SPILL_FILE) and (
+            os.path.exists(AUDIT_SPILL_FILE) or os.path.exists(AUDIT_SPILL_FILE + ".replay")
+        )
+
+    def _replay_spill(self):
+        """Reinsertar lo volcado a fichero (lo que vuelva a fallar se vuelca de nuevo).
+
+        Nunca lanza: un error aquí pararía el hilo escritor y con él la auditoría.
+        """
+        if not AUDIT_SPILL_FILE:
+            return
+        replay_file = AUDIT_SPILL_FILE + ".replay"
+        try:
+            # Si otro worker está reinsertando se deja para el siguiente lote
+            with _file_lock(replay_file + ".lock", blocking=False) as locked:
+                if locked:
+                    self._replay_file(replay_file)
+        except Exception as e:
+            print(f"⚠️ Audit spill file {replay_file} could not be replayed: {e}")
+            self.stats["errors"] += 1
+            self.stats["last_error"] = str(e)
+
+    def _replay_file(self, replay_file: str):
+        with self._spill_lock, _file_lock(AUDIT_SPILL_FILE + ".lock"):
+            # Un .replay que ya existe es de una reinserción interrumpida: se retoma antes
+            if not os.path.exists(replay_file):
+                if not os.path.exists(AUDIT_SPILL_FILE):
+                    return
+                os.replace(AUDIT_SPILL_FILE, replay_file)
+        try:
+            with open(replay_file, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            for record in records:
+                record["created_at"] = datetime.fromisoformat(record["created_at"])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Audit spill file {replay_file} could not be replayed: {e}")
+            self.stats["last_error"] = str(e)
+            return
+        for start in range(0, len(records), AUDIT_BATCH_SIZE):
+            batch = records[start:start + AUDIT_BATCH_SIZE]
+            if self._write(batch):
+                self.stats["replayed"] += len(batch)
+        try:
+            os.remove(replay_file)
+        except FileNotFoundError:
+            pass
+
+
+audit_writer = AuditWriter()
+
+
+def install(app, session_factory, engine):
+    """Activar la auditoría en un servicio: middleware de contexto, eventos de sesión y escritor"""
+    if AUDIT_MODE == "off":
+        return
+    app.add_middleware(AuditContextMiddleware)
+    register_session_events(session_factory)
+    # El hilo se arranca en cada worker (después del fork), no al importar
+    app.add_event_handler("startup", lambda: audit_writer.start(engine))
+    app.add_event_handler("shutdown", audit_writer.stop)
@@ -0,0 +1,27 @@
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+from sqlalchemy.orm import Session
+
+# Manejadores por tipo de evento: handler(db, event_type, payload)
+Handler = Callable[[Session, str, dict], None]
+
+_handlers: Dict[str, List[Handler]] = defaultdict(list)
+
+
+def subscribe(event_type: str):
+    """Registrar un manejador para `event_type` ("*" recibe todos los eventos)"""
+    def decorator(handler: Handler) -> Handler:
+        _handlers[event_type].append(handler)
+        return handler
+    return decorator
+
+
+def emit(db: Session, event_type: str, payload: dict):
+    """Publicar un evento de cambio dentro de la transacción que lo provoca.
+
+    Los manejadores reciben la misma sesión, así que lo que escriban se confirma
+    o se descarta junto con el cambio (hay que llamar a emit antes del commit).
+    """
+    for handler in _handlers.get(event_type, []) + _handlers.get("*", []):
+        handler(db, event_type, payload)
@@ -1,36 +1,36 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Query
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, or_, insert, update
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import date, datetime
 from decimal import Decimal
-import time
-from .database import get_db, engine, Base
-from .models import Equipment, EquipmentCategory, Location, EquipmentLocationHistory, EquipmentStatus
+from itertools import combinations
+import asyncio
+import os
+from .database import get_db, engine, Base, SessionLocal, DB_POOL_SIZE
+from .models import (
+    Equipment, EquipmentCategory, Location, EquipmentLocationHistory, EquipmentLocationHistoryArchive,
+    EquipmentStatus, OPEN_STAY_END
+)
+from .events import emit, subscribe
+from .outbox import Aggregate, outbox_row, publish, register_outbox
+from .specs import SPEC_KEYS, SpecFilter, parse_spec_filters, spec_predicate
+from .serialization import FastJSONResponse, Projection, projection_for
+from .audit import audit_writer, install as install_audit
+from .startup import readiness, warm_up
 
 app = FastAPI(title="Equipment Service", version="1.0.0")
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database with retry logic"""
-    max_retries = 30
-    retry_interval = 2
-
-    for attempt in range(max_retries):
-        try:
-            Base.metadata.create_all(bind=engine)
-            print(f"✅ Database connection established on attempt {attempt + 1}")
-            break
-        except Exception as e:
-            if attempt < max_retries - 1:
-                print(f"⚠️ Database connection attempt {attempt + 1} failed: {e}")
-                print(f"Retrying in {retry_interval} seconds...")
-                time.sleep(retry_interval)
-            else:
-                print(f"❌ Failed to connect to database after {max_retries} attempts")
-                raise
+    """Esperar a la BD y calentar pool y consultas en segundo plano (/health da 503 hasta terminar)"""
+    app.state.warmup_task = asyncio.create_task(
+        warm_up(engine, SessionLocal, DB_POOL_SIZE, metadata=Base.metadata, warm_queries=warm_queries)
+    )
 
 app.add_middleware(
     CORSMiddleware,
@@ -40,10 +40,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Auditoría de cambios en audit_logs (cola en memoria + escritor por lotes)
+install_audit(app, SessionLocal, engine)
+
+# Eventos de cambio en outbox_events, en la misma transacción que cada cambio
+OUTBOX_SOURCE = "equipment-service"
+register_outbox(SessionLocal, OUTBOX_SOURCE, {"equipment": Aggregate("equipment", {"current_location_id": "moved"})})
+
 # ============================================
 # SCHEMAS
 # ============================================
 
+# Máximo de equipos por traslado / actualización masiva (una sola transacción)
+BULK_MOVE_MAX_ITEMS = int(os.getenv("BULK_MOVE_MAX_ITEMS", "5000"))
+BULK_UPDATE_MAX_ITEMS = int(os.getenv("BULK_UPDATE_MAX_ITEMS", "20000"))
+
 class CategoryCreate(BaseModel):
     name: str
     description: Optional[str] = None
@@ -114,6 +125,7 @@ class EquipmentResponse(BaseModel):
     model: Optional[str]
     purchase_date: Optional[date]
     purchase_price: Optional[Decimal]
+    provider_id: Optional[int]
     status: str
     assigned_to: Optional[str]
     category: Optional[CategoryResponse]
@@ -131,6 +143,59 @@ class EquipmentMove(BaseModel):
     reason: Optional[str] = None
     moved_by: Optional[int] = None
 
+class BulkMove(BaseModel):
+    """Traslado masivo: `ids` concretos o todo lo que está en `from_location_id`"""
+    ids: Optional[List[int]] = Field(None, max_length=BULK_MOVE_MAX_ITEMS)
+    from_location_id: Optional[int] = None
+    location_id: int
+    # Si no se envía se conserva el responsable actual de cada equipo
+    assigned_to: Optional[str] = None
+    move_date: date
+    reason: Optional[str] = None
+    moved_by: Optional[int] = None
+
+class EquipmentFilter(BaseModel):
+    """Mismos filtros que GET /equipment"""
+    status: Optional[EquipmentStatus] = None
+    category_id: Optional[int] = None
+    location_id: Optional[int] = None
+    search: Optional[str] = None
+    spec: Optional[List[str]] = None
+
+class EquipmentPatch(BaseModel):
+    """Campos que tiene sentido fijar a la vez en muchos equipos"""
+    status: Optional[EquipmentStatus] = None
+    category_id: Optional[int] = None
+    brand: Optional[str] = None
+    model: Optional[str] = None
+    assigned_to: Optional[str] = None
+    notes: Optional[str] = None
+
+class BulkUpdate(BaseModel):
+    filter: EquipmentFilter = EquipmentFilter()
+    patch: EquipmentPatch
+    # Un filtro vacío afecta a todo el inventario: hay que pedirlo explícitamente
+    match_all: bool = False
+    dry_run: bool = False
+
+class BulkUpdateResult(BaseModel):
+    matched: int
+    updated: int
+    dry_run: bool
+    changes: dict
+    ids: List[int]
+
+class BulkMoveResult(BaseModel):
+    location_id: int
+    requested: int
+    moved: int
+    moved_ids: List[int]
+    already_there: List[int]
+    not_found: List[int]
+
+class BatchLookup(BaseModel):
+    ids: List[int] = Field(..., max_length=1000)
+
 class LocationHistoryResponse(BaseModel):
     id: int
     equipment_id: int
@@ -142,6 +207,93 @@ class LocationHistoryResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class StayResponse(BaseModel):
+    """Estancia de un equipo en una ubicación; valid_to es None si sigue allí"""
+    equipment_id: int
+    asset_code: str
+    name: str
+    location: LocationResponse
+    assigned_to: Optional[str]
+    valid_from: date
+    valid_to: Optional[date]
+
+def _stay_response(stay: EquipmentLocationHistory) -> StayResponse:
+    return StayResponse(
+        equipment_id=stay.equipment_id,
+        asset_code=stay.equipment.asset_code,
+        name=stay.equipment.name,
+        location=LocationResponse.model_validate(stay.location),
+        assigned_to=stay.assigned_to,
+        valid_from=stay.move_date,
+        valid_to=None if stay.valid_to == OPEN_STAY_END else stay.valid_to,
+    )
+
+# Listado rápido: filas construidas desde tuplas de columnas (mismo formato que EquipmentResponse)
+EQUIPMENT_PROJECTION = Projection(
+    Equipment,
+    columns={
+        "id": Equipment.id,
+        "asset_code": Equipment.asset_code,
+        "serial_number": Equipment.serial_number,
+        "name": Equipment.name,
+        "description": Equipment.description,
+        "brand": Equipment.brand,
+        "model": Equipment.model,
+        "purchase_date": Equipment.purchase_date,
+        "purchase_price": Equipment.purchase_price,
+        "provider_id": Equipment.provider_id,
+        "status": Equipment.status,
+        "assigned_to": Equipment.assigned_to,
+        "warranty_end_date": Equipment.warranty_end_date,
+        "created_at": Equipment.created_at,
+    },
+    one={
+        "category": (EquipmentCategory, Equipment.category_id == EquipmentCategory.id, {
+            "id": EquipmentCategory.id,
+            "name": EquipmentCategory.name,
+            "description": EquipmentCategory.description,
+        }),
+        "location": (Location, Equipment.current_location_id == Location.id, {
+            "id": Location.id,
+            "building": Location.building,
+            "floor": Location.floor,
+            "room": Location.room,
+            "department": Location.department,
+            "description": Location.description,
+        }),
+    }
+)
+
+# ============================================
+# EVENTOS
+# ============================================
+
+@subscribe("*")
+def publish_change_event(db: Session, event_type: str, payload: dict):
+    """Los cambios masivos no pasan por el flush del ORM: un evento de outbox por equipo"""
+    details = {key: value for key, value in payload.items() if key not in ("ids", "previous", "filter")}
+    previous = payload.get("previous", {})
+    publish(db, [
+        outbox_row(OUTBOX_SOURCE, "equipment", equipment_id, event_type,
+                   {**details, "previous": previous.get(equipment_id, {})})
+        for equipment_id in payload["ids"]
+    ])
+
+# ============================================
+# ARRANQUE
+# ============================================
+
+def warm_queries(db: Session):
+    """Consultas calientes: ejecutarlas una vez al arrancar deja su SQL compilado"""
+    db.query(EquipmentCategory).all()
+    db.query(Location).all()
+    EQUIPMENT_PROJECTION.query(db).offset(0).limit(1).all()
+    for item in db.query(Equipment).offset(0).limit(1).all():
+        item.category, item.location
+    db.query(Equipment).filter(Equipment.id == 0).first()
+    db.query(Equipment).filter(Equipment.id.in_([0]))\
+        .options(selectinload(Equipment.category), selectinload(Equipment.location)).all()
+
 # ============================================
 # EQUIPMENT CATEGORIES
 # ============================================
@@ -152,7 +304,13 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    if not readiness.ready:
+        return JSONResponse(status_code=503, content={"status": "starting", **readiness.snapshot()})
+    return {
+        "status": "healthy",
+        "warmup_seconds": readiness.warmup_seconds,
+        "audit": {**audit_writer.stats, "pending": audit_writer.pending}
+    }
 
 @app.post("/categories", response_model=CategoryResponse)
 def create_category(category: CategoryCreate, db: Session = Depends(get_db)):
@@ -202,6 +360,14 @@ def get_location(location_id: int, db: Session = Depends(get_db)):
 # EQUIPMENT
 # ============================================
 
+@app.get("/spec-keys")
+def get_spec_keys():
+    """Claves de specifications con columna virtual e índice (las demás se filtran sin índice)"""
+    return [
+        {"key": key.name, "type": key.type, "column": key.column, "indexed": True}
+        for key in SPEC_KEYS.values()
+    ]
+
 @app.post("/equipment", response_model=EquipmentResponse, status_code=status.HTTP_201_CREATED)
 def create_equipment(equipment: EquipmentCreate, db: Session = Depends(get_db)):
     # Verificar si el código de activo ya existe
@@ -239,18 +405,20 @@ def create_equipment(equipment: EquipmentCreate, db: Session = Depends(get_db)):
 
     return db_equipment
 
-@app.get("/equipment", response_model=List[EquipmentResponse])
-def get_equipment(
-    skip: int = 0,
-    limit: int = 100,
-    status: Optional[EquipmentStatus] = None,
-    category_id: Optional[int] = None,
-    location_id: Optional[int] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db)
-):
-    query = db.query(Equipment)
-
+def _spec_column(spec_filter: SpecFilter):
+    """Columna virtual indexada si la clave está registrada; si no, el valor extraído del JSON"""
+    if spec_filter.registered is not None:
+        return getattr(Equipment, spec_filter.registered.column)
+    value = Equipment.specifications[spec_filter.key]
+    is_number = isinstance(spec_filter.value[0] if spec_filter.op == "in" else spec_filter.value, Decimal)
+    return value.as_float() if is_number else value.as_string()
+
+def _apply_equipment_filters(query, status: Optional[EquipmentStatus] = None, category_id: Optional[int] = None,
+                             location_id: Optional[int] = None, search: Optional[str] = None,
+                             spec: Optional[List[str]] = None):
+    """Filtros comunes de GET /equipment y de las operaciones masivas"""
+    for spec_filter in parse_spec_filters(spec):
+        query = query.filter(spec_predicate(_spec_column(spec_filter), spec_filter))
     if status:
         query = query.filter(Equipment.status == status)
     if category_id:
@@ -267,8 +435,44 @@ def get_equipment(
                 Equipment.model.like(f"%{search}%")
             )
         )
+    return query
 
-    equipment_list = query.offset(skip).limit(limit).all()
+@app.get("/equipment", response_model=List[EquipmentResponse])
+def get_equipment(
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[EquipmentStatus] = None,
+    category_id: Optional[int] = None,
+    location_id: Optional[int] = None,
+    search: Optional[str] = None,
+    spec: Optional[List[str]] = Query(None, description="Filtros sobre specifications: clave:operador:valor (p. ej. ram_gb:lte:8)"),
+    fast: bool = Query(False, description="Serializar desde tuplas de columnas con orjson"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas (p. ej. asset_code,name,status)"),
+    db: Session = Depends(get_db)
+):
+    projection = projection_for(EQUIPMENT_PROJECTION, fields)
+    fast = fast or projection is not EQUIPMENT_PROJECTION
+    query = projection.query(db) if fast else db.query(Equipment)
+
+    query = _apply_equipment_filters(query, status, category_id, location_id, search, spec)
+    query = query.offset(skip).limit(limit)
+    if fast:
+        return FastJSONResponse(projection.fetch(query))
+
+    equipment_list = query.all()
+    return equipment_list
+
+@app.post("/equipment/batch", response_model=List[EquipmentResponse])
+def get_equipment_batch(lookup: BatchLookup, db: Session = Depends(get_db)):
+    """Obtener varios equipos por ID en una sola consulta (IN indexado sobre la PK)"""
+    ids = list(dict.fromkeys(lookup.ids))
+    if not ids:
+        return []
+
+    equipment_list = db.query(Equipment)\
+        .options(selectinload(Equipment.category), selectinload(Equipment.location))\
+        .filter(Equipment.id.in_(ids))\
+        .all()
     return equipment_list
 
 @app.get("/equipment/{equipment_id}", response_model=EquipmentResponse)
@@ -302,6 +506,28 @@ def delete_equipment(equipment_id: int, db: Session = Depends(get_db)):
     db.commit()
     return {"message": "Equipment deleted successfully"}
 
+def _close_open_stays(db: Session, equipment_ids: List[int], move_date: date):
+    """Terminar en `move_date` la estancia abierta de cada equipo (un solo UPDATE)"""
+    backdated = db.query(EquipmentLocationHistory.equipment_id).filter(
+        EquipmentLocationHistory.equipment_id.in_(equipment_ids),
+        EquipmentLocationHistory.valid_to == OPEN_STAY_END,
+        EquipmentLocationHistory.move_date > move_date
+    ).first()
+    if backdated:
+        raise HTTPException(
+            status_code=400,
+            detail=f"move_date is earlier than the current location of equipment {backdated.equipment_id}"
+        )
+
+    db.execute(
+        update(EquipmentLocationHistory)
+        .where(
+            EquipmentLocationHistory.equipment_id.in_(equipment_ids),
+            EquipmentLocationHistory.valid_to == OPEN_STAY_END
+        )
+        .values(valid_to=move_date)
+    )
+
 @app.post("/equipment/{equipment_id}/move", response_model=EquipmentResponse)
 def move_equipment(equipment_id: int, move: EquipmentMove, db: Session = Depends(get_db)):
     equipment = db.query(Equipment).filter(Equipment.id == equipment_id).first()
@@ -312,7 +538,8 @@ def move_equipment(equipment_id: int, move: EquipmentMove, db: Session = Depends
     equipment.current_location_id = move.location_id
     equipment.assigned_to = move.assigned_to
 
-    # Registrar en historial
+    # Cerrar la estancia anterior y registrar la nueva en el historial
+    _close_open_stays(db, [equipment_id], move.move_date)
     history = EquipmentLocationHistory(
         equipment_id=equipment_id,
         location_id=move.location_id,
@@ -327,14 +554,264 @@ def move_equipment(equipment_id: int, move: EquipmentMove, db: Session = Depends
 
     return equipment
 
+@app.post("/equipment/bulk-move", response_model=BulkMoveResult)
+def bulk_move_equipment(move: BulkMove, db: Session = Depends(get_db)):
+    """Trasladar muchos equipos en una transacción: un UPDATE por conjunto y un INSERT multi-fila de historial"""
+    if (move.ids is None) == (move.from_location_id is None):
+        raise HTTPException(status_code=400, detail="Provide either ids or from_location_id")
+    if not db.query(Location.id).filter(Location.id == move.location_id).first():
+        raise HTTPException(status_code=404, detail="Location not found")
+
+    # Bloquear las filas afectadas para que un traslado concurrente no se cruce con este
+    query = db.query(Equipment.id, Equipment.current_location_id, Equipment.assigned_to)
+    if move.ids is not None:
+        requested = list(dict.fromkeys(move.ids))
+        query = query.filter(Equipment.id.in_(requested))
+    else:
+        query = query.filter(Equipment.current_location_id == move.from_location_id)
+    rows = query.order_by(Equipment.id).limit(BULK_MOVE_MAX_ITEMS + 1).with_for_update().all()
+    if len(rows) > BULK_MOVE_MAX_ITEMS:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Too many equipment to move at once (max {BULK_MOVE_MAX_ITEMS})")
+    if move.ids is None:
+        requested = [row.id for row in rows]
+
+    found = {row.id for row in rows}
+    change_assignee = "assigned_to" in move.model_fields_set
+    to_move = [
+        row for row in rows
+        if row.current_location_id != move.location_id or (change_assignee and row.assigned_to != move.assigned_to)
+    ]
+
+    if to_move:
+        moved_ids = [row.id for row in to_move]
+        values = {"current_location_id": move.location_id}
+        if change_assignee:
+            values["assigned_to"] = move.assigned_to
+        db.execute(update(Equipment).where(Equipment.id.in_(moved_ids)).values(**values))
+        _close_open_stays(db, moved_ids, move.move_date)
+        db.execute(insert(EquipmentLocationHistory), [
+            {
+                "equipment_id": row.id,
+                "location_id": move.location_id,
+                "assigned_to": move.assigned_to if change_assignee else row.assigned_to,
+                "move_date": move.move_date,
+                "reason": move.reason,
+                "moved_by": move.moved_by,
+            }
+            for row in to_move
+        ])
+        emit(db, "equipment.moved", {
+            "ids": moved_ids,
+            "location_id": move.location_id,
+            "move_date": move.move_date.isoformat(),
+            "moved_by": move.moved_by,
+            "changes": values,
+            "previous": {row.id: {field: getattr(row, field) for field in values} for row in to_move},
+        })
+    db.commit()
+
+    moved = {row.id for row in to_move}
+    return BulkMoveResult(
+        location_id=move.location_id,
+        requested=len(requested),
+        moved=len(moved),
+        moved_ids=sorted(moved),
+        already_there=sorted(found - moved),
+        not_found=[equipment_id for equipment_id in requested if equipment_id not in found],
+    )
+
+@app.post("/equipment/bulk-update", response_model=BulkUpdateResult)
+def bulk_update_equipment(bulk: BulkUpdate, db: Session = Depends(get_db)):
+    """Aplicar el mismo cambio a todos los equipos que cumplen el filtro con un solo UPDATE"""
+    changes = bulk.patch.model_dump(exclude_unset=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="Patch is empty")
+    filters = bulk.filter.model_dump(exclude_none=True)
+    if not filters and not bulk.match_all:
+        raise HTTPException(status_code=400, detail="Empty filter matches all equipment, set match_all to confirm")
+    if changes.get("category_id") is not None and \
+            not db.query(EquipmentCategory.id).filter(EquipmentCategory.id == changes["category_id"]).first():
+        raise HTTPException(status_code=404, detail="Category not found")
+
+    # Con los valores actuales de los campos que cambian (van en los eventos de cambio)
+    columns = [getattr(Equipment, field) for field in changes]
+    query = _apply_equipment_filters(db.query(Equipment.id, *columns), **filters).order_by(Equipment.id)
+    if not bulk.dry_run:
+        query = query.with_for_update()
+    rows = query.limit(BULK_UPDATE_MAX_ITEMS + 1).all()
+    ids = [row.id for row in rows]
+    if len(ids) > BULK_UPDATE_MAX_ITEMS:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Filter matches too many equipment (max {BULK_UPDATE_MAX_ITEMS})")
+
+    if bulk.dry_run or not ids:
+        db.rollback()
+        return BulkUpdateResult(matched=len(ids), updated=0, dry_run=bulk.dry_run, changes=changes, ids=ids)
+
+    db.execute(update(Equipment).where(Equipment.id.in_(ids)).values(**changes))
+    emit(db, "equipment.updated", {
+        "ids": ids,
+        "changes": jsonable_encoder(changes),
+        "previous": {row.id: jsonable_encoder({field: getattr(row, field) for field in changes}) for row in rows},
+        "filter": jsonable_encoder(filters),
+    })
+    db.commit()
+    return BulkUpdateResult(matched=len(ids), updated=len(ids), dry_run=False, changes=changes, ids=ids)
+
 @app.get("/equipment/{equipment_id}/history", response_model=List[LocationHistoryResponse])
-def get_equipment_history(equipment_id: int, db: Session = Depends(get_db)):
+def get_equipment_history(
+    equipment_id: int,
+    include_archive: bool = Query(False, description="Incluir las estancias archivadas"),
+    db: Session = Depends(get_db)
+):
     history = db.query(EquipmentLocationHistory)\
         .filter(EquipmentLocationHistory.equipment_id == equipment_id)\
         .order_by(EquipmentLocationHistory.move_date.desc())\
         .all()
+    if include_archive:
+        # Las estancias archivadas terminaron antes de la retención: todas son anteriores
+        history += db.query(EquipmentLocationHistoryArchive)\
+            .filter(EquipmentLocationHistoryArchive.equipment_id == equipment_id)\
+            .order_by(EquipmentLocationHistoryArchive.move_date.desc())\
+            .all()
     return history
 
+@app.get("/equipment/{equipment_id}/location-as-of", response_model=StayResponse)
+def get_equipment_location_as_of(
+    equipment_id: int,
+    as_of: date,
+    include_archive: bool = Query(False, description="Buscar también en las estancias archivadas"),
+    db: Session = Depends(get_db)
+):
+    """Dónde estaba un equipo en una fecha: la última estancia empezada ese día o antes"""
+    models = [EquipmentLocationHistory, EquipmentLocationHistoryArchive] if include_archive else [EquipmentLocationHistory]
+    stay = None
+    for model in models:
+        # Si la tabla viva tiene una estancia empezada antes de as_of, es más reciente que cualquiera archivada
+        stay = db.query(model)\
+            .options(selectinload(model.equipment), selectinload(model.location))\
+            .filter(model.equipment_id == equipment_id, model.move_date <= as_of)\
+            .order_by(model.move_date.desc(), model.id.desc())\
+            .first()
+        if stay:
+            break
+    if not stay or stay.valid_to <= as_of:
+        raise HTTPException(status_code=404, detail="Equipment had no location on that date")
+    return _stay_response(stay)
+
+@app.get("/inventory/as-of", response_model=List[StayResponse])
+def get_inventory_as_of(
+    as_of: date,
+    location_id: Optional[int] = None,
+    building: Optional[str] = None,
+    department: Optional[str] = None,
+    skip: int = 0,
+    limit: int = Query(1000, le=10000),
+    include_archive: bool = Query(False, description="Buscar también en las estancias archivadas"),
+    db: Session = Depends(get_db)
+):
+    """Qué equipos había en una ubicación (o edificio/departamento) en una fecha"""
+    if location_id is None and not building and not department:
+        raise HTTPException(status_code=400, detail="Provide location_id, building or department")
+
+    location_ids = None
+    if building or department:
+        locations = db.query(Location.id)
+        if building:
+            locations = locations.filter(Location.building == building)
+        if department:
+            locations = locations.filter(Location.department == department)
+        location_ids = [row.id for row in locations]
+
+    if not include_archive:
+        stays = _stays_as_of(db, EquipmentLocationHistory, as_of, location_id, location_ids)\
+            .offset(skip).limit(limit).all()
+        return [_stay_response(stay) for stay in stays]
+
+    # Cada estancia está en una sola tabla: se piden skip + limit de cada una, se mezclan y se corta la página
+    stays = _stays_as_of(db, EquipmentLocationHistory, as_of, location_id, location_ids).limit(skip + limit).all()
+    stays += _stays_as_of(db, EquipmentLocationHistoryArchive, as_of, location_id, location_ids).limit(skip + limit).all()
+    stays.sort(key=lambda stay: (stay.location_id, stay.equipment_id))
+    return [_stay_response(stay) for stay in stays[skip:skip + limit]]
+
+def _stays_as_of(db: Session, model, as_of: date, location_id: Optional[int], location_ids: Optional[List[int]]):
+    # Rango sobre los índices de estancias de cada ubicación: move_date <= D < valid_to
+    query = db.query(model)\
+        .options(selectinload(model.equipment), selectinload(model.location))\
+        .filter(model.move_date <= as_of, model.valid_to > as_of)
+    if location_id is not None:
+        query = query.filter(model.location_id == location_id)
+    if location_ids is not None:
+        query = query.filter(model.location_id.in_(location_ids))
+    return query.order_by(model.location_id, model.equipment_id)
+
+# Dimensiones del cubo de inventario: nombre -> columna
+CUBE_DIMENSIONS = {
+    "status": Equipment.status,
+    "category": EquipmentCategory.name,
+    "building": Location.building,
+    "department": Location.department,
+}
+
+def _cube_rollups(cells: List[dict], dimensions: List[str]) -> dict:
+    """Agregar en memoria las celdas base para cada combinación de dimensiones"""
+    rollups = {}
+    for size in range(len(dimensions)):
+        for group in combinations(dimensions, size):
+            totals = {}
+            for cell in cells:
+                key = tuple(cell[d] for d in group)
+                entry = totals.setdefault(key, [0, Decimal(0)])
+                entry[0] += cell["count"]
+                entry[1] += cell["total_value"]
+            rollups[",".join(group) or "total"] = [
+                {**dict(zip(group, key)), "count": count, "total_value": total_value}
+                for key, (count, total_value) in totals.items()
+            ]
+    return rollups
+
+@app.get("/stats/cube")
+def get_stats_cube(
+    dimensions: str = Query(",".join(CUBE_DIMENSIONS), description="Dimensiones separadas por comas"),
+    rollups: bool = Query(True, description="Incluir los subtotales de cada combinación de dimensiones"),
+    db: Session = Depends(get_db)
+):
+    """Número de equipos y valor de compra por estado × categoría × edificio × departamento.
+
+    Un solo GROUP BY sobre equipment al nivel más fino; los subtotales de cualquier
+    combinación (MySQL tiene WITH ROLLUP pero no CUBE ni GROUPING SETS) se suman en
+    memoria sobre esas celdas, que son pocas comparadas con las filas de la tabla.
+    """
+    requested = [d.strip() for d in dimensions.split(",") if d.strip()]
+    unknown = [d for d in requested if d not in CUBE_DIMENSIONS]
+    if unknown or not requested:
+        raise HTTPException(status_code=400, detail=f"Unknown dimensions: {', '.join(unknown)}" if unknown else "No dimensions")
+    requested = list(dict.fromkeys(requested))
+
+    columns = [CUBE_DIMENSIONS[d] for d in requested]
+    rows = db.query(
+        *columns,
+        func.count(Equipment.id),
+        func.coalesce(func.sum(Equipment.purchase_price), 0)
+    ).select_from(Equipment)\
+     .outerjoin(EquipmentCategory, Equipment.category_id == EquipmentCategory.id)\
+     .outerjoin(Location, Equipment.current_location_id == Location.id)\
+     .group_by(*columns)\
+     .all()
+
+    cells = []
+    for row in rows:
+        cell = dict(zip(requested, row))
+        cell["count"] = row[-2]
+        cell["total_value"] = Decimal(row[-1])
+        cells.append(cell)
+
+    result = {"dimensions": requested, "cells": cells}
+    if rollups:
+        result["rollups"] = _cube_rollups(cells, requested)
+    return FastJSONResponse(result)
+
 @app.get("/stats/by-status")
 def get_stats_by_status(db: Session = Depends(get_db)):
     stats = db.query(
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Date, Numeric, Text, ForeignKey, DateTime, Enum, Boolean, JSON
-from sqlalchemy.orm import relationship
-from datetime import datetime
+from sqlalchemy import Column, Integer, String, Date, Numeric, Text, ForeignKey, DateTime, Enum, Boolean, JSON, Index, Computed, MetaData
+from sqlalchemy.orm import relationship, deferred
+from datetime import date, datetime
 from .database import Base
+from .specs import SPEC_KEYS, SpecValue
 import enum
 
 class EquipmentStatus(str, enum.Enum):
@@ -58,17 +59,73 @@ class Equipment(Base):
     category = relationship("EquipmentCategory")
     location = relationship("Location")
 
+# Columnas virtuales e índices de las claves de `specifications` registradas en specs.py.
+# Diferidas: son para filtrar, leerlas obligaría a MySQL a extraerlas del JSON en cada fila
+for _key in SPEC_KEYS.values():
+    setattr(Equipment, _key.column, deferred(Column(
+        Numeric(12, 2) if _key.type == "number" else String(_key.length),
+        Computed(SpecValue(_key), persisted=False)
+    )))
+    Index(f"idx_{_key.column}", getattr(Equipment, _key.column))
+
+# Fin de una estancia que sigue abierta (el equipo continúa en esa ubicación)
+OPEN_STAY_END = date(9999, 12, 31)
+
 class EquipmentLocationHistory(Base):
+    """Cada fila es una estancia: el equipo estuvo en `location_id` desde `move_date`
+    (incluido) hasta `valid_to` (excluido, la fecha del siguiente movimiento)"""
     __tablename__ = "equipment_location_history"
+    __table_args__ = (
+        # "Qué había en la ubicación L el día D": move_date <= D AND valid_to > D.
+        # Con dos índices el optimizador recorre el rango más corto (estancias
+        # empezadas antes de D para fechas antiguas, no cerradas aún para recientes)
+        Index("idx_location_stay", "location_id", "move_date", "valid_to", "equipment_id"),
+        Index("idx_location_stay_end", "location_id", "valid_to", "move_date", "equipment_id"),
+        # "Dónde estaba el equipo X el día D": última estancia con move_date <= D
+        Index("idx_equipment_stay", "equipment_id", "move_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     equipment_id = Column(Integer, ForeignKey("equipment.id"), nullable=False)
     location_id = Column(Integer, ForeignKey("locations.id"), nullable=False)
     assigned_to = Column(String(100))
     move_date = Column(Date, nullable=False)
+    valid_to = Column(Date, nullable=False, default=OPEN_STAY_END, server_default=OPEN_STAY_END.isoformat())
     reason = Column(Text)
     moved_by = Column(Integer)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     equipment = relationship("Equipment")
     location = relationship("Location")
+
+# Tablas de archivo (init.sql / migración 005): particionadas por año y comprimidas.
+# Fuera de Base.metadata para que create_all no las cree sin particiones en una BD sin la migración
+ARCHIVE_METADATA = MetaData()
+
+class EquipmentLocationHistoryArchive(Base):
+    """Estancia terminada archivada por el ciclo de vida (reports-service); solo lectura.
+    Particionada por año de move_date; índices en init.sql"""
+    __tablename__ = "equipment_location_history_archive"
+    metadata = ARCHIVE_METADATA
+
+    id = Column(Integer, primary_key=True)
+    equipment_id = Column(Integer, nullable=False)
+    location_id = Column(Integer, nullable=False)
+    assigned_to = Column(String(100))
+    move_date = Column(Date, primary_key=True)
+    valid_to = Column(Date, nullable=False)
+    reason = Column(Text)
+    moved_by = Column(Integer)
+    created_at = Column(DateTime)
+    archived_at = Column(DateTime)
+
+    equipment = relationship(
+        "Equipment",
+        primaryjoin="foreign(EquipmentLocationHistoryArchive.equipment_id) == Equipment.id",
+        viewonly=True
+    )
+    location = relationship(
+        "Location",
+        primaryjoin="foreign(EquipmentLocationHistoryArchive.location_id) == Location.id",
+        viewonly=True
+    )
@@ -0,0 +1,117 @@
+"""Outbox transaccional: cada cambio de un agregado deja un evento en `outbox_events`.
+
+El evento se inserta con la misma conexión y en la misma transacción que el
+cambio (evento `after_flush` de la sesión), así que no hay eventos de cambios
+deshechos ni cambios sin evento. El reports-service los sirve como un feed con
+offset (`GET /changes?after=<id>`) para que los consumidores mantengan cachés y
+agregados de forma incremental.
+
+Tipos de evento: `<agregado>.created`, `<agregado>.updated`, `<agregado>.deleted`
+y los definidos por campo en `Aggregate.field_events` (p. ej. `equipment.moved`
+cuando cambia la ubicación).
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import column, event, inspect, table
+
+OUTBOX_TABLE = table(
+    "outbox_events",
+    column("aggregate_type"),
+    column("aggregate_id"),
+    column("event_type"),
+    column("payload"),
+    column("source"),
+)
+
+
+class Aggregate(NamedTuple):
+    name: str
+    # Campo modificado -> sufijo del evento que lo sustituye a `updated`
+    field_events: Dict[str, str] = {}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+
+def outbox_row(source: str, aggregate_type: str, aggregate_id: Optional[int], event_type: str, payload: dict) -> dict:
+    return {
+        "aggregate_type": aggregate_type,
+        "aggregate_id": aggregate_id,
+        "event_type": event_type,
+        "payload": json.dumps(payload, default=_json_default, ensure_ascii=False),
+        "source": source,
+    }
+
+
+def publish(session, rows: List[dict]):
+    """Insertar eventos en la transacción en curso de la sesión (INSERT multi-fila)"""
+    if rows:
+        session.connection().execute(OUTBOX_TABLE.insert(), rows)
+
+
+def _primary_key(state) -> Optional[int]:
+    values = [state.dict.get(state.mapper.get_property_by_column(col).key) for col in state.mapper.primary_key]
+    return values[0] if len(values) == 1 else None
+
+
+def _columns(state):
+    # Las columnas generadas se derivan de otras; solo lo cargado, sin lanzar consultas
+    return [prop for prop in state.mapper.column_attrs if prop.columns[0].computed is None]
+
+
+def _snapshot(state) -> dict:
+    return {prop.key: state.dict[prop.key] for prop in _columns(state) if prop.key in state.dict}
+
+
+def _changes(state):
+    # Valores anteriores incluidos: un consumidor que lleva conteos por estado necesita saber de dónde sale
+    changes, previous = {}, {}
+    for prop in _columns(state):
+        history = state.attrs[prop.key].history
+        if history.has_changes():
+            changes[prop.key] = history.added[0] if history.added else None
+            previous[prop.key] = history.deleted[0] if history.deleted else None
+    return changes, previous
+
+
+def register_outbox(session_factory, source: str, aggregates: Dict[str, Aggregate]):
+    """Publicar los cambios de las tablas de `aggregates` ({tabla: Aggregate}) hechos con el ORM.
+
+    Los UPDATE/DELETE masivos no pasan por el flush: quien los hace publica sus
+    eventos con `publish` (en equipment-service, desde los eventos de events.py).
+    """
+    def after_flush(session, flush_context):
+        rows = []
+        for objects, kind in ((session.new, "created"), (session.dirty, "updated"), (session.deleted, "deleted")):
+            for obj in objects:
+                state = inspect(obj)
+                aggregate = aggregates.get(state.mapper.local_table.name)
+                if aggregate is None:
+                    continue
+                event_kind = kind
+                if kind == "updated":
+                    changes, previous = _changes(state)
+                    if not changes:
+                        continue
+                    payload = {"changes": changes, "previous": previous}
+                    event_kind = next(
+                        (suffix for field, suffix in aggregate.field_events.items() if field in changes),
+                        kind
+                    )
+                else:
+                    payload = _snapshot(state)
+                rows.append(outbox_row(source, aggregate.name, _primary_key(state), f"{aggregate.name}.{event_kind}", payload))
+        publish(session, rows)
+
+    event.listen(session_factory, "after_flush", after_flush)
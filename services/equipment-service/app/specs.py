@@ -0,0 +1,147 @@
+"""Consultas tipadas sobre las claves de `equipment.specifications` (JSON).
+
+Las claves registradas en SPEC_KEYS tienen una columna generada virtual (el valor
+extraído del JSON con su tipo) y un índice, así que un filtro como
+`spec=ram_gb:lte:8` es un rango sobre el índice en vez de leer y parsear el JSON
+de cada fila. Las claves no registradas se pueden consultar igual, extrayendo el
+valor en cada fila.
+
+Al registrar una clave nueva, generar su migración con:
+
+    python -m app.specs
+"""
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+
+
+class SpecKey(NamedTuple):
+    name: str          # clave de primer nivel en el JSON
+    type: str          # "number" o "string"
+    length: int = 100  # longitud máxima para las de tipo string
+
+    @property
+    def column(self) -> str:
+        return f"spec_{self.name}"
+
+    @property
+    def sql_type(self) -> str:
+        return "DECIMAL(12,2)" if self.type == "number" else f"VARCHAR({self.length})"
+
+    @property
+    def expression(self) -> str:
+        # NULL si falta la clave o el valor no es del tipo: un dato mal escrito no debe hacer fallar el INSERT
+        returning = "DECIMAL(12,2)" if self.type == "number" else f"CHAR({self.length})"
+        return f"JSON_VALUE(specifications, '$.{self.name}' RETURNING {returning} NULL ON ERROR)"
+
+
+class SpecValue(ColumnElement):
+    """Expresión de la columna generada de una clave, compilada según el dialecto.
+
+    JSON_VALUE ... RETURNING es de MySQL; en el resto (SQLite en benchmarks y
+    pruebas) basta json_extract para que create_all pueda crear la tabla.
+    """
+    inherit_cache = False  # solo aparece en el DDL
+
+    def __init__(self, key: "SpecKey"):
+        self.key = key
+
+
+@compiles(SpecValue)
+def _compile_spec_value(element, compiler, **kw):
+    return f"json_extract(specifications, '$.{element.key.name}')"
+
+
+@compiles(SpecValue, "mysql")
+def _compile_spec_value_mysql(element, compiler, **kw):
+    return element.key.expression
+
+
+# Claves consultadas con frecuencia (planificación de renovaciones)
+SPEC_KEYS: Dict[str, SpecKey] = {key.name: key for key in [
+    SpecKey("ram_gb", "number"),
+    SpecKey("storage_gb", "number"),
+    SpecKey("cpu", "string"),
+    SpecKey("os", "string"),
+]}
+
+SPEC_OPERATORS = ("eq", "ne", "lt", "lte", "gt", "gte", "contains", "in")
+
+
+class SpecFilter(NamedTuple):
+    key: str
+    op: str
+    value: object
+    registered: Optional[SpecKey]
+
+
+def _typed(value: str, spec_type: str):
+    if spec_type == "string":
+        return value
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise HTTPException(status_code=400, detail=f"Spec value '{value}' is not a number")
+
+
+def parse_spec_filter(raw: str) -> SpecFilter:
+    """`clave:operador:valor`, p. ej. ram_gb:lte:8, cpu:contains:i7, os:in:Windows 11|Ubuntu 22.04"""
+    key, op, value = (raw.split(":", 2) + ["", ""])[:3]
+    if not key.isidentifier():
+        raise HTTPException(status_code=400, detail=f"Invalid spec key '{key}'")
+    if op not in SPEC_OPERATORS:
+        raise HTTPException(status_code=400, detail=f"Unknown spec operator '{op}', use one of: {', '.join(SPEC_OPERATORS)}")
+
+    registered = SPEC_KEYS.get(key)
+    if op == "contains":
+        spec_type = "string"
+    elif registered is not None:
+        spec_type = registered.type
+    else:
+        # Clave no registrada: numérica si el valor lo parece
+        try:
+            Decimal(value.split("|")[0])
+            spec_type = "number"
+        except InvalidOperation:
+            spec_type = "string"
+    if registered is not None and registered.type != spec_type:
+        raise HTTPException(status_code=400, detail=f"Spec key '{key}' is a {registered.type}")
+
+    if op == "in":
+        return SpecFilter(key, op, [_typed(v, spec_type) for v in value.split("|")], registered)
+    return SpecFilter(key, op, _typed(value, spec_type), registered)
+
+
+def parse_spec_filters(raw: Optional[List[str]]) -> List[SpecFilter]:
+    return [parse_spec_filter(item) for item in raw or []]
+
+
+def spec_predicate(column, spec_filter: SpecFilter):
+    value = spec_filter.value
+    return {
+        "eq": lambda: column == value,
+        "ne": lambda: column != value,
+        "lt": lambda: column < value,
+        "lte": lambda: column <= value,
+        "gt": lambda: column > value,
+        "gte": lambda: column >= value,
+        "contains": lambda: column.like(f"%{value}%"),
+        "in": lambda: column.in_(value),
+    }[spec_filter.op]()
+
+
+def migration_sql(keys: List[SpecKey]) -> Tuple[str, str]:
+    """ALTER TABLE para añadir las columnas virtuales y sus índices"""
+    columns = ",\n".join(
+        f"    ADD COLUMN {key.column} {key.sql_type} AS ({key.expression}) VIRTUAL" for key in keys
+    )
+    indexes = ",\n".join(f"    ADD INDEX idx_{key.column} ({key.column})" for key in keys)
+    return f"ALTER TABLE equipment\n{columns};", f"ALTER TABLE equipment\n{indexes};"
+
+
+if __name__ == "__main__":
+    for statement in migration_sql(list(SPEC_KEYS.values())):
+        print(statement + "\n")
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import random
+import signal
+import time
+from typing import Callable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Tiempo máximo esperando a la base de datos antes de dar el arranque por fallido
+DB_STARTUP_TIMEOUT = float(os.getenv("DB_STARTUP_TIMEOUT", "120"))
+
+# Código de salida con el que gunicorn da un worker por no arrancable y detiene el servidor
+# entero (si no, el arbiter lo vuelve a lanzar en bucle contra una BD caída)
+WORKER_BOOT_ERROR = 3
+
+
+class Readiness:
+    """Estado del arranque: /health responde 503 hasta que termina el calentamiento"""
+
+    def __init__(self):
+        self.ready = False
+        self.phase = "starting"
+        self.error: Optional[str] = None
+        self.started_at = time.monotonic()
+        self.warmup_seconds: Optional[float] = None
+
+    def set_phase(self, phase: str):
+        self.phase = phase
+
+    def mark_ready(self):
+        self.ready = True
+        self.phase = "ready"
+        self.warmup_seconds = round(time.monotonic() - self.started_at, 2)
+
+    def snapshot(self) -> dict:
+        return {"phase": self.phase, "error": self.error, "warmup_seconds": self.warmup_seconds}
+
+
+readiness = Readiness()
+
+
+def _ping(engine):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+async def wait_for_database(engine, timeout: float = DB_STARTUP_TIMEOUT, base_delay: float = 0.25, max_delay: float = 5.0) -> int:
+    """Esperar a la BD sin bloquear el event loop (backoff exponencial con jitter)"""
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            await asyncio.to_thread(_ping, engine)
+            return attempt
+        except Exception as e:
+            if time.monotonic() >= deadline:
+                raise
+            delay = min(max_delay, base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            print(f"⚠️ Database connection attempt {attempt} failed: {e}")
+            print(f"Retrying in {delay:.1f} seconds...")
+            await asyncio.sleep(delay)
+
+
+def prewarm_pool(engine, size: int):
+    """Abrir `size` conexiones a la vez y devolverlas al pool para que queden abiertas"""
+    connections = []
+    try:
+        for _ in range(size):
+            conn = engine.connect()
+            conn.execute(text("SELECT 1"))
+            connections.append(conn)
+    finally:
+        for conn in connections:
+            conn.close()
+
+
+def run_warm_queries(session_factory, warm_queries: Callable[[Session], None]):
+    # Ejecutar las consultas una vez deja su SQL compilado en la caché del engine
+    db = session_factory()
+    try:
+        warm_queries(db)
+    finally:
+        db.rollback()
+        db.close()
+
+
+async def warm_up(engine, session_factory, pool_size: int, metadata=None,
+                  warm_queries: Optional[Callable[[Session], None]] = None):
+    """Arranque completo: esperar a la BD, crear tablas, llenar el pool y compilar consultas.
+
+    Si la BD no responde en DB_STARTUP_TIMEOUT segundos se detiene el servicio
+    entero (no solo este worker) para que Docker reinicie el contenedor.
+    """
+    try:
+        readiness.set_phase("waiting_for_database")
+        attempts = await wait_for_database(engine)
+        print(f"✅ Database connection established on attempt {attempts}")
+
+        if metadata is not None:
+            readiness.set_phase("creating_tables")
+            await asyncio.to_thread(metadata.create_all, bind=engine)
+
+        readiness.set_phase("warming_pool")
+        await asyncio.to_thread(prewarm_pool, engine, pool_size)
+
+        if warm_queries is not None:
+            readiness.set_phase("warming_queries")
+            try:
+                await asyncio.to_thread(run_warm_queries, session_factory, warm_queries)
+            except Exception as e:
+                # Una consulta de calentamiento fallida no impide servir tráfico
+                print(f"⚠️ Query warm-up failed: {e}")
+
+        readiness.mark_ready()
+        print(f"✅ Service ready after {readiness.warmup_seconds}s")
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        readiness.error = str(e)
+        readiness.set_phase("failed")
+        print(f"❌ Startup failed: {e}")
+        stop_server()
+
+
+def stop_server():
+    """Detener el servidor del que forma parte este proceso (SERVER_SUPERVISOR lo fija app/server.py)"""
+    supervisor = os.getenv("SERVER_SUPERVISOR")
+    if supervisor == "gunicorn":
+        # Sin limpieza: el worker no llegó a servir tráfico y el arbiter solo mira el código
+        os._exit(WORKER_BOOT_ERROR)
+    elif supervisor == "uvicorn":
+        # El proceso padre es el supervisor multiproceso de uvicorn: lo para a él y a todos los workers
+        os.kill(os.getppid(), signal.SIGTERM)
+    else:
+        os.kill(os.getpid(), signal.SIGTERM)
@@ -0,0 +1,318 @@
+"""Motor de alertas: llena la tabla `alerts` de forma incremental.
+
+Cada regla tiene una fecha de referencia (fin de garantía, fecha programada del
+mantenimiento, fecha de compra) y un horizonte. En cada ciclo solo se consulta
+la franja de fechas que ha entrado en el horizonte desde el ciclo anterior
+(marca de agua `date_watermark`) más las filas modificadas desde entonces
+(`changed_watermark` sobre updated_at), ambas con índice. Las alertas se
+insertan por lotes con INSERT ... ON DUPLICATE KEY UPDATE sobre
+(alert_type, equipment_id, due_date), así que repetir una ventana no duplica.
+
+Las alertas nuevas y los mantenimientos que pasan a estar vencidos se publican
+en el outbox (`alert.created`, `maintenance.overdue`) en la misma transacción,
+para que el gateway los notifique en vivo.
+
+Con varias réplicas o workers solo una ejecuta el ciclo: la que obtiene el
+bloqueo GET_LOCK de MySQL.
+"""
+import os
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+
+from .models import Alert, AlertWatermark, AlertTypeEnum, AlertPriorityEnum
+from .outbox import outbox_row, publish
+
+ALERT_ENGINE_INTERVAL = float(os.getenv("ALERT_ENGINE_INTERVAL", "300"))
+ALERT_BATCH_SIZE = int(os.getenv("ALERT_BATCH_SIZE", "500"))
+
+# Horizontes de cada regla
+WARRANTY_ALERT_DAYS = int(os.getenv("WARRANTY_ALERT_DAYS", "60"))
+MAINTENANCE_ALERT_DAYS = int(os.getenv("MAINTENANCE_ALERT_DAYS", "7"))
+EQUIPMENT_OLD_YEARS = int(os.getenv("EQUIPMENT_OLD_YEARS", "5"))
+
+# Solape al leer cambios por updated_at (desfase de reloj entre réplicas y la BD)
+CHANGE_OVERLAP = timedelta(minutes=5)
+
+LOCK_NAME = "it_management.alert_engine"
+
+OUTBOX_SOURCE = "maintenance-service"
+# Marca de agua (en alert_watermarks) de los mantenimientos ya notificados como vencidos
+OVERDUE_WATERMARK = "maintenance_overdue"
+
+stats = {
+    "cycles": 0, "not_leader": 0, "alerts_upserted": 0, "alerts_resolved": 0, "overdue_published": 0,
+    "last_run_at": None, "last_error": None,
+}
+
+
+def _shift_years(day: date, years: int) -> date:
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:  # 29 de febrero
+        return day.replace(year=day.year + years, day=28)
+
+
+def _priority(due_date: date, today: date) -> AlertPriorityEnum:
+    days = (due_date - today).days
+    if days < 0:
+        return AlertPriorityEnum.critical
+    if days <= 7:
+        return AlertPriorityEnum.high
+    return AlertPriorityEnum.medium
+
+
+class AlertRule(NamedTuple):
+    alert_type: AlertTypeEnum
+    # Filas cuya fecha está en (:start, :end]
+    window_sql: str
+    # Filas modificadas desde :since cuya fecha está en [:today, :end]
+    changed_sql: str
+    # Fecha máxima que debe estar cubierta hoy y primera fecha a revisar sin marca de agua
+    horizon: Callable[[date], date]
+    initial_start: Callable[[date], date]
+    build: Callable[[dict, date], dict]
+    # Marca como leídas las alertas que dejaron de aplicar por cambios desde :since
+    resolve_sql: Optional[str] = None
+
+
+def _warranty_alert(row: dict, today: date) -> dict:
+    return {
+        "title": f"Garantía por vencer: {row['asset_code']}",
+        "message": f"La garantía de {row['name']} ({row['asset_code']}) vence el {row['due_date'].isoformat()}.",
+        "priority": _priority(row["due_date"], today),
+    }
+
+
+def _maintenance_alert(row: dict, today: date) -> dict:
+    return {
+        "title": f"Mantenimiento programado: {row['asset_code']}",
+        "message": f"{row['description']} ({row['name']}) programado para el {row['due_date'].isoformat()}.",
+        "priority": _priority(row["due_date"], today),
+    }
+
+
+def _old_equipment_alert(row: dict, today: date) -> dict:
+    return {
+        "title": f"Equipo con más de {EQUIPMENT_OLD_YEARS} años: {row['asset_code']}",
+        "message": f"{row['name']} ({row['asset_code']}) se compró el {row['purchase_date'].isoformat()}; "
+                   f"evaluar su renovación.",
+        "priority": AlertPriorityEnum.low,
+    }
+
+
+RULES: List[AlertRule] = [
+    AlertRule(
+        AlertTypeEnum.warranty_expiring,
+        window_sql="""
+            SELECT id AS equipment_id, asset_code, name, warranty_end_date AS due_date
+            FROM equipment
+            WHERE warranty_end_date > :start AND warranty_end_date <= :end AND status != 'retired'
+        """,
+        changed_sql="""
+            SELECT id AS equipment_id, asset_code, name, warranty_end_date AS due_date
+            FROM equipment
+            WHERE updated_at >= :since AND warranty_end_date BETWEEN :today AND :end AND status != 'retired'
+        """,
+        horizon=lambda today: today + timedelta(days=WARRANTY_ALERT_DAYS),
+        initial_start=lambda today: today - timedelta(days=1),
+        build=_warranty_alert,
+    ),
+    AlertRule(
+        AlertTypeEnum.maintenance_due,
+        window_sql="""
+            SELECT m.equipment_id, e.asset_code, e.name, m.description, m.scheduled_date AS due_date
+            FROM maintenance m
+            JOIN equipment e ON e.id = m.equipment_id
+            WHERE m.scheduled_date > :start AND m.scheduled_date <= :end AND m.status = 'scheduled'
+        """,
+        changed_sql="""
+            SELECT m.equipment_id, e.asset_code, e.name, m.description, m.scheduled_date AS due_date
+            FROM maintenance m
+            JOIN equipment e ON e.id = m.equipment_id
+            WHERE m.updated_at >= :since AND m.scheduled_date BETWEEN :today AND :end AND m.status = 'scheduled'
+        """,
+        horizon=lambda today: today + timedelta(days=MAINTENANCE_ALERT_DAYS),
+        initial_start=lambda today: today - timedelta(days=1),
+        build=_maintenance_alert,
+        # Mantenimientos completados, cancelados o reprogramados: la alerta de la fecha antigua sobra
+        resolve_sql="""
+            UPDATE alerts SET is_read = 1
+            WHERE alert_type = 'maintenance_due' AND is_read = 0
+            AND equipment_id IN (SELECT equipment_id FROM maintenance WHERE updated_at >= :since)
+            AND NOT EXISTS (
+                SELECT 1 FROM maintenance m
+                WHERE m.equipment_id = alerts.equipment_id
+                AND m.scheduled_date = alerts.due_date
+                AND m.status = 'scheduled'
+            )
+        """,
+    ),
+    AlertRule(
+        AlertTypeEnum.equipment_old,
+        window_sql="""
+            SELECT id AS equipment_id, asset_code, name, purchase_date
+            FROM equipment
+            WHERE purchase_date > :start AND purchase_date <= :end AND status != 'retired'
+        """,
+        changed_sql="""
+            SELECT id AS equipment_id, asset_code, name, purchase_date
+            FROM equipment
+            WHERE updated_at >= :since AND purchase_date <= :end AND status != 'retired'
+        """,
+        horizon=lambda today: _shift_years(today, -EQUIPMENT_OLD_YEARS),
+        initial_start=lambda today: date(1900, 1, 1),
+        build=_old_equipment_alert,
+    ),
+]
+
+
+def _due_date(rule: AlertRule, row: dict) -> date:
+    if rule.alert_type == AlertTypeEnum.equipment_old:
+        # Fecha en la que el equipo alcanzó la antigüedad
+        return _shift_years(row["purchase_date"], EQUIPMENT_OLD_YEARS)
+    return row["due_date"]
+
+
+def upsert_alerts(db: Session, rows: List[dict]):
+    """INSERT multi-fila; si la alerta ya existe se actualiza el texto y la prioridad (no is_read)"""
+    statement = mysql_insert(Alert).values(rows)
+    statement = statement.on_duplicate_key_update(
+        title=statement.inserted.title,
+        message=statement.inserted.message,
+        priority=statement.inserted.priority,
+    )
+    db.execute(statement)
+
+
+def _upsert_query(db: Session, rule: AlertRule, sql: str, params: dict, today: date) -> int:
+    result = db.execute(text(sql), params)
+    total = 0
+    while True:
+        batch = result.mappings().fetchmany(ALERT_BATCH_SIZE)
+        if not batch:
+            return total
+        rows = []
+        for row in batch:
+            row = dict(row)
+            due_date = _due_date(rule, row)
+            rows.append({
+                "equipment_id": row["equipment_id"],
+                "alert_type": rule.alert_type,
+                "due_date": due_date,
+                "is_read": False,
+                **rule.build({**row, "due_date": due_date}, today),
+            })
+        upsert_alerts(db, rows)
+        total += len(rows)
+
+
+def run_rule(db: Session, rule: AlertRule, today: date, now: datetime) -> int:
+    watermark = db.get(AlertWatermark, rule.alert_type.value)
+    if watermark is None:
+        watermark = AlertWatermark(alert_type=rule.alert_type.value)
+        db.add(watermark)
+
+    end = rule.horizon(today)
+    start = watermark.date_watermark or rule.initial_start(today)
+    last_alert_id = db.query(func.max(Alert.id)).scalar() or 0
+    count = 0
+    if end > start:
+        count += _upsert_query(db, rule, rule.window_sql, {"start": start, "end": end}, today)
+    if watermark.changed_watermark is not None:
+        since = watermark.changed_watermark - CHANGE_OVERLAP
+        count += _upsert_query(db, rule, rule.changed_sql, {"since": since, "today": today, "end": end}, today)
+        if rule.resolve_sql:
+            resolved = db.execute(text(rule.resolve_sql), {"since": since}).rowcount
+            if resolved:
+                publish(db, [outbox_row(OUTBOX_SOURCE, "alert", None, "alert.resolved", {
+                    "alert_type": rule.alert_type.value,
+                    "count": resolved,
+                })])
+            stats["alerts_resolved"] += resolved
+
+    # Las filas con id nuevo son alertas creadas en este ciclo (el resto ya existían)
+    created = db.query(Alert.id, Alert.equipment_id, Alert.priority, Alert.due_date)\
+        .filter(Alert.alert_type == rule.alert_type, Alert.id > last_alert_id)\
+        .all()
+    publish(db, [
+        outbox_row(OUTBOX_SOURCE, "alert", alert.id, "alert.created", {
+            "alert_type": rule.alert_type.value,
+            "equipment_id": alert.equipment_id,
+            "priority": alert.priority,
+            "due_date": alert.due_date,
+        })
+        for alert in created
+    ])
+
+    watermark.date_watermark = max(end, start)
+    watermark.changed_watermark = now
+    watermark.last_run_at = now
+    # Alertas, eventos y marca de agua en la misma transacción: un fallo repite la ventana entera
+    db.commit()
+    return count
+
+
+def publish_overdue(db: Session, today: date, now: datetime) -> int:
+    """Publicar `maintenance.overdue` para lo programado antes de hoy que sigue sin hacerse.
+
+    Ningún UPDATE marca un mantenimiento como vencido (basta con que pase la
+    fecha), así que el evento sale de aquí: cada día programado se revisa una vez.
+    """
+    watermark = db.get(AlertWatermark, OVERDUE_WATERMARK)
+    if watermark is None:
+        # Primera ejecución: solo lo vencido ayer, no todo el histórico
+        watermark = AlertWatermark(alert_type=OVERDUE_WATERMARK, date_watermark=today - timedelta(days=1))
+        db.add(watermark)
+    if watermark.date_watermark >= today:
+        return 0
+
+    rows = db.execute(text("""
+        SELECT id, equipment_id, scheduled_date
+        FROM maintenance
+        WHERE scheduled_date >= :start AND scheduled_date < :today AND status = 'scheduled'
+    """), {"start": watermark.date_watermark, "today": today}).fetchall()
+    publish(db, [
+        outbox_row(OUTBOX_SOURCE, "maintenance", row.id, "maintenance.overdue", {
+            "equipment_id": row.equipment_id,
+            "scheduled_date": row.scheduled_date,
+        })
+        for row in rows
+    ])
+    watermark.date_watermark = today
+    watermark.last_run_at = now
+    db.commit()
+    return len(rows)
+
+
+def run_cycle(db: Session) -> Dict[str, int]:
+    today = date.today()
+    # Antes de leer: lo que se modifique durante el ciclo entra en el siguiente
+    now = datetime.utcnow()
+    counts = {}
+    for rule in RULES:
+        counts[rule.alert_type.value] = run_rule(db, rule, today, now)
+    stats["overdue_published"] += publish_overdue(db, today, now)
+    stats["cycles"] += 1
+    stats["alerts_upserted"] += sum(counts.values())
+    stats["last_run_at"] = now.isoformat()
+    return counts
+
+
+def run_cycle_if_leader(engine, session_factory) -> Optional[Dict[str, int]]:
+    """Ejecutar un ciclo si esta instancia obtiene el bloqueo; None si lo tiene otra"""
+    with engine.connect() as lock_conn:
+        if not lock_conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": LOCK_NAME}).scalar():
+            stats["not_leader"] += 1
+            return None
+        try:
+            db = session_factory()
+            try:
+                return run_cycle(db)
+            finally:
+                db.close()
+        finally:
+            lock_conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
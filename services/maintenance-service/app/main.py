@@ -1,36 +1,55 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, status, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract, and_
+from sqlalchemy import func, extract, and_, select, union_all
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import date, datetime, timedelta
 from decimal import Decimal
-import time
-from .database import get_db, engine, Base
-from .models import Maintenance, MaintenanceType, MaintenancePart, MaintenanceTypeEnum, MaintenanceStatusEnum
+import asyncio
+from .database import get_db, engine, Base, SessionLocal, DB_POOL_SIZE
+from .models import (
+    Maintenance, MaintenanceType, MaintenancePart, MaintenanceArchive, MaintenancePartArchive,
+    MaintenanceTypeEnum, MaintenanceStatusEnum, Alert, AlertTypeEnum
+)
+from .alerts import ALERT_ENGINE_INTERVAL, OUTBOX_SOURCE, run_cycle_if_leader, stats as alert_engine_stats
+from .serialization import FastJSONResponse, Projection, projection_for
+from .audit import audit_writer, install as install_audit
+from .outbox import Aggregate, outbox_row, publish, register_outbox
+from .startup import readiness, warm_up
 
 app = FastAPI(title="Maintenance Service", version="1.0.0")
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database with retry logic"""
-    max_retries = 30
-    retry_interval = 2
-
-    for attempt in range(max_retries):
+    """Esperar a la BD y calentar pool y consultas en segundo plano (/health da 503 hasta terminar)"""
+    app.state.warmup_task = asyncio.create_task(
+        warm_up(engine, SessionLocal, DB_POOL_SIZE, metadata=Base.metadata, warm_queries=warm_queries)
+    )
+    if ALERT_ENGINE_INTERVAL > 0:
+        app.state.alert_task = asyncio.create_task(run_alert_engine())
+
+async def run_alert_engine():
+    """Generar alertas cada ALERT_ENGINE_INTERVAL segundos (solo la instancia con el bloqueo)"""
+    while not readiness.ready:
+        await asyncio.sleep(1)
+    while True:
         try:
-            Base.metadata.create_all(bind=engine)
-            print(f"✅ Database connection established on attempt {attempt + 1}")
-            break
+            counts = await run_in_threadpool(run_cycle_if_leader, engine, SessionLocal)
+            if counts and any(counts.values()):
+                print(f"✅ Alert engine: {counts}")
+            alert_engine_stats["last_error"] = None
         except Exception as e:
-            if attempt < max_retries - 1:
-                print(f"⚠️ Database connection attempt {attempt + 1} failed: {e}")
-                print(f"Retrying in {retry_interval} seconds...")
-                time.sleep(retry_interval)
-            else:
-                print(f"❌ Failed to connect to database after {max_retries} attempts")
-                raise
+            alert_engine_stats["last_error"] = str(e)
+            print(f"⚠️ Alert engine cycle failed: {e}")
+        await asyncio.sleep(ALERT_ENGINE_INTERVAL)
+
+@app.on_event("shutdown")
+def shutdown_event():
+    if getattr(app.state, "alert_task", None):
+        app.state.alert_task.cancel()
 
 app.add_middleware(
     CORSMiddleware,
@@ -40,6 +59,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Auditoría de cambios en audit_logs (cola en memoria + escritor por lotes)
+install_audit(app, SessionLocal, engine)
+
+# Eventos de cambio en outbox_events, en la misma transacción que cada cambio
+register_outbox(SessionLocal, OUTBOX_SOURCE, {"maintenance": Aggregate("maintenance"), "alerts": Aggregate("alert")})
+
 # ============================================
 # SCHEMAS
 # ============================================
@@ -120,6 +145,84 @@ class MaintenanceResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class AlertResponse(BaseModel):
+    id: int
+    equipment_id: Optional[int]
+    alert_type: str
+    title: str
+    message: str
+    priority: str
+    is_read: bool
+    due_date: Optional[date]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+def maintenance_projection(model, part_model) -> Projection:
+    """Listado rápido: filas construidas desde tuplas de columnas (mismo formato que MaintenanceResponse)"""
+    return Projection(
+        model,
+        columns={
+            "id": model.id,
+            "equipment_id": model.equipment_id,
+            "type": model.type,
+            "scheduled_date": model.scheduled_date,
+            "performed_date": model.performed_date,
+            "technician": model.technician,
+            "provider_id": model.provider_id,
+            "description": model.description,
+            "diagnosis": model.diagnosis,
+            "solution": model.solution,
+            "cost": model.cost,
+            "status": model.status,
+            "next_maintenance_date": model.next_maintenance_date,
+            "created_at": model.created_at,
+        },
+        one={
+            "maintenance_type": (MaintenanceType, model.maintenance_type_id == MaintenanceType.id, {
+                "id": MaintenanceType.id,
+                "name": MaintenanceType.name,
+                "description": MaintenanceType.description,
+            }),
+        },
+        many={
+            "parts": (part_model.maintenance_id, {
+                "id": part_model.id,
+                "part_name": part_model.part_name,
+                "quantity": part_model.quantity,
+                "unit_cost": part_model.unit_cost,
+                "total_cost": part_model.total_cost,
+            }),
+        }
+    )
+
+MAINTENANCE_PROJECTION = maintenance_projection(Maintenance, MaintenancePart)
+# Registros archivados por el ciclo de vida (reports-service); solo con include_archive=true
+MAINTENANCE_ARCHIVE_PROJECTION = maintenance_projection(MaintenanceArchive, MaintenancePartArchive)
+
+# ============================================
+# ARRANQUE
+# ============================================
+
+def warm_queries(db: Session):
+    """Consultas calientes: ejecutarlas una vez al arrancar deja su SQL compilado"""
+    today = datetime.now().date()
+    db.query(MaintenanceType).all()
+    MAINTENANCE_PROJECTION.query(db).offset(0).limit(1).all()
+    for item in db.query(Maintenance).offset(0).limit(1).all():
+        item.maintenance_type, item.parts
+    db.query(Maintenance).filter(Maintenance.id == 0).first()
+    db.query(Maintenance).filter(
+        Maintenance.status == MaintenanceStatusEnum.scheduled,
+        Maintenance.scheduled_date >= today,
+        Maintenance.scheduled_date <= today
+    ).order_by(Maintenance.scheduled_date.asc()).all()
+    db.query(Maintenance).filter(
+        Maintenance.status == MaintenanceStatusEnum.scheduled,
+        Maintenance.scheduled_date < today
+    ).order_by(Maintenance.scheduled_date.asc()).all()
+
 # ============================================
 # ENDPOINTS - MAINTENANCE TYPES
 # ============================================
@@ -130,7 +233,13 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    if not readiness.ready:
+        return JSONResponse(status_code=503, content={"status": "starting", **readiness.snapshot()})
+    return {
+        "status": "healthy",
+        "warmup_seconds": readiness.warmup_seconds,
+        "audit": {**audit_writer.stats, "pending": audit_writer.pending}
+    }
 
 @app.post("/types", response_model=MaintenanceTypeResponse)
 def create_maintenance_type(
@@ -185,24 +294,64 @@ def get_maintenance_records(
     status: Optional[MaintenanceStatusEnum] = None,
     from_date: Optional[date] = None,
     to_date: Optional[date] = None,
+    fast: bool = Query(False, description="Serializar desde tuplas de columnas con orjson"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas (p. ej. equipment_id,status,scheduled_date)"),
+    include_archive: bool = Query(False, description="Incluir los mantenimientos archivados"),
     db: Session = Depends(get_db)
 ):
-    query = db.query(Maintenance)
+    filters = dict(equipment_id=equipment_id, type=type, status=status, from_date=from_date, to_date=to_date)
+    projection = projection_for(MAINTENANCE_PROJECTION, fields)
+    fast = fast or projection is not MAINTENANCE_PROJECTION
+
+    if not include_archive:
+        query = _maintenance_query(db, Maintenance, projection, fast, **filters).offset(skip).limit(limit)
+        if fast:
+            return FastJSONResponse(projection.fetch(query))
+        return query.all()
+
+    # Cada tabla aporta sus primeras skip + limit filas; se mezclan y se corta la página
+    requested = [f.strip() for f in (fields or "").split(",") if f.strip()]
+    sort_key_hidden = bool(requested) and "scheduled_date" not in requested
+    if sort_key_hidden:
+        # La mezcla ordena por scheduled_date: se selecciona aunque no se haya pedido y se quita al final
+        fields = ",".join(requested + ["scheduled_date"])
+    live_projection = projection_for(MAINTENANCE_PROJECTION, fields)
+    archive_projection = projection_for(MAINTENANCE_ARCHIVE_PROJECTION, fields)
+    live = _maintenance_query(db, Maintenance, live_projection, fast, **filters).limit(skip + limit)
+    archived = _maintenance_query(db, MaintenanceArchive, archive_projection, fast, **filters).limit(skip + limit)
+    if fast:
+        rows = live_projection.fetch(live) + archive_projection.fetch(archived)
+        rows.sort(key=lambda row: row["scheduled_date"] or date.min, reverse=True)
+        rows = rows[skip:skip + limit]
+        if sort_key_hidden:
+            for row in rows:
+                del row["scheduled_date"]
+        return FastJSONResponse(rows)
+    records = live.all() + archived.all()
+    records.sort(key=lambda record: record.scheduled_date or date.min, reverse=True)
+    return records[skip:skip + limit]
+
+def _maintenance_query(db: Session, model, projection: Projection, fast: bool,
+                       equipment_id=None, type=None, status=None, from_date=None, to_date=None):
+    query = projection.query(db) if fast else db.query(model)
 
     if equipment_id:
-        query = query.filter(Maintenance.equipment_id == equipment_id)
+        query = query.filter(model.equipment_id == equipment_id)
     if type:
-        query = query.filter(Maintenance.type == type)
+        query = query.filter(model.type == type)
     if status:
-        query = query.filter(Maintenance.status == status)
+        query = query.filter(model.status == status)
     if from_date:
-        query = query.filter(Maintenance.performed_date >= from_date)
+        query = query.filter(model.performed_date >= from_date)
+        if model is MaintenanceArchive:
+            # Mismo rango sobre la clave de partición: MySQL descarta los años fuera de él
+            query = query.filter(MaintenanceArchive.archive_date >= from_date)
     if to_date:
-        query = query.filter(Maintenance.performed_date <= to_date)
+        query = query.filter(model.performed_date <= to_date)
+        if model is MaintenanceArchive:
+            query = query.filter(MaintenanceArchive.archive_date <= to_date)
 
-    maintenance_list = query.order_by(Maintenance.scheduled_date.desc())\
-        .offset(skip).limit(limit).all()
-    return maintenance_list
+    return query.order_by(model.scheduled_date.desc())
 
 @app.get("/maintenance/{maintenance_id}", response_model=MaintenanceResponse)
 def get_maintenance(maintenance_id: int, db: Session = Depends(get_db)):
@@ -240,12 +389,22 @@ def delete_maintenance(maintenance_id: int, db: Session = Depends(get_db)):
     return {"message": "Maintenance record deleted successfully"}
 
 @app.get("/equipment/{equipment_id}/maintenance-history", response_model=List[MaintenanceResponse])
-def get_equipment_maintenance_history(equipment_id: int, db: Session = Depends(get_db)):
+def get_equipment_maintenance_history(
+    equipment_id: int,
+    include_archive: bool = Query(False, description="Incluir los mantenimientos archivados"),
+    db: Session = Depends(get_db)
+):
     """Obtener historial completo de mantenimiento de un equipo"""
     history = db.query(Maintenance)\
         .filter(Maintenance.equipment_id == equipment_id)\
         .order_by(Maintenance.performed_date.desc())\
         .all()
+    if include_archive:
+        # Lo archivado (anterior a la retención) va al final
+        history += db.query(MaintenanceArchive)\
+            .filter(MaintenanceArchive.equipment_id == equipment_id)\
+            .order_by(MaintenanceArchive.performed_date.desc())\
+            .all()
     return history
 
 @app.get("/equipment/{equipment_id}/next-maintenance")
@@ -301,14 +460,31 @@ def get_overdue_maintenance(db: Session = Depends(get_db)):
 # ESTADÍSTICAS
 # ============================================
 
+ARCHIVE_QUERY = Query(False, description="Incluir los mantenimientos archivados (por defecto solo la tabla viva)")
+
+def _stats_source(include_archive: bool):
+    """Tabla viva o, con include_archive, su UNION ALL con el archivo (solo las columnas de las estadísticas)"""
+    if not include_archive:
+        return Maintenance.__table__
+    columns = ("id", "equipment_id", "type", "status", "cost", "performed_date")
+    return union_all(
+        select(*(getattr(Maintenance, column) for column in columns)),
+        select(*(getattr(MaintenanceArchive, column) for column in columns)),
+    ).subquery("maintenance_all")
+
 @app.get("/stats/by-type")
-def get_stats_by_type(db: Session = Depends(get_db)):
-    """Estadísticas de mantenimiento por tipo"""
+def get_stats_by_type(include_archive: bool = ARCHIVE_QUERY, db: Session = Depends(get_db)):
+    """Estadísticas de mantenimiento por tipo.
+
+    Sin include_archive cuenta solo la tabla viva: los mantenimientos cerrados
+    más antiguos que la retención (reports-service, /lifecycle) no aparecen.
+    """
+    m = _stats_source(include_archive).c
     stats = db.query(
-        Maintenance.type,
-        func.count(Maintenance.id).label('count'),
-        func.sum(Maintenance.cost).label('total_cost')
-    ).group_by(Maintenance.type).all()
+        m.type,
+        func.count(m.id).label('count'),
+        func.sum(m.cost).label('total_cost')
+    ).group_by(m.type).all()
 
     return [{
         "type": stat.type,
@@ -317,29 +493,34 @@ def get_stats_by_type(db: Session = Depends(get_db)):
     } for stat in stats]
 
 @app.get("/stats/by-status")
-def get_stats_by_status(db: Session = Depends(get_db)):
-    """Estadísticas de mantenimiento por estado"""
+def get_stats_by_status(include_archive: bool = ARCHIVE_QUERY, db: Session = Depends(get_db)):
+    """Estadísticas de mantenimiento por estado (sin include_archive, solo la tabla viva)"""
+    m = _stats_source(include_archive).c
     stats = db.query(
-        Maintenance.status,
-        func.count(Maintenance.id).label('count')
-    ).group_by(Maintenance.status).all()
+        m.status,
+        func.count(m.id).label('count')
+    ).group_by(m.status).all()
 
     return [{"status": stat.status, "count": stat.count} for stat in stats]
 
 @app.get("/stats/costs-by-month")
-def get_costs_by_month(year: Optional[int] = None, db: Session = Depends(get_db)):
-    """Costos de mantenimiento por mes"""
+def get_costs_by_month(year: Optional[int] = None, include_archive: bool = ARCHIVE_QUERY, db: Session = Depends(get_db)):
+    """Costos de mantenimiento por mes.
+
+    Sin include_archive, los años anteriores a la retención salen incompletos o vacíos.
+    """
     if not year:
         year = datetime.now().year
 
+    m = _stats_source(include_archive).c
     stats = db.query(
-        extract('month', Maintenance.performed_date).label('month'),
-        func.sum(Maintenance.cost).label('total_cost'),
-        func.count(Maintenance.id).label('count')
+        extract('month', m.performed_date).label('month'),
+        func.sum(m.cost).label('total_cost'),
+        func.count(m.id).label('count')
     ).filter(
-        extract('year', Maintenance.performed_date) == year,
-        Maintenance.status == MaintenanceStatusEnum.completed
-    ).group_by(extract('month', Maintenance.performed_date))\
+        extract('year', m.performed_date) == year,
+        m.status == MaintenanceStatusEnum.completed
+    ).group_by(extract('month', m.performed_date))\
      .order_by('month').all()
 
     months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
@@ -352,14 +533,15 @@ def get_costs_by_month(year: Optional[int] = None, db: Session = Depends(get_db)
     } for stat in stats]
 
 @app.get("/stats/equipment-maintenance-frequency")
-def get_equipment_maintenance_frequency(limit: int = 10, db: Session = Depends(get_db)):
-    """Equipos con más mantenimientos"""
+def get_equipment_maintenance_frequency(limit: int = 10, include_archive: bool = ARCHIVE_QUERY, db: Session = Depends(get_db)):
+    """Equipos con más mantenimientos (sin include_archive, solo la tabla viva)"""
+    m = _stats_source(include_archive).c
     stats = db.query(
-        Maintenance.equipment_id,
-        func.count(Maintenance.id).label('maintenance_count'),
-        func.sum(Maintenance.cost).label('total_cost')
-    ).group_by(Maintenance.equipment_id)\
-     .order_by(func.count(Maintenance.id).desc())\
+        m.equipment_id,
+        func.count(m.id).label('maintenance_count'),
+        func.sum(m.cost).label('total_cost')
+    ).group_by(m.equipment_id)\
+     .order_by(func.count(m.id).desc())\
      .limit(limit).all()
 
     return [{
@@ -368,6 +550,68 @@ def get_equipment_maintenance_frequency(limit: int = 10, db: Session = Depends(g
         "total_cost": float(stat.total_cost) if stat.total_cost else 0
     } for stat in stats]
 
+# ============================================
+# ALERTAS
+# ============================================
+
+@app.get("/alerts", response_model=List[AlertResponse])
+def get_alerts(
+    unread_only: bool = False,
+    alert_type: Optional[AlertTypeEnum] = None,
+    equipment_id: Optional[int] = None,
+    before_id: Optional[int] = Query(None, description="Paginación: alertas con id menor que este"),
+    limit: int = Query(50, le=500),
+    db: Session = Depends(get_db)
+):
+    """Alertas más recientes primero, paginadas por id (índice is_read, alert_type, id)"""
+    query = db.query(Alert)
+    if unread_only:
+        query = query.filter(Alert.is_read.is_(False))
+    if alert_type:
+        query = query.filter(Alert.alert_type == alert_type)
+    if equipment_id:
+        query = query.filter(Alert.equipment_id == equipment_id)
+    if before_id:
+        query = query.filter(Alert.id < before_id)
+    return query.order_by(Alert.id.desc()).limit(limit).all()
+
+@app.get("/alerts/unread-count")
+def get_unread_alert_count(db: Session = Depends(get_db)):
+    counts = db.query(Alert.alert_type, func.count(Alert.id))\
+        .filter(Alert.is_read.is_(False))\
+        .group_by(Alert.alert_type)\
+        .all()
+    by_type = {alert_type.value: count for alert_type, count in counts}
+    return {"total": sum(by_type.values()), "by_type": by_type}
+
+@app.get("/alerts/engine")
+def get_alert_engine_status():
+    return {"interval_seconds": ALERT_ENGINE_INTERVAL, **alert_engine_stats}
+
+@app.post("/alerts/read-all")
+def mark_all_alerts_read(alert_type: Optional[AlertTypeEnum] = None, db: Session = Depends(get_db)):
+    query = db.query(Alert).filter(Alert.is_read.is_(False))
+    if alert_type:
+        query = query.filter(Alert.alert_type == alert_type)
+    updated = query.update({Alert.is_read: True}, synchronize_session=False)
+    if updated:
+        publish(db, [outbox_row(OUTBOX_SOURCE, "alert", None, "alert.read_all", {
+            "alert_type": alert_type.value if alert_type else None,
+            "count": updated,
+        })])
+    db.commit()
+    return {"updated": updated}
+
+@app.post("/alerts/{alert_id}/read", response_model=AlertResponse)
+def mark_alert_read(alert_id: int, db: Session = Depends(get_db)):
+    alert = db.query(Alert).filter(Alert.id == alert_id).first()
+    if not alert:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    alert.is_read = True
+    db.commit()
+    db.refresh(alert)
+    return alert
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8004)
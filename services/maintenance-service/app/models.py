@@ -1,9 +1,21 @@
-from sqlalchemy import Column, Integer, String, Date, Numeric, Text, ForeignKey, DateTime, Enum, JSON
+from sqlalchemy import Column, Integer, String, Date, Numeric, Text, ForeignKey, DateTime, Enum, JSON, Boolean, Index, UniqueConstraint, MetaData
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
 import enum
 
+class AlertTypeEnum(str, enum.Enum):
+    maintenance_due = "maintenance_due"
+    warranty_expiring = "warranty_expiring"
+    equipment_old = "equipment_old"
+    custom = "custom"
+
+class AlertPriorityEnum(str, enum.Enum):
+    low = "low"
+    medium = "medium"
+    high = "high"
+    critical = "critical"
+
 class MaintenanceTypeEnum(str, enum.Enum):
     preventive = "preventive"
     corrective = "corrective"
@@ -58,3 +70,87 @@ class MaintenancePart(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     maintenance = relationship("Maintenance", backref="parts")
+
+# Tablas de archivo (init.sql / migración 005): particionadas por año y comprimidas.
+# Fuera de Base.metadata para que create_all no las cree sin particiones en una BD sin la migración
+ARCHIVE_METADATA = MetaData()
+
+class MaintenanceArchive(Base):
+    """Mantenimiento cerrado archivado por el ciclo de vida (reports-service); solo lectura"""
+    __tablename__ = "maintenance_archive"
+    metadata = ARCHIVE_METADATA
+
+    id = Column(Integer, primary_key=True)
+    equipment_id = Column(Integer, nullable=False, index=True)
+    maintenance_type_id = Column(Integer)
+    type = Column(Enum(MaintenanceTypeEnum), nullable=False)
+    scheduled_date = Column(Date, index=True)
+    performed_date = Column(Date, index=True)
+    technician = Column(String(100))
+    provider_id = Column(Integer)
+    description = Column(Text, nullable=False)
+    diagnosis = Column(Text)
+    solution = Column(Text)
+    cost = Column(Numeric(10, 2))
+    status = Column(Enum(MaintenanceStatusEnum))
+    next_maintenance_date = Column(Date)
+    attachments = Column(JSON)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    created_by = Column(Integer)
+    # Clave de partición (año): performed_date, o scheduled_date/created_at si se canceló
+    archive_date = Column(Date, primary_key=True)
+    archived_at = Column(DateTime)
+
+    maintenance_type = relationship(
+        "MaintenanceType",
+        primaryjoin="foreign(MaintenanceArchive.maintenance_type_id) == MaintenanceType.id",
+        viewonly=True
+    )
+    parts = relationship(
+        "MaintenancePartArchive",
+        primaryjoin="MaintenanceArchive.id == foreign(MaintenancePartArchive.maintenance_id)",
+        viewonly=True
+    )
+
+class MaintenancePartArchive(Base):
+    __tablename__ = "maintenance_parts_archive"
+    metadata = ARCHIVE_METADATA
+
+    id = Column(Integer, primary_key=True)
+    maintenance_id = Column(Integer, nullable=False, index=True)
+    part_name = Column(String(200), nullable=False)
+    quantity = Column(Integer)
+    unit_cost = Column(Numeric(10, 2))
+    total_cost = Column(Numeric(10, 2))
+    created_at = Column(DateTime)
+    archive_date = Column(Date, primary_key=True)
+
+class Alert(Base):
+    __tablename__ = "alerts"
+    __table_args__ = (
+        # Una alerta por equipo, tipo y fecha: el motor puede repetir ventanas sin duplicar
+        UniqueConstraint("alert_type", "equipment_id", "due_date", name="uq_alert"),
+        # Listado de no leídas (más recientes primero) y recuento por tipo
+        Index("idx_unread", "is_read", "alert_type", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    equipment_id = Column(Integer, index=True)
+    alert_type = Column(Enum(AlertTypeEnum), nullable=False)
+    title = Column(String(200), nullable=False)
+    message = Column(Text, nullable=False)
+    priority = Column(Enum(AlertPriorityEnum), default=AlertPriorityEnum.medium)
+    is_read = Column(Boolean, default=False, nullable=False)
+    assigned_to = Column(Integer)
+    due_date = Column(Date)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class AlertWatermark(Base):
+    """Hasta dónde ha revisado el motor de alertas cada regla"""
+    __tablename__ = "alert_watermarks"
+
+    alert_type = Column(String(50), primary_key=True)
+    date_watermark = Column(Date)
+    changed_watermark = Column(DateTime)
+    last_run_at = Column(DateTime)
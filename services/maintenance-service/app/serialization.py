@@ -0,0 +1,141 @@
+import enum
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from sqlalchemy.orm import Query, Session
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+
+def _default(value):
+    # Mismo formato que Pydantic en modo JSON: Decimal como string, fechas en ISO 8601
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """Respuesta JSON codificada con orjson (o json estándar si no está instalado)"""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class Projection:
+    """Serialización de listados directamente desde tuplas de columnas.
+
+    Evita cargar objetos ORM y validarlos uno a uno con Pydantic: se seleccionan
+    solo las columnas necesarias y cada fila se convierte en dict con zip.
+
+    - `columns`: campos planos del modelo principal {nombre: columna}
+    - `one`: relaciones a-uno resueltas con outer join
+      {nombre: (modelo, condición de join, {nombre: columna})}; la primera
+      columna es la PK y, si es NULL, la relación se serializa como null
+    - `many`: relaciones a-muchos resueltas con una segunda consulta IN
+      {nombre: (columna FK, {nombre: columna})}
+    """
+
+    def __init__(self, model, columns: Dict, one: Optional[Dict] = None, many: Optional[Dict] = None):
+        self.model = model
+        self.columns = columns
+        self.one = one or {}
+        self.many = many or {}
+        self.hidden = set()
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self.columns) + list(self.one) + list(self.many)
+
+    def only(self, fields: List[str]) -> "Projection":
+        """Proyección reducida a `fields` (sparse fieldset): solo esas columnas y joins"""
+        unknown = [f for f in fields if f not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(self.fields)}")
+
+        columns = {k: v for k, v in self.columns.items() if k in fields}
+        many = {k: v for k, v in self.many.items() if k in fields}
+        projection = Projection(
+            self.model,
+            columns,
+            one={k: v for k, v in self.one.items() if k in fields},
+            many=many,
+        )
+        if many and "id" not in columns:
+            # La PK hace falta para resolver las relaciones a-muchos, pero no se devuelve
+            projection.columns = {"id": self.columns["id"], **columns}
+            projection.hidden = {"id"}
+        return projection
+
+    def query(self, db: Session) -> Query:
+        selected = list(self.columns.values())
+        for _, _, columns in self.one.values():
+            selected += list(columns.values())
+
+        query = db.query(*selected).select_from(self.model)
+        for target, onclause, _ in self.one.values():
+            query = query.outerjoin(target, onclause)
+        return query
+
+    def fetch(self, query: Query) -> List[dict]:
+        flat_keys = list(self.columns)
+        width = len(flat_keys)
+        nested: List[Tuple[str, List[str], int]] = []
+        offset = width
+        for name, (_, _, columns) in self.one.items():
+            nested.append((name, list(columns), offset))
+            offset += len(columns)
+
+        rows = []
+        for row in query.all():
+            item = dict(zip(flat_keys, row[:width]))
+            for name, keys, start in nested:
+                values = row[start:start + len(keys)]
+                item[name] = dict(zip(keys, values)) if values[0] is not None else None
+            rows.append(item)
+
+        if self.many and rows:
+            self._attach_many(query.session, rows)
+        for key in self.hidden:
+            for row in rows:
+                del row[key]
+        return rows
+
+    def _attach_many(self, db: Session, rows: List[dict]):
+        ids = [row["id"] for row in rows]
+        for name, (foreign_key, columns) in self.many.items():
+            keys = list(columns)
+            grouped: Dict[int, List[dict]] = {}
+            for child in db.query(foreign_key, *columns.values()).filter(foreign_key.in_(ids)).all():
+                grouped.setdefault(child[0], []).append(dict(zip(keys, child[1:])))
+            for row in rows:
+                row[name] = grouped.get(row["id"], [])
+
+
+def projection_for(projection: Projection, fields: Optional[str]) -> Projection:
+    """Proyección completa o reducida según `fields=a,b,c`; 400 si hay campos desconocidos"""
+    requested = [f.strip() for f in (fields or "").split(",") if f.strip()]
+    if not requested:
+        return projection
+    try:
+        return projection.only(requested)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,36 +1,28 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, status, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func, or_
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
 from datetime import date, datetime
 from decimal import Decimal
-import time
-from .database import get_db, engine, Base
+import asyncio
+from .database import get_db, engine, Base, SessionLocal, DB_POOL_SIZE
 from .models import Provider, Contract, ContractStatus
+from .serialization import FastJSONResponse, Projection, projection_for
+from .audit import audit_writer, install as install_audit
+from .outbox import Aggregate, register_outbox
+from .startup import readiness, warm_up
 
 app = FastAPI(title="Provider Service", version="1.0.0")
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database with retry logic"""
-    max_retries = 30
-    retry_interval = 2
-
-    for attempt in range(max_retries):
-        try:
-            Base.metadata.create_all(bind=engine)
-            print(f"✅ Database connection established on attempt {attempt + 1}")
-            break
-        except Exception as e:
-            if attempt < max_retries - 1:
-                print(f"⚠️ Database connection attempt {attempt + 1} failed: {e}")
-                print(f"Retrying in {retry_interval} seconds...")
-                time.sleep(retry_interval)
-            else:
-                print(f"❌ Failed to connect to database after {max_retries} attempts")
-                raise
+    """Esperar a la BD y calentar pool y consultas en segundo plano (/health da 503 hasta terminar)"""
+    app.state.warmup_task = asyncio.create_task(
+        warm_up(engine, SessionLocal, DB_POOL_SIZE, metadata=Base.metadata, warm_queries=warm_queries)
+    )
 
 app.add_middleware(
     CORSMiddleware,
@@ -40,6 +32,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Auditoría de cambios en audit_logs (cola en memoria + escritor por lotes)
+install_audit(app, SessionLocal, engine)
+
+# Eventos de cambio en outbox_events, en la misma transacción que cada cambio
+register_outbox(SessionLocal, "provider-service", {"contracts": Aggregate("contract")})
+
 # ============================================
 # SCHEMAS
 # ============================================
@@ -113,6 +111,55 @@ class ContractResponse(BaseModel):
 class ProviderWithContracts(ProviderResponse):
     contracts: List[ContractResponse] = []
 
+class BatchLookup(BaseModel):
+    ids: List[int] = Field(..., max_length=1000)
+
+# Listados rápidos: filas construidas desde tuplas de columnas
+PROVIDER_PROJECTION = Projection(
+    Provider,
+    columns={
+        "id": Provider.id,
+        "name": Provider.name,
+        "ruc": Provider.ruc,
+        "contact_person": Provider.contact_person,
+        "phone": Provider.phone,
+        "email": Provider.email,
+        "address": Provider.address,
+        "website": Provider.website,
+        "is_active": Provider.is_active,
+        "created_at": Provider.created_at,
+    }
+)
+
+CONTRACT_PROJECTION = Projection(
+    Contract,
+    columns={
+        "id": Contract.id,
+        "provider_id": Contract.provider_id,
+        "contract_number": Contract.contract_number,
+        "description": Contract.description,
+        "start_date": Contract.start_date,
+        "end_date": Contract.end_date,
+        "amount": Contract.amount,
+        "status": Contract.status,
+        "attachment_url": Contract.attachment_url,
+        "created_at": Contract.created_at,
+    }
+)
+
+# ============================================
+# ARRANQUE
+# ============================================
+
+def warm_queries(db: Session):
+    """Consultas calientes: ejecutarlas una vez al arrancar deja su SQL compilado"""
+    PROVIDER_PROJECTION.query(db).offset(0).limit(1).all()
+    CONTRACT_PROJECTION.query(db).offset(0).limit(1).all()
+    db.query(Provider).offset(0).limit(1).all()
+    db.query(Contract).offset(0).limit(1).all()
+    db.query(Provider).filter(Provider.id == 0).first()
+    db.query(Provider).filter(Provider.id.in_([0])).all()
+
 # ============================================
 # ENDPOINTS - PROVIDERS
 # ============================================
@@ -123,7 +170,13 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    if not readiness.ready:
+        return JSONResponse(status_code=503, content={"status": "starting", **readiness.snapshot()})
+    return {
+        "status": "healthy",
+        "warmup_seconds": readiness.warmup_seconds,
+        "audit": {**audit_writer.stats, "pending": audit_writer.pending}
+    }
 
 @app.post("/providers", response_model=ProviderResponse, status_code=status.HTTP_201_CREATED)
 def create_provider(provider: ProviderCreate, db: Session = Depends(get_db)):
@@ -145,9 +198,13 @@ def get_providers(
     limit: int = 100,
     is_active: Optional[bool] = None,
     search: Optional[str] = None,
+    fast: bool = Query(False, description="Serializar desde tuplas de columnas con orjson"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas (p. ej. id,name,email)"),
     db: Session = Depends(get_db)
 ):
-    query = db.query(Provider)
+    projection = projection_for(PROVIDER_PROJECTION, fields)
+    fast = fast or projection is not PROVIDER_PROJECTION
+    query = projection.query(db) if fast else db.query(Provider)
 
     if is_active is not None:
         query = query.filter(Provider.is_active == is_active)
@@ -161,7 +218,21 @@ def get_providers(
             )
         )
 
-    providers = query.offset(skip).limit(limit).all()
+    query = query.offset(skip).limit(limit)
+    if fast:
+        return FastJSONResponse(projection.fetch(query))
+
+    providers = query.all()
+    return providers
+
+@app.post("/providers/batch", response_model=List[ProviderResponse])
+def get_providers_batch(lookup: BatchLookup, db: Session = Depends(get_db)):
+    """Obtener varios proveedores por ID en una sola consulta"""
+    ids = list(dict.fromkeys(lookup.ids))
+    if not ids:
+        return []
+
+    providers = db.query(Provider).filter(Provider.id.in_(ids)).all()
     return providers
 
 @app.get("/providers/{provider_id}", response_model=ProviderWithContracts)
@@ -241,16 +312,24 @@ def get_contracts(
     limit: int = 100,
     provider_id: Optional[int] = None,
     status: Optional[ContractStatus] = None,
+    fast: bool = Query(False, description="Serializar desde tuplas de columnas con orjson"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas (p. ej. contract_number,end_date,status)"),
     db: Session = Depends(get_db)
 ):
-    query = db.query(Contract)
+    projection = projection_for(CONTRACT_PROJECTION, fields)
+    fast = fast or projection is not CONTRACT_PROJECTION
+    query = projection.query(db) if fast else db.query(Contract)
 
     if provider_id:
         query = query.filter(Contract.provider_id == provider_id)
     if status:
         query = query.filter(Contract.status == status)
 
-    contracts = query.offset(skip).limit(limit).all()
+    query = query.offset(skip).limit(limit)
+    if fast:
+        return FastJSONResponse(projection.fetch(query))
+
+    contracts = query.all()
     return contracts
 
 @app.get("/contracts/{contract_id}", response_model=ContractResponse)
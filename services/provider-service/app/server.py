@@ -0,0 +1,172 @@
+"""Lanzador de producción: varios procesos worker con gunicorn + UvicornWorker.
+
+    python -m app.server --port 8002             # producción (WEB_CONCURRENCY workers)
+    python -m app.server --port 8002 --reload    # desarrollo: un proceso que se recarga
+
+La app se importa una vez en el proceso maestro (preload) y se hace fork de los
+workers. Cada worker recibe su parte del presupuesto de conexiones a MySQL del
+servicio (DB_MAX_CONNECTIONS), salvo que DB_POOL_SIZE se fije a mano. Sin
+gunicorn (p. ej. en Windows) se usa el modo multiproceso de uvicorn.
+"""
+import argparse
+import importlib.util
+import os
+
+APP = "app.main:app"
+
+
+def available_cpus() -> int:
+    """Núcleos utilizables por el contenedor (afinidad y cuota de CPU de cgroups v2)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+# Workers: uno por núcleo. Las apps son async y lo bloqueante va al threadpool
+# de cada worker, así que más procesos que núcleos solo añade cambios de contexto
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0")) or available_cpus()
+
+# Reciclar cada worker tras N peticiones (con jitter para no reiniciarlos todos a la vez)
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "5000"))
+MAX_REQUESTS_JITTER = int(os.getenv("MAX_REQUESTS_JITTER", "500"))
+
+# Segundos que tiene un worker para terminar sus peticiones al apagarse/reciclarse
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+WORKER_TIMEOUT = int(os.getenv("WORKER_TIMEOUT", "60"))
+KEEPALIVE = int(os.getenv("KEEPALIVE", "5"))
+
+# Conexiones a MySQL para todo el servicio, repartidas entre los workers
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "25"))
+
+
+def pool_sizing(workers: int, max_connections: int = DB_MAX_CONNECTIONS):
+    """(pool_size, max_overflow) por worker: workers * (pool + overflow) <= max_connections.
+
+    Mitad conexiones fijas (abiertas en el arranque) y mitad de desbordamiento,
+    con un mínimo de 2 por worker para que un worker nunca se quede sin conexión
+    mientras otra petición suya la tiene ocupada.
+    """
+    per_worker = max(2, max_connections // max(workers, 1))
+    pool_size = (per_worker + 1) // 2
+    return pool_size, per_worker - pool_size
+
+
+def clamp_workers(workers: int, max_connections: int = DB_MAX_CONNECTIONS) -> int:
+    """Workers que caben en DB_MAX_CONNECTIONS con el mínimo de 2 conexiones por worker.
+
+    Sin esto, en un host con muchas CPU (WEB_CONCURRENCY por defecto) los pools
+    sumarían más que max_connections de MySQL. No aplica si DB_POOL_SIZE se fija
+    a mano ni en servicios sin base de datos (api-gateway).
+    """
+    if "DB_POOL_SIZE" in os.environ or importlib.util.find_spec("app.database") is None:
+        return workers
+    limit = max(1, max_connections // 2)
+    if workers > limit:
+        print(f"⚠️ {workers} workers need more than DB_MAX_CONNECTIONS={max_connections} "
+              f"(2 per worker); starting {limit}")
+        return limit
+    return workers
+
+
+def configure_environment(workers: int):
+    # Antes de importar la app: database.py y auth.py leen estas variables al importarse
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    if "DB_POOL_SIZE" not in os.environ:
+        pool_size, max_overflow = pool_sizing(workers)
+        os.environ["DB_POOL_SIZE"] = str(pool_size)
+        os.environ["DB_MAX_OVERFLOW"] = str(max_overflow)
+
+
+def post_fork(server, worker):
+    # Las conexiones del pool no se pueden compartir entre procesos: cada worker abre las suyas
+    try:
+        from app.database import engine
+    except ImportError:  # api-gateway: sin base de datos
+        return
+    engine.dispose(close=False)
+
+
+def run_gunicorn(host: str, port: int, workers: int):
+    from gunicorn.app.base import BaseApplication
+
+    # Un worker que no arranca sale con WORKER_BOOT_ERROR y el arbiter se detiene (app/startup.py)
+    os.environ["SERVER_SUPERVISOR"] = "gunicorn"
+
+    class Server(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"{host}:{port}",
+                "workers": workers,
+                "worker_class": "uvicorn.workers.UvicornWorker",
+                "preload_app": True,
+                "max_requests": MAX_REQUESTS,
+                "max_requests_jitter": MAX_REQUESTS_JITTER,
+                "graceful_timeout": GRACEFUL_TIMEOUT,
+                "timeout": WORKER_TIMEOUT,
+                "keepalive": KEEPALIVE,
+                "post_fork": post_fork,
+                "accesslog": "-",
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+            return app
+
+    Server().run()
+
+
+def run_uvicorn(host: str, port: int, workers: int, reload: bool = False):
+    import uvicorn
+
+    if reload:
+        uvicorn.run(APP, host=host, port=port, reload=True)
+        return
+    if workers > 1:
+        os.environ["SERVER_SUPERVISOR"] = "uvicorn"
+    uvicorn.run(
+        APP, host=host, port=port, workers=workers,
+        limit_max_requests=MAX_REQUESTS or None,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+        timeout_keep_alive=KEEPALIVE
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--reload", action="store_true", default=os.getenv("RELOAD", "").lower() == "true",
+                        help="desarrollo: un solo proceso que se recarga al cambiar el código")
+    args = parser.parse_args()
+
+    workers = 1 if args.reload else clamp_workers(max(1, args.workers))
+    configure_environment(workers)
+    print(f"✅ Starting {workers} worker(s) on {args.host}:{args.port} "
+          f"(DB pool {os.environ['DB_POOL_SIZE']}+{os.getenv('DB_MAX_OVERFLOW', '10')} per worker)")
+
+    if args.reload:
+        run_uvicorn(args.host, args.port, workers, reload=True)
+        return
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        print("⚠️ gunicorn not installed, using uvicorn workers (no preload)")
+        run_uvicorn(args.host, args.port, workers)
+        return
+    run_gunicorn(args.host, args.port, workers)
+
+
+if __name__ == "__main__":
+    main()
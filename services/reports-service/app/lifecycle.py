@@ -0,0 +1,189 @@
+"""Ciclo de vida de los datos: archivo de mantenimientos e historial de ubicaciones.
+
+`maintenance` y `equipment_location_history` solo crecen. Los registros cerrados
+(mantenimientos completados o cancelados, estancias ya terminadas) más antiguos
+que la retención pasan por lotes a las tablas `*_archive`, particionadas por año
+y comprimidas. Cada lote copia y borra en la misma transacción: un registro
+nunca está en las dos tablas ni en ninguna.
+
+Las consultas normales solo recorren las tablas vivas; el archivo se consulta
+únicamente con `include_archive=true`.
+"""
+import os
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import bindparam, text
+
+# Mínimo 400 días: el gráfico de costos de los últimos 12 meses del dashboard nunca necesita el archivo
+MAINTENANCE_RETENTION_DAYS = max(int(os.getenv("MAINTENANCE_RETENTION_DAYS", "730")), 400)
+LOCATION_HISTORY_RETENTION_DAYS = int(os.getenv("LOCATION_HISTORY_RETENTION_DAYS", "730"))
+LIFECYCLE_BATCH_SIZE = int(os.getenv("LIFECYCLE_BATCH_SIZE", "1000"))
+
+# Tabla viva -> tabla de archivo
+ARCHIVE_TABLES = {
+    "maintenance": "maintenance_archive",
+    "maintenance_parts": "maintenance_parts_archive",
+    "equipment_location_history": "equipment_location_history_archive",
+}
+
+MAINTENANCE_COLUMNS = (
+    "id, equipment_id, maintenance_type_id, type, scheduled_date, performed_date, technician, "
+    "provider_id, description, diagnosis, solution, cost, status, next_maintenance_date, "
+    "attachments, created_at, updated_at, created_by"
+)
+PART_COLUMNS = "id, maintenance_id, part_name, quantity, unit_cost, total_cost, created_at"
+STAY_COLUMNS = "id, equipment_id, location_id, assigned_to, move_date, valid_to, reason, moved_by, created_at"
+
+# Fecha por la que se particiona un mantenimiento archivado (los cancelados pueden no tener performed_date)
+ARCHIVE_DATE = "COALESCE(performed_date, scheduled_date, DATE(created_at))"
+
+
+def maintenance_source(include_archive: bool) -> str:
+    """Origen para el FROM de los informes de mantenimiento.
+
+    Con archivo es un UNION ALL; MySQL (8.0.29+) empuja las condiciones del
+    WHERE exterior a cada rama, así que los índices de fecha siguen sirviendo.
+    """
+    if not include_archive:
+        return "maintenance"
+    return (
+        f"(SELECT {MAINTENANCE_COLUMNS} FROM maintenance "
+        f"UNION ALL SELECT {MAINTENANCE_COLUMNS} FROM maintenance_archive)"
+    )
+
+
+def _select_ids(conn, sql: str, params: dict) -> list:
+    # SKIP LOCKED: con varias réplicas ejecutando el ciclo cada una toma lotes distintos
+    return [row[0] for row in conn.execute(text(sql + " ORDER BY id LIMIT :batch FOR UPDATE SKIP LOCKED"), {
+        **params, "batch": LIFECYCLE_BATCH_SIZE
+    })]
+
+
+def _by_ids(sql: str):
+    return text(sql).bindparams(bindparam("ids", expanding=True))
+
+
+def archive_maintenance(engine, today: Optional[date] = None) -> int:
+    """Archivar mantenimientos cerrados anteriores a la retención (con sus repuestos)"""
+    cutoff = (today or date.today()) - timedelta(days=MAINTENANCE_RETENTION_DAYS)
+    archived = 0
+    while True:
+        with engine.begin() as conn:
+            ids = _select_ids(conn, f"""
+                SELECT id FROM maintenance
+                WHERE status IN ('completed', 'cancelled') AND {ARCHIVE_DATE} < :cutoff
+            """, {"cutoff": cutoff})
+            if ids:
+                conn.execute(_by_ids(f"""
+                    INSERT INTO maintenance_archive ({MAINTENANCE_COLUMNS}, archive_date)
+                    SELECT {MAINTENANCE_COLUMNS}, {ARCHIVE_DATE} FROM maintenance WHERE id IN :ids
+                """), {"ids": ids})
+                conn.execute(_by_ids(f"""
+                    INSERT INTO maintenance_parts_archive ({PART_COLUMNS}, archive_date)
+                    SELECT p.id, p.maintenance_id, p.part_name, p.quantity, p.unit_cost, p.total_cost, p.created_at,
+                           COALESCE(m.performed_date, m.scheduled_date, DATE(m.created_at))
+                    FROM maintenance_parts p
+                    JOIN maintenance m ON m.id = p.maintenance_id
+                    WHERE p.maintenance_id IN :ids
+                """), {"ids": ids})
+                # Los repuestos se borran por ON DELETE CASCADE
+                conn.execute(_by_ids("DELETE FROM maintenance WHERE id IN :ids"), {"ids": ids})
+        archived += len(ids)
+        if len(ids) < LIFECYCLE_BATCH_SIZE:
+            return archived
+
+
+def archive_location_history(engine, today: Optional[date] = None) -> int:
+    """Archivar estancias terminadas antes de la retención; las abiertas nunca se archivan"""
+    cutoff = (today or date.today()) - timedelta(days=LOCATION_HISTORY_RETENTION_DAYS)
+    archived = 0
+    while True:
+        with engine.begin() as conn:
+            # valid_to > move_date: la condición sobre move_date solo acota el rango de idx_move_date
+            ids = _select_ids(conn, """
+                SELECT id FROM equipment_location_history
+                WHERE move_date < :cutoff AND valid_to < :cutoff
+            """, {"cutoff": cutoff})
+            if ids:
+                conn.execute(_by_ids(f"""
+                    INSERT INTO equipment_location_history_archive ({STAY_COLUMNS})
+                    SELECT {STAY_COLUMNS} FROM equipment_location_history WHERE id IN :ids
+                """), {"ids": ids})
+                conn.execute(_by_ids("DELETE FROM equipment_location_history WHERE id IN :ids"), {"ids": ids})
+        archived += len(ids)
+        if len(ids) < LIFECYCLE_BATCH_SIZE:
+            return archived
+
+
+def _partitions(conn, table: str) -> dict:
+    rows = conn.execute(text("""
+        SELECT PARTITION_NAME, TABLE_ROWS
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """), {"table": table}).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def ensure_partitions(engine, year: int) -> list:
+    """Partición por año hasta `year` + 1 en cada tabla de archivo (se separan de `pmax`).
+
+    Se ejecuta antes de archivar: si una tabla de archivo no existe o no está
+    particionada (p. ej. creada a mano sin la migración 005), falla y no se archiva nada.
+    """
+    added = []
+    with engine.connect() as conn:
+        for table in ARCHIVE_TABLES.values():
+            names = _partitions(conn, table)
+            if not names or None in names:
+                # Sin particiones no hay años que descartar ni compresión: no archivar hasta corregirlo
+                print(f"❌ {table} is missing or not partitioned; apply init-db/migrations/005_data_lifecycle.sql")
+                raise RuntimeError(f"Archive table {table} is missing or not partitioned")
+            years = [int(name[1:]) for name in names if name and name[1:].isdigit()]
+            missing = range(max(years, default=year) + 1, year + 2)
+            if not missing:
+                continue
+            partitions = ", ".join(f"PARTITION p{y} VALUES LESS THAN ({y + 1})" for y in missing)
+            conn.execute(text(
+                f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO "
+                f"({partitions}, PARTITION pmax VALUES LESS THAN MAXVALUE)"
+            ))
+            added += [f"{table}.p{y}" for y in missing]
+    return added
+
+
+def run_lifecycle(engine, today: Optional[date] = None) -> dict:
+    today = today or date.today()
+    return {
+        "partitions_added": ensure_partitions(engine, today.year),
+        "maintenance_archived": archive_maintenance(engine, today),
+        "location_history_archived": archive_location_history(engine, today),
+        "ran_at": today.isoformat(),
+    }
+
+
+def lifecycle_status(engine) -> dict:
+    """Retención y filas (aproximadas, de information_schema) de las tablas vivas y de archivo"""
+    today = date.today()
+    tables = {}
+    with engine.connect() as conn:
+        for live, archive in ARCHIVE_TABLES.items():
+            live_rows = sum(rows or 0 for rows in _partitions(conn, live).values())
+            partitions = _partitions(conn, archive)
+            tables[live] = {
+                "rows": live_rows,
+                "archived_rows": sum(rows or 0 for rows in partitions.values()),
+                "archive_partitions": partitions,
+            }
+    return {
+        "retention_days": {
+            "maintenance": MAINTENANCE_RETENTION_DAYS,
+            "equipment_location_history": LOCATION_HISTORY_RETENTION_DAYS,
+        },
+        "cutoffs": {
+            "maintenance": (today - timedelta(days=MAINTENANCE_RETENTION_DAYS)).isoformat(),
+            "equipment_location_history": (today - timedelta(days=LOCATION_HISTORY_RETENTION_DAYS)).isoformat(),
+        },
+        "tables": tables,
+    }
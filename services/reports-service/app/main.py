@@ -1,23 +1,67 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime, date
-import pandas as pd
+import asyncio
 import io
 import os
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.units import inch
-from .database import get_db
+import time
+from .database import get_db, engine, SessionLocal, DB_POOL_SIZE
+from .changes import CHANGES_MAX_LIMIT, latest_change_id, purge_changes, read_changes
+from .lifecycle import lifecycle_status, maintenance_source, run_lifecycle
+from .startup import readiness, warm_up
 
 app = FastAPI(title="Reports Service", version="1.0.0")
 
+@app.on_event("startup")
+async def startup_event():
+    """Esperar a la BD y abrir el pool en segundo plano (/health da 503 hasta terminar)"""
+    app.state.warmup_task = asyncio.create_task(warm_up(engine, SessionLocal, DB_POOL_SIZE))
+    app.state.purge_task = asyncio.create_task(purge_changes_periodically())
+    app.state.lifecycle_last_run = None
+    app.state.lifecycle_task = asyncio.create_task(run_lifecycle_periodically())
+
+@app.on_event("shutdown")
+def shutdown_event():
+    app.state.purge_task.cancel()
+    app.state.lifecycle_task.cancel()
+
+# Long-polling de /changes: espera máxima por petición y cada cuánto se vuelve a mirar
+CHANGES_MAX_WAIT = float(os.getenv("CHANGES_MAX_WAIT", "30"))
+CHANGES_POLL_INTERVAL = float(os.getenv("CHANGES_POLL_INTERVAL", "0.5"))
+OUTBOX_PURGE_INTERVAL = float(os.getenv("OUTBOX_PURGE_INTERVAL", "3600"))
+
+async def purge_changes_periodically():
+    """Retención del outbox; con varias réplicas el borrado es idempotente"""
+    while True:
+        await asyncio.sleep(OUTBOX_PURGE_INTERVAL)
+        try:
+            purged = await run_in_threadpool(purge_changes, engine)
+            if purged:
+                print(f"✅ Purged {purged} outbox events")
+        except Exception as e:
+            print(f"⚠️ Outbox purge failed: {e}")
+
+# Cada cuánto se archivan los registros cerrados (segundos, 0 lo desactiva)
+LIFECYCLE_INTERVAL = float(os.getenv("LIFECYCLE_INTERVAL", "86400"))
+
+async def run_lifecycle_periodically():
+    """Archivo por lotes; con varias réplicas cada una toma lotes distintos (SKIP LOCKED)"""
+    if LIFECYCLE_INTERVAL <= 0:
+        return
+    while True:
+        await asyncio.sleep(LIFECYCLE_INTERVAL)
+        try:
+            app.state.lifecycle_last_run = await run_in_threadpool(run_lifecycle, engine)
+            print(f"✅ Lifecycle: {app.state.lifecycle_last_run}")
+        except Exception as e:
+            print(f"⚠️ Lifecycle run failed: {e}")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -47,7 +91,9 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    if not readiness.ready:
+        return JSONResponse(status_code=503, content={"status": "starting", **readiness.snapshot()})
+    return {"status": "healthy", "warmup_seconds": readiness.warmup_seconds}
 
 # ============================================
 # EQUIPMENT REPORTS
@@ -61,6 +107,8 @@ def export_equipment_excel(
     db: Session = Depends(get_db)
 ):
     """Exportar inventario de equipos a Excel"""
+    import pandas as pd  # carga diferida: solo la necesitan las exportaciones
+
     query = """
         SELECT
             e.id,
@@ -134,6 +182,12 @@ def export_equipment_pdf(
     db: Session = Depends(get_db)
 ):
     """Exportar inventario de equipos a PDF"""
+    import pandas as pd  # carga diferida: solo la necesitan las exportaciones
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
     query = """
         SELECT
             e.asset_code,
@@ -228,10 +282,13 @@ def export_maintenance_excel(
     from_date: Optional[date] = None,
     to_date: Optional[date] = None,
     equipment_id: Optional[int] = None,
+    include_archive: bool = Query(False, description="Incluir los mantenimientos archivados"),
     db: Session = Depends(get_db)
 ):
     """Exportar historial de mantenimiento a Excel"""
-    query = """
+    import pandas as pd  # carga diferida: solo la necesitan las exportaciones
+
+    query = f"""
         SELECT
             m.id,
             e.asset_code,
@@ -246,7 +303,7 @@ def export_maintenance_excel(
             m.cost,
             m.status,
             mt.name as maintenance_type
-        FROM maintenance m
+        FROM {maintenance_source(include_archive)} m
         LEFT JOIN equipment e ON m.equipment_id = e.id
         LEFT JOIN maintenance_types mt ON m.maintenance_type_id = mt.id
         WHERE 1=1
@@ -299,10 +356,17 @@ def export_maintenance_excel(
 def export_maintenance_pdf(
     from_date: Optional[date] = None,
     to_date: Optional[date] = None,
+    include_archive: bool = Query(False, description="Incluir los mantenimientos archivados"),
     db: Session = Depends(get_db)
 ):
     """Exportar historial de mantenimiento a PDF"""
-    query = """
+    import pandas as pd  # carga diferida: solo la necesitan las exportaciones
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+    query = f"""
         SELECT
             e.asset_code,
             e.name as equipment,
@@ -311,7 +375,7 @@ def export_maintenance_pdf(
             m.technician,
             m.cost,
             m.status
-        FROM maintenance m
+        FROM {maintenance_source(include_archive)} m
         LEFT JOIN equipment e ON m.equipment_id = e.id
         WHERE 1=1
     """
@@ -372,45 +436,36 @@ def get_dashboard_statistics(db: Session = Depends(get_db)):
     """Obtener estadísticas para el dashboard"""
     stats = {}
 
-    # Total de equipos
-    result = db.execute(text("SELECT COUNT(*) as total FROM equipment"))
-    stats['total_equipment'] = result.fetchone()[0]
-
-    # Equipos por estado
+    # Equipos: total, por estado, por categoría y por ubicación en una sola pasada
+    # (celdas estado × categoría × edificio × departamento, sumadas en memoria)
     result = db.execute(text("""
-        SELECT status, COUNT(*) as count
-        FROM equipment
-        GROUP BY status
+        SELECT e.status, c.name, l.building, l.department, COUNT(*) as count
+        FROM equipment e
+        LEFT JOIN equipment_categories c ON c.id = e.category_id
+        LEFT JOIN locations l ON l.id = e.current_location_id
+        GROUP BY e.status, c.name, l.building, l.department
     """))
+    by_status, by_category, by_location = {}, {}, {}
+    total = 0
+    for status, category, building, department, count in result.fetchall():
+        total += count
+        by_status[status] = by_status.get(status, 0) + count
+        if category is not None:
+            by_category[category] = by_category.get(category, 0) + count
+        if building is not None:
+            by_location[(building, department)] = by_location.get((building, department), 0) + count
+
+    stats['total_equipment'] = total
     stats['equipment_by_status'] = [
-        {"status": row[0], "count": row[1]} for row in result.fetchall()
+        {"status": status, "count": count} for status, count in by_status.items()
     ]
-
-    # Equipos por categoría
-    result = db.execute(text("""
-        SELECT c.name, COUNT(e.id) as count
-        FROM equipment_categories c
-        LEFT JOIN equipment e ON e.category_id = c.id
-        GROUP BY c.name
-        ORDER BY count DESC
-        LIMIT 10
-    """))
     stats['equipment_by_category'] = [
-        {"category": row[0], "count": row[1]} for row in result.fetchall()
+        {"category": category, "count": count}
+        for category, count in sorted(by_category.items(), key=lambda item: item[1], reverse=True)[:10]
     ]
-
-    # Equipos por ubicación
-    result = db.execute(text("""
-        SELECT l.building, l.department, COUNT(e.id) as count
-        FROM locations l
-        LEFT JOIN equipment e ON e.current_location_id = l.id
-        GROUP BY l.building, l.department
-        ORDER BY count DESC
-        LIMIT 10
-    """))
     stats['equipment_by_location'] = [
-        {"building": row[0], "department": row[1], "count": row[2]}
-        for row in result.fetchall()
+        {"building": building, "department": department, "count": count}
+        for (building, department), count in sorted(by_location.items(), key=lambda item: item[1], reverse=True)[:10]
     ]
 
     # Costos de mantenimiento por mes (último año)
@@ -476,6 +531,56 @@ def get_dashboard_statistics(db: Session = Depends(get_db)):
 
     return stats
 
+# ============================================
+# FEED DE CAMBIOS (OUTBOX)
+# ============================================
+
+@app.get("/changes")
+async def get_changes(
+    after: int = Query(0, ge=0, description="Último id de evento ya procesado"),
+    limit: int = Query(500, ge=1, le=CHANGES_MAX_LIMIT),
+    wait: float = Query(0, ge=0, description="Segundos a esperar si no hay eventos nuevos (long polling)"),
+    types: Optional[List[str]] = Query(None, description="Tipos de agregado o de evento, p. ej. equipment o maintenance.updated")
+):
+    """Eventos de cambio posteriores a `after`, por orden; seguir con `after=next_after`.
+
+    Sin conexión retenida durante la espera: cada comprobación toma una del pool y la devuelve.
+    """
+    deadline = time.monotonic() + min(wait, CHANGES_MAX_WAIT)
+    while True:
+        page = await run_in_threadpool(read_changes, engine, after, limit, types)
+        # Con filtro, avanzar sobre eventos de otros tipos también es progreso que devolver
+        remaining = deadline - time.monotonic()
+        if page["events"] or page["next_after"] != after or remaining <= 0:
+            return page
+        await asyncio.sleep(min(CHANGES_POLL_INTERVAL, remaining))
+
+@app.get("/changes/head")
+async def get_changes_head():
+    """Id del último evento: un consumidor nuevo carga el estado actual y sigue el feed desde aquí"""
+    return {"last_id": await run_in_threadpool(latest_change_id, engine)}
+
+# ============================================
+# CICLO DE VIDA DE LOS DATOS
+# ============================================
+
+@app.get("/lifecycle")
+async def get_lifecycle():
+    """Retención, filas vivas y archivadas por partición y resultado de la última ejecución"""
+    status = await run_in_threadpool(lifecycle_status, engine)
+    status["interval_seconds"] = LIFECYCLE_INTERVAL
+    status["last_run"] = app.state.lifecycle_last_run
+    return status
+
+@app.post("/lifecycle/run")
+async def run_lifecycle_now():
+    """Archivar ahora lo que haya superado la retención (idempotente)"""
+    try:
+        app.state.lifecycle_last_run = await run_in_threadpool(run_lifecycle, engine)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return app.state.lifecycle_last_run
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8005)